@@ -6,6 +6,7 @@ import tomllib
 from pathlib import Path
 
 from eadk_discord import bot_setup
+from eadk_discord.profiling import parse_profile_spec
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
@@ -29,4 +30,8 @@ if __name__ == "__main__":
     with open(config_path, "rb") as config_file:
         config = bot_setup.BotConfig.model_validate(tomllib.load(config_file))
 
+    profile_spec = os.getenv("EADK_DISCORD_PROFILE")
+    if profile_spec is not None:
+        config = config.model_copy(update={"profile_commands": parse_profile_spec(profile_spec)})
+
     config.run_bot()
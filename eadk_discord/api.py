@@ -0,0 +1,159 @@
+import asyncio
+from collections.abc import Callable
+from datetime import date as Date  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+from typing import Any
+
+from aiohttp import web
+from beartype import beartype
+
+from eadk_discord import dates
+from eadk_discord.database import Database
+from eadk_discord.database.event_errors import EventError
+from eadk_discord.database.state import Day
+
+# Longest date range a single request may ask for.
+MAX_RANGE_DAYS = 366
+# Length of the range of a user's bookings if no end date is given.
+DEFAULT_BOOKINGS_DAYS = 30
+
+
+def day_json(day: Day) -> dict[str, Any]:
+    return {
+        "date": day.date.isoformat(),
+        "desks": [
+            {"desk": desk_index + 1, "booker": desk.booker, "owner": desk.owner}
+            for desk_index, desk in enumerate(day.desks)
+        ],
+        "available": [desk_index + 1 for desk_index, desk in enumerate(day.desks) if desk.booker is None],
+    }
+
+
+class AvailabilityApi:
+    """
+    Read-only HTTP API serving availability from the in-memory state.
+
+    Responses carry an ETag made from the ledger version and the current date, which relative dates such as "today"
+    depend on. Requests with a matching If-None-Match header get a 304 response without anything being rendered.
+    """
+
+    database: Database
+    today: Callable[[], Date]
+    # Held while rendering, since commands may be changing the database in a worker thread.
+    lock: asyncio.Lock
+
+    @beartype
+    def __init__(
+        self, database: Database, today: Callable[[], Date] = Date.today, lock: asyncio.Lock | None = None
+    ) -> None:
+        self.database = database
+        self.today = today
+        self.lock = lock if lock is not None else asyncio.Lock()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get("/days/{date}", self._day),
+                web.get("/days", self._days),
+                web.get("/users/{user}/bookings", self._bookings),
+            ]
+        )
+        return app
+
+    @beartype
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        """
+        Starts serving the API. The returned runner must be cleaned up to stop it.
+        """
+        return await serve(self.app(), host, port)
+
+    async def _day(self, request: web.Request) -> web.StreamResponse:
+        def render(today: Date) -> Any:
+            return day_json(self.database.day(self._date(request.match_info["date"], today)))
+
+        return await self._respond(request, render)
+
+    async def _days(self, request: web.Request) -> web.StreamResponse:
+        def render(today: Date) -> Any:
+            start_date, end_date = self._range(request, today, None)
+            return [day_json(day) for day in self.database.day_range(start_date, end_date)]
+
+        return await self._respond(request, render)
+
+    async def _bookings(self, request: web.Request) -> web.StreamResponse:
+        try:
+            user = int(request.match_info["user"])
+        except ValueError:
+            raise web.HTTPBadRequest(text="The user must be an id") from None
+
+        def render(today: Date) -> Any:
+            start_date, end_date = self._range(request, today, DEFAULT_BOOKINGS_DAYS)
+            return [
+                {"date": day.date.isoformat(), "desk": desk_index + 1}
+                for day in self.database.day_range(start_date, end_date)
+                for desk_index in day.booked_desks(user)
+            ]
+
+        return await self._respond(request, render)
+
+    async def _respond(self, request: web.Request, render: Callable[[Date], Any]) -> web.StreamResponse:
+        async with self.lock:
+            return self._respond_locked(request, render)
+
+    def _respond_locked(self, request: web.Request, render: Callable[[Date], Any]) -> web.StreamResponse:
+        # Another process may have changed the ledger since the last request.
+        self.database.sync()
+        today = self.today()
+        etag = f'"{self.database.num_events}-{today.isoformat()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None and (
+            if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+        ):
+            return web.Response(status=304, headers=headers)
+        try:
+            body = render(today)
+        except (dates.DateParseError, EventError) as e:
+            raise web.HTTPBadRequest(text=f"Invalid date: {e}") from e
+        return web.json_response(body, headers=headers)
+
+    @staticmethod
+    def _date(argument: str, today: Date) -> Date:
+        return dates.parse_date_arg(argument, today)
+
+    def _range(self, request: web.Request, today: Date, default_days: int | None) -> tuple[Date, Date]:
+        start_date = self._date(request.query.get("start", "today"), today)
+        end_arg = request.query.get("end")
+        if end_arg is not None:
+            end_date = self._date(end_arg, today)
+        elif default_days is not None:
+            end_date = start_date + TimeDelta(days=default_days - 1)
+        else:
+            raise web.HTTPBadRequest(text="An end date must be given")
+        if (end_date - start_date).days >= MAX_RANGE_DAYS:
+            raise web.HTTPBadRequest(text=f"At most {MAX_RANGE_DAYS} days can be requested at once")
+        return start_date, end_date
+
+
+@beartype
+def metrics_route(render: Callable[[], str]) -> web.RouteDef:
+    """
+    Route serving the metrics rendered in the Prometheus text format at /metrics.
+    """
+
+    async def metrics(request: web.Request) -> web.StreamResponse:
+        return web.Response(text=render(), content_type="text/plain", headers={"Cache-Control": "no-cache"})
+
+    return web.get("/metrics", metrics)
+
+
+@beartype
+async def serve(app: web.Application, host: str, port: int) -> web.AppRunner:
+    """
+    Starts serving an application. The returned runner must be cleaned up to stop it.
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,54 @@
+# pragma: coverage exclude file
+"""
+Measures how long the range allocator takes to find desks in a large, busy office.
+"""
+
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from eadk_discord.database import Database
+from eadk_discord.database.allocator import RangeAllocator
+from eadk_discord.database.event import BookDesk, Event, SetNumDesks
+
+NUM_DESKS = 200
+NUM_DAYS = 92
+NUM_QUERIES = 1000
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    start_date = date(2024, 1, 1)
+    now = datetime(2024, 1, 1)
+    database = Database.initialize(start_date)
+    database.handle_event(Event(author=None, time=now, event=SetNumDesks(date=start_date, num_desks=NUM_DESKS)))
+    # Book 80% of the desk days in short runs.
+    for desk_index in range(NUM_DESKS):
+        day = 0
+        while day < NUM_DAYS:
+            length = rng.randrange(1, 6)
+            if rng.random() < 0.8:
+                event = BookDesk(
+                    start_date=start_date + timedelta(days=day),
+                    end_date=start_date + timedelta(days=min(day + length, NUM_DAYS) - 1),
+                    desk_index=desk_index,
+                    user=rng.randrange(100),
+                )
+                database.handle_event(Event(author=None, time=now, event=event))
+            day += length
+
+    allocator = RangeAllocator(database)
+    start = time.perf_counter()
+    allocator.find(start_date, start_date)
+    print(f"Built the busy intervals of {NUM_DESKS} desks over {NUM_DAYS} days in {time.perf_counter() - start:.3f} s")
+
+    queries = []
+    for _ in range(NUM_QUERIES):
+        offset = rng.randrange(NUM_DAYS)
+        queries.append((start_date + timedelta(days=offset), start_date + timedelta(days=offset + rng.randrange(30))))
+    num_split = 0
+    start = time.perf_counter()
+    for query_start, query_end in queries:
+        assignments = allocator.find(query_start, query_end)
+        num_split += assignments is not None and len(assignments) > 1
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / NUM_QUERIES * 1e6:.0f} µs per range query, {num_split} of {NUM_QUERIES} queries were split")
@@ -0,0 +1,97 @@
+# pragma: coverage exclude file
+"""
+Compares the size and load time of the JSON and binary ledger formats.
+
+Uses the database at DATABASE_PATH if it is set, and otherwise a synthetic ledger.
+"""
+
+import gzip
+import os
+import random
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from eadk_discord.database import binary
+from eadk_discord.database.event import BookDesk, Event, SetNumDesks, UnbookDesk
+from eadk_discord.database.history import History
+from eadk_discord.database.mapped import MappedHistory
+
+
+def synthetic_history(num_days: int, num_desks: int, seed: int = 0) -> History:
+    rng = random.Random(seed)
+    start_date = date(2024, 1, 1)
+    start_time = datetime(2024, 1, 1, 8)
+    users = [rng.randrange(10**17, 10**18) for _ in range(40)]
+    history = History.initialize(start_date)
+    history.append(Event(author=None, time=start_time, event=SetNumDesks(date=start_date, num_desks=num_desks)))
+    for day in range(num_days):
+        booking_date = start_date + timedelta(days=day)
+        for desk_index in rng.sample(range(num_desks), rng.randrange(num_desks)):
+            user = rng.choice(users)
+            time = start_time + timedelta(days=day, seconds=rng.randrange(36000), microseconds=rng.randrange(10**6))
+            history.append(
+                Event(
+                    author=user,
+                    time=time,
+                    event=BookDesk(start_date=booking_date, end_date=booking_date, desk_index=desk_index, user=user),
+                )
+            )
+            if rng.random() < 0.1:
+                history.append(
+                    Event(
+                        author=user,
+                        time=time + timedelta(minutes=5),
+                        event=UnbookDesk(start_date=booking_date, end_date=booking_date, desk_index=desk_index),
+                    )
+                )
+    return history
+
+
+def best_time(function: Callable[[], object], repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    match os.getenv("DATABASE_PATH"):
+        case None:
+            history = synthetic_history(num_days=3 * 365, num_desks=20)
+        case database_path:
+            data = Path(database_path).read_bytes()
+            history = binary.decode(data) if binary.is_binary(data) else History.from_json(data.decode())
+
+    json_data = history.to_json()
+    binary_data = binary.encode(history)
+    assert binary.decode(binary_data) == history
+    assert History.from_json(json_data) == history
+
+    print(f"{len(history.history)} events")
+    print(f"{'format':<12}{'size (B)':>12}{'gzip (B)':>12}{'load (ms)':>12}")
+    print(
+        f"{'json':<12}{len(json_data.encode()):>12}{len(gzip.compress(json_data.encode())):>12}"
+        f"{best_time(lambda: History.from_json(json_data)) * 1000:>12.1f}"
+    )
+    print(
+        f"{'binary':<12}{len(binary_data):>12}{len(gzip.compress(binary_data)):>12}"
+        f"{best_time(lambda: binary.decode(binary_data)) * 1000:>12.1f}"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        binary_path = Path(directory) / "ledger.bin"
+        binary_path.write_bytes(binary_data)
+        indices = random.Random(1).sample(range(len(history.history)), min(100, len(history.history)))
+
+        def random_access() -> None:
+            with MappedHistory.open(binary_path) as mapped:
+                for index in indices:
+                    mapped[index]
+                mapped.bisect_time(history.history[len(history.history) // 2].time)
+
+        print(f"mmap open + {len(indices)} random reads + bisect: {best_time(random_access) * 1000:.2f} ms")
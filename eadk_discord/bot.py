@@ -1,5 +1,7 @@
+import math
 from collections.abc import Callable
 from dataclasses import dataclass
+from datetime import date as Date  # noqa: N812
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
@@ -8,12 +10,93 @@ from beartype import beartype
 from discord.app_commands import AppCommandError
 from pydantic import BaseModel, Field
 
-from eadk_discord import dates, fmt
+from eadk_discord import dates, fmt, views
 from eadk_discord.database import Database
-from eadk_discord.database.event import BookDesk, Event, MakeFlex, MakeOwned, UnbookDesk
+from eadk_discord.database.allocator import Assignment, RangeAllocator
+from eadk_discord.database.diff import DeskChange, Diff
+from eadk_discord.database.event import (
+    BookDesk,
+    CheckIn,
+    Event,
+    JoinWaitlist,
+    LeaveWaitlist,
+    MakeFlex,
+    MakeOwned,
+    SetDeskAttributes,
+    SetNumDesks,
+    UnbookDesk,
+)
 from eadk_discord.database.event_errors import EventError
+from eadk_discord.database.preview import Preview
+from eadk_discord.database.state import DeskFilter
 
 TIME_ZONE = ZoneInfo("Europe/Berlin")
+HISTORY_PAGE_SIZE = 10
+# Conflicts or changes listed in a preview, so that the message stays within Discord's limit.
+PREVIEW_LINES = 15
+
+
+@beartype
+def parse_tags(tags: str | None) -> frozenset[str]:
+    """
+    Parses a comma-separated list of tags, as given in commands.
+    """
+    if tags is None:
+        return frozenset()
+    return frozenset(tag.strip().lower() for tag in tags.split(",") if tag.strip())
+
+
+@beartype
+def parse_desk_filter(zone: str | None, tags: str | None) -> DeskFilter:
+    return DeskFilter(zone=zone or None, tags=parse_tags(tags))
+
+
+@beartype
+def describe_desk_filter(desk_filter: DeskFilter) -> str:
+    parts = []
+    if desk_filter.zone is not None:
+        parts.append(f"zone {desk_filter.zone}")
+    if desk_filter.tags:
+        parts.append(f"tags {', '.join(sorted(desk_filter.tags))}")
+    return " and ".join(parts)
+
+
+@beartype
+def describe_desk_change(change: DeskChange, format_user: Callable[[int], str]) -> str:
+    parts = []
+    if change.owner_before != change.owner_after:
+        before = format_user(change.owner_before) if change.owner_before is not None else "flex"
+        after = format_user(change.owner_after) if change.owner_after is not None else "flex"
+        parts.append(f"owner {before} → {after}")
+    if change.booker_before != change.booker_after:
+        before = format_user(change.booker_before) if change.booker_before is not None else "free"
+        after = format_user(change.booker_after) if change.booker_after is not None else "free"
+        parts.append(f"booker {before} → {after}")
+    return f"Desk {fmt.desk_index(change.desk_index)} on {fmt.date(change.date)}: {', '.join(parts)}"
+
+
+@beartype
+def describe_preview(action: str, preview: Preview, format_user: Callable[[int], str]) -> str:
+    """
+    Describes every conflict that would make the previewed event fail, or the changes it would make.
+    `action` describes the event, e.g. "Making desk 3 a flex desk from 2024-10-01 onwards".
+    """
+    if not preview.succeeds:
+        num_conflicts = len(preview.conflicts)
+        header = f"{action} would fail because of {num_conflicts} conflict{'s' if num_conflicts != 1 else ''}:"
+        lines = [conflict.message(format_user) for conflict in preview.conflicts]
+    else:
+        assert preview.diff is not None
+        lines = [
+            f"{fmt.date(change.date)}: {change.before} → {change.after} desks" for change in preview.diff.num_desks
+        ]
+        lines += [describe_desk_change(change, format_user) for change in preview.diff.desks]
+        if not lines:
+            return f"{action} would not change anything."
+        header = f"{action} would make {len(lines)} change{'s' if len(lines) != 1 else ''}:"
+    if len(lines) > PREVIEW_LINES:
+        lines = [*lines[:PREVIEW_LINES], f"and {len(lines) - PREVIEW_LINES} more."]
+    return "\n".join([header, *lines])
 
 
 class CommandInfo(BaseModel):
@@ -21,6 +104,9 @@ class CommandInfo(BaseModel):
     format_user: Callable[[int], str] = Field()
     author_id: int = Field()
     author_role_ids: set[int] = Field()
+    interaction_id: int | None = Field(default=None)
+    # Whether the author may manage the guild, which makes them an admin in offices that go by guild permissions.
+    author_manages_guild: bool = Field(default=False)
 
     @beartype
     @staticmethod
@@ -37,6 +123,8 @@ class CommandInfo(BaseModel):
             format_user=lambda user: fmt.user(interaction, user),
             author_id=interaction.user.id,
             author_role_ids=role_ids,
+            interaction_id=interaction.id,
+            author_manages_guild=interaction.permissions.manage_guild,
         )
 
 
@@ -54,53 +142,162 @@ class Response:
 
     @beartype
     async def send(self, interaction: discord.Interaction) -> None:  # pragma: no cover
-        if self.embed is None:
+        if interaction.response.is_done():
+            await self._send_followup(interaction)
+        elif self.embed is None:
             await interaction.response.send_message(self.message, ephemeral=self.ephemeral)
         else:
             await interaction.response.send_message(self.message, ephemeral=self.ephemeral, embed=self.embed)
 
+    async def _send_followup(self, interaction: discord.Interaction) -> None:  # pragma: no cover
+        """
+        Sends the response to an interaction that has been deferred, replacing the "thinking" message.
+        """
+        if self.ephemeral:
+            # The deferred message is public, so an ephemeral response is sent as a new message.
+            await interaction.delete_original_response()
+            if self.embed is None:
+                await interaction.followup.send(self.message, ephemeral=True)
+            else:
+                await interaction.followup.send(self.message, ephemeral=True, embed=self.embed)
+        else:
+            await interaction.edit_original_response(content=self.message, embed=self.embed)
+
 
 class EADKBot:
     _database: Database
     _regular_role_ids: set[int]
     _admin_role_ids: set[int]
+    # Whether admins are the members who may manage the guild rather than those with an admin role, for guilds whose
+    # roles are not configured. Only admins are regulars then.
+    _guild_permissions: bool
+    _views: views.ViewCache
+    _allocator: RangeAllocator
 
     @beartype
-    def __init__(self, database: Database, regular_role_ids: set[int], admin_role_ids: set[int]) -> None:
+    def __init__(
+        self,
+        database: Database,
+        regular_role_ids: set[int],
+        admin_role_ids: set[int],
+        guild_permissions: bool = False,
+    ) -> None:
         self._database = database
         self._regular_role_ids = regular_role_ids
         self._admin_role_ids = admin_role_ids
+        self._guild_permissions = guild_permissions
+        self._views = views.ViewCache(database)
+        self._allocator = RangeAllocator(database)
 
     def _is_author_regular(self, info: CommandInfo) -> bool:
+        if self._guild_permissions:
+            return info.author_manages_guild
         return bool(info.author_role_ids.intersection(self._regular_role_ids.union(self._admin_role_ids)))
 
     def _is_author_admin(self, info: CommandInfo) -> bool:
+        if self._guild_permissions:
+            return info.author_manages_guild
         return bool(info.author_role_ids.intersection(self._admin_role_ids))
 
     @property
     def database(self) -> Database:
         return self._database
 
+    def _event(
+        self,
+        info: CommandInfo,
+        event: BookDesk
+        | UnbookDesk
+        | MakeOwned
+        | MakeFlex
+        | JoinWaitlist
+        | LeaveWaitlist
+        | CheckIn
+        | SetDeskAttributes,
+        keyed: bool = True,
+    ) -> Event:
+        """
+        Creates an event made by the command's author. Only keyed events can be recognized if the command is retried,
+        so commands that make several events should only key the first.
+        """
+        return Event(
+            author=info.author_id,
+            time=datetime.now(),
+            event=event,
+            idempotency_key=info.interaction_id if keyed else None,
+        )
+
+    def _retried_response(self, info: CommandInfo) -> Response | None:
+        """
+        Returns a response describing the original event if the command's interaction has already been handled.
+        """
+        original = self._database.recorded_event(info.interaction_id)
+        if original is None:
+            return None
+        return Response(message=f"{original.event.describe(info.format_user)}.")
+
     @beartype
-    def info(self, info: CommandInfo, date_str: str | None) -> Response:
+    def info(
+        self, info: CommandInfo, date_str: str | None, zone: str | None = None, tags: str | None = None
+    ) -> Response:
         booking_date = dates.get_booking_date(date_str, info.now)
-        booking_day, _ = self._database.state.day(booking_date)
-
-        desk_numbers_str = "\n".join(str(i + 1) for i in range(len(booking_day.desks)))
-        desk_bookers_str = "\n".join(
-            info.format_user(desk.booker) if desk.booker else "**Free**" for desk in booking_day.desks
-        )
-        desk_owners_str = "\n".join(
-            info.format_user(desk.owner) if desk.owner else "**Flex**" for desk in booking_day.desks
+        booking_day = self._database.day(booking_date)
+        desk_filter = parse_desk_filter(zone, tags)
+        desk_indices = self._database.matching_desks(booking_date, desk_filter)
+        if not desk_indices:
+            return Response(message=f"No desks match {describe_desk_filter(desk_filter)}.", ephemeral=True)
+        desks = [booking_day.desks[desk_index] for desk_index in desk_indices]
+
+        desk_numbers_str = "\n".join(self._desk_label(desk_index, booking_date) for desk_index in desk_indices)
+        desk_bookers_str = "\n".join(info.format_user(desk.booker) if desk.booker else "**Free**" for desk in desks)
+        desk_owners_str = "\n".join(info.format_user(desk.owner) if desk.owner else "**Flex**" for desk in desks)
+
+        description = booking_date.strftime("%A %Y-%m-%d")
+        if not desk_filter.is_empty():
+            description += f", {describe_desk_filter(desk_filter)}"
+        embed = (
+            discord.Embed(title="Desk availability", description=description)
+            .add_field(name="Desk", value=desk_numbers_str, inline=True)
+            .add_field(name="Booked by", value=desk_bookers_str, inline=True)
+            .add_field(name="Owner", value=desk_owners_str, inline=True)
         )
+        waitlist = self._database.state.waitlist(booking_date)
+        if waitlist:
+            embed.add_field(
+                name="Waitlist",
+                value="\n".join(f"{position}. {info.format_user(user)}" for position, user in enumerate(waitlist, 1)),
+                inline=False,
+            )
+        return Response(message="", ephemeral=True, embed=embed)
 
+    def _desk_label(self, desk_index: int, date: Date) -> str:
+        attributes = self._database.state.attributes(desk_index, date)
+        label = fmt.desk_index(desk_index)
+        if attributes.name is not None:
+            label += f" {attributes.name}"
+        if attributes.zone is not None:
+            label += f" ({attributes.zone})"
+        return label
+
+    @beartype
+    def week(self, info: CommandInfo, date_str: str | None) -> Response:
+        start_date, end_date = views.week_window(dates.get_booking_date(date_str, info.now))
+        return self._grid_response(f"Week of {fmt.date(start_date)}", start_date, end_date)
+
+    @beartype
+    def month(self, info: CommandInfo, date_str: str | None) -> Response:
+        start_date, end_date = views.month_window(dates.get_booking_date(date_str, info.now))
+        return self._grid_response(start_date.strftime("%B %Y"), start_date, end_date)
+
+    def _grid_response(self, title: str, start_date: Date, end_date: Date) -> Response:
+        start_date = max(start_date, self._database.state.start_date)
+        if end_date < start_date:
+            return Response(message="There are no bookings in that period.", ephemeral=True)
+        grid = self._views.grid(start_date, end_date)
         return Response(
             message="",
             ephemeral=True,
-            embed=discord.Embed(title="Desk availability", description=f"{booking_date.strftime('%A %Y-%m-%d')}")
-            .add_field(name="Desk", value=desk_numbers_str, inline=True)
-            .add_field(name="Booked by", value=desk_bookers_str, inline=True)
-            .add_field(name="Owner", value=desk_owners_str, inline=True),
+            embed=discord.Embed(title=title, description=f"```\n{grid}\n```").set_footer(text=views.GRID_LEGEND),
         )
 
     @beartype
@@ -111,12 +308,18 @@ class EADKBot:
         user_id: int | None,
         desk_num: int | None,
         end_date_str: str | None,
+        zone: str | None = None,
+        tags: str | None = None,
     ) -> Response:
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
         if user_id is None:
             user_id = info.author_id
+        desk_filter = parse_desk_filter(zone, tags)
 
         booking_date = dates.get_booking_date(date_str, info.now)
-        booking_day, _ = self._database.state.day(booking_date)
+        booking_day = self._database.day(booking_date)
         date_str = fmt.date(booking_date)
 
         end_date = dates.parse_date_arg(end_date_str, info.now.date()) if end_date_str is not None else None
@@ -131,16 +334,28 @@ class EADKBot:
             desk_index = desk_num - 1
         else:
             if end_date is not None:
-                return Response(message="A desk must be specified for range bookings.", ephemeral=True)
-            desk_index_option = booking_day.get_available_desk()
+                return self._book_range(info, user_id, booking_date, end_date, desk_filter)
+            if desk_filter.is_empty():
+                desk_index_option = booking_day.get_available_desk()
+            else:
+                desk_index_option = booking_day.get_available_desk(
+                    self._database.matching_desks(booking_date, desk_filter)
+                )
             if desk_index_option is not None:
                 desk_index = desk_index_option
                 desk_num = desk_index + 1
+            elif desk_filter.is_empty():
+                return self._join_waitlist(info, user_id, booking_date)
             else:
-                return Response(message=f"No more desks are available for booking on {date_str}.", ephemeral=True)
+                # The waitlist hands out any desk, so it cannot serve a filtered booking.
+                return Response(
+                    message=f"No desks matching {describe_desk_filter(desk_filter)} are available for booking "
+                    f"on {date_str}.",
+                    ephemeral=True,
+                )
 
         if end_date is not None:
-            days = self._database.state.day_range(booking_date, end_date)
+            days = self._database.day_range(booking_date, end_date)
             for day in days:
                 if day.desk(desk_index).owner is not info.author_id and not self._is_author_admin(info):
                     return Response(
@@ -152,10 +367,9 @@ class EADKBot:
             return Response(message="You do not have permission to book desks for other users.", ephemeral=True)
 
         self._database.handle_event(
-            Event(
-                author=info.author_id,
-                time=datetime.now(),
-                event=BookDesk(
+            self._event(
+                info,
+                BookDesk(
                     start_date=booking_date, end_date=end_date or booking_date, desk_index=desk_index, user=user_id
                 ),
             )
@@ -168,6 +382,109 @@ class EADKBot:
         else:
             return Response(message=f"Desk {desk_num} has been booked for {info.format_user(user_id)} on {date_str}.")
 
+    def _join_waitlist(self, info: CommandInfo, user_id: int, date: Date) -> Response:
+        """
+        Puts the user on the waitlist for a day on which every desk is booked.
+        """
+        date_str = fmt.date(date)
+        if user_id != info.author_id and not self._is_author_regular(info):
+            return Response(message="You do not have permission to book desks for other users.", ephemeral=True)
+        if self._database.day(date).booked_desks(user_id):
+            return Response(
+                message=f"No more desks are available for booking on {date_str}, "
+                f"and {info.format_user(user_id)} already has a desk booked.",
+                ephemeral=True,
+            )
+        waitlist = self._database.state.waitlist(date)
+        if user_id in waitlist:
+            return Response(
+                message=f"No more desks are available for booking on {date_str}. "
+                f"{info.format_user(user_id)} is number {waitlist.index(user_id) + 1} on the waitlist.",
+                ephemeral=True,
+            )
+        self._database.handle_event(self._event(info, JoinWaitlist(date=date, user=user_id)))
+        position = len(self._database.state.waitlist(date))
+        return Response(
+            message=f"No more desks are available for booking on {date_str}, so {info.format_user(user_id)} "
+            f"has been added to the waitlist as number {position}. "
+            "A desk will be booked for them as soon as one becomes free."
+        )
+
+    @beartype
+    def leave_waitlist(self, info: CommandInfo, date_str: str | None, user_id: int | None) -> Response:
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
+        if user_id is None:
+            user_id = info.author_id
+        date = dates.get_booking_date(date_str, info.now)
+        if user_id != info.author_id and not self._is_author_regular(info):
+            return Response(
+                message="You do not have permission to change the waitlist for other users.", ephemeral=True
+            )
+        self._database.handle_event(self._event(info, LeaveWaitlist(date=date, user=user_id)))
+        return Response(message=f"{info.format_user(user_id)} is no longer on the waitlist for {fmt.date(date)}.")
+
+    def _book_range(
+        self, info: CommandInfo, user_id: int, start_date: Date, end_date: Date, desk_filter: DeskFilter
+    ) -> Response:
+        """
+        Books a range of days on whichever desks are free, splitting the range across desks if necessary.
+        """
+        if user_id != info.author_id and not self._is_author_regular(info):
+            return Response(message="You do not have permission to book desks for other users.", ephemeral=True)
+        desks = None
+        if not self._is_author_admin(info):
+            # Only admins can make range bookings of desks they do not own.
+            days = self._database.day_range(start_date, end_date)
+            desks = [
+                desk_index
+                for desk_index in range(min(len(day.desks) for day in days))
+                if all(day.desks[desk_index].owner == info.author_id for day in days)
+            ]
+        if not desk_filter.is_empty():
+            # Only desks that match the filter on every day of the range are used.
+            days = self._database.day_range(start_date, end_date)
+            matching = set(self._database.matching_desks(start_date, desk_filter))
+            for day in days[1:]:
+                matching.intersection_update(self._database.matching_desks(day.date, desk_filter))
+            desks = sorted(matching if desks is None else matching.intersection(desks))
+        assignments = self._allocator.find(start_date, end_date, desks)
+        if assignments is None:
+            return Response(
+                message=f"No desks are available for booking from {fmt.date(start_date)} to {fmt.date(end_date)}.",
+                ephemeral=True,
+            )
+        for i, assignment in enumerate(assignments):
+            self._database.handle_event(
+                self._event(
+                    info,
+                    BookDesk(
+                        start_date=assignment.start_date,
+                        end_date=assignment.end_date,
+                        desk_index=assignment.desk_index,
+                        user=user_id,
+                    ),
+                    keyed=i == 0,
+                )
+            )
+        return Response(message=self._assignment_message(info.format_user(user_id), assignments))
+
+    @staticmethod
+    def _assignment_message(user: str, assignments: list[Assignment]) -> str:
+        if len(assignments) == 1:
+            assignment = assignments[0]
+            return (
+                f"Desk {fmt.desk_index(assignment.desk_index)} has been booked for {user} "
+                f"from {fmt.date(assignment.start_date)} to {fmt.date(assignment.end_date)}."
+            )
+        parts = [
+            f"desk {fmt.desk_index(assignment.desk_index)} from {fmt.date(assignment.start_date)} "
+            f"to {fmt.date(assignment.end_date)}"
+            for assignment in assignments
+        ]
+        return f"No single desk is free for the whole range, so desks have been booked for {user}: {', '.join(parts)}."
+
     @beartype
     def unbook(
         self,
@@ -177,12 +494,15 @@ class EADKBot:
         desk_num: int | None,
         end_date_str: str | None,
     ) -> Response:
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
         booking_date = dates.get_booking_date(date_str, info.now)
         date_str = fmt.date(booking_date)
 
         end_date = dates.parse_date_arg(end_date_str, info.now.date()) if end_date_str is not None else booking_date
 
-        booking_days = self._database.state.day_range(booking_date, end_date)
+        booking_days = self._database.day_range(booking_date, end_date)
 
         if booking_date < info.now.date():
             return Response(
@@ -226,11 +546,7 @@ class EADKBot:
 
         if len(booking_days) > 1:
             self._database.handle_event(
-                Event(
-                    author=info.author_id,
-                    time=datetime.now(),
-                    event=UnbookDesk(start_date=booking_date, end_date=end_date, desk_index=desk_index),
-                )
+                self._event(info, UnbookDesk(start_date=booking_date, end_date=end_date, desk_index=desk_index))
             )
             return Response(message=(f"Desk {desk_num} has been unbooked from {date_str} to {fmt.date(end_date)}."))
         else:
@@ -240,11 +556,7 @@ class EADKBot:
             desk_booker = booking_day.desk(desk_index).booker
             if desk_booker is not None:
                 self._database.handle_event(
-                    Event(
-                        author=info.author_id,
-                        time=datetime.now(),
-                        event=UnbookDesk(start_date=booking_date, end_date=booking_date, desk_index=desk_index),
-                    )
+                    self._event(info, UnbookDesk(start_date=booking_date, end_date=booking_date, desk_index=desk_index))
                 )
                 return Response(
                     message=f"Desk {desk_num} is no longer booked for {info.format_user(desk_booker)} on {date_str}."
@@ -253,7 +565,15 @@ class EADKBot:
                 return Response(message=f"Desk {desk_num} is already free on {date_str}.", ephemeral=True)
 
     @beartype
-    def makeowned(self, info: CommandInfo, start_date_str: str, user_id: int | None, desk_num: int) -> Response:
+    def makeowned(
+        self, info: CommandInfo, start_date_str: str, user_id: int | None, desk_num: int, preview: bool = False
+    ) -> Response:
+        """
+        If `preview` is set, nothing is changed and every conflict or change the command would cause is listed instead.
+        """
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
         booking_date = dates.get_booking_date(start_date_str, info.now)
         date_str = fmt.date(booking_date)
 
@@ -261,35 +581,185 @@ class EADKBot:
 
         if user_id is None:
             user_id = info.author_id
-        self._database.handle_event(
-            Event(
-                author=info.author_id,
-                time=datetime.now(),
-                event=MakeOwned(start_date=booking_date, desk_index=desk_index, user=user_id),
-            )
-        )
+        event = self._event(info, MakeOwned(start_date=booking_date, desk_index=desk_index, user=user_id))
+        if preview:
+            action = f"Making desk {desk_num} owned by {info.format_user(user_id)} from {date_str} onwards"
+            message = describe_preview(action, self._database.preview(event), info.format_user)
+            return Response(message=message, ephemeral=True)
+        self._database.handle_event(event)
         return Response(message=f"Desk {desk_num} is now owned by {info.format_user(user_id)} from {date_str} onwards.")
 
     @beartype
-    def makeflex(self, info: CommandInfo, start_date_str: str, desk_num: int) -> Response:
+    def makeflex(self, info: CommandInfo, start_date_str: str, desk_num: int, preview: bool = False) -> Response:
+        """
+        If `preview` is set, nothing is changed and every change the command would cause is listed instead.
+        """
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
         booking_date = dates.get_booking_date(start_date_str, info.now)
         date_str = fmt.date(booking_date)
 
         desk_index = desk_num - 1
 
-        self._database.handle_event(
-            Event(
-                author=info.author_id,
-                time=datetime.now(),
-                event=MakeFlex(start_date=booking_date, desk_index=desk_index),
+        event = self._event(info, MakeFlex(start_date=booking_date, desk_index=desk_index))
+        if preview:
+            action = f"Making desk {desk_num} a flex desk from {date_str} onwards"
+            message = describe_preview(action, self._database.preview(event), info.format_user)
+            return Response(message=message, ephemeral=True)
+        self._database.handle_event(event)
+        return Response(message=f"Desk {desk_num} is now a flex desk from {date_str} onwards.")
+
+    @beartype
+    def setdesk(
+        self,
+        info: CommandInfo,
+        start_date_str: str,
+        desk_num: int,
+        name: str | None,
+        zone: str | None,
+        tags: str | None,
+    ) -> Response:
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
+        booking_date = dates.get_booking_date(start_date_str, info.now)
+        event = SetDeskAttributes(
+            start_date=booking_date, desk_index=desk_num - 1, name=name, zone=zone, tags=sorted(parse_tags(tags))
+        )
+        self._database.handle_event(self._event(info, event))
+        return Response(message=f"{event.describe(info.format_user)}.")
+
+    @beartype
+    def checkin(self, info: CommandInfo) -> Response:
+        retried = self._retried_response(info)
+        if retried is not None:
+            return retried
+        today = info.now.date()
+        day = self._database.day(today)
+        desk_indices = [
+            desk_index for desk_index in day.booked_desks(info.author_id) if not day.desks[desk_index].checked_in
+        ]
+        if not desk_indices:
+            if day.booked_desks(info.author_id):
+                return Response(message="You have already checked in today.", ephemeral=True)
+            return Response(message=f"You have no desk booked on {fmt.date(today)}.", ephemeral=True)
+        for i, desk_index in enumerate(desk_indices):
+            self._database.handle_event(
+                self._event(info, CheckIn(date=today, desk_index=desk_index, user=info.author_id), keyed=i == 0)
+            )
+        desks = ", ".join(fmt.desk_index(desk_index) for desk_index in desk_indices)
+        return Response(message=f"{info.format_user(info.author_id)} has checked in at desk {desks}.")
+
+    @beartype
+    def digest(self, date: Date) -> str:
+        """
+        Returns a summary of the availability on the given date.
+        """
+        day = self._database.day(date)
+        free = [fmt.desk_index(desk_index) for desk_index, desk in enumerate(day.desks) if desk.booker is None]
+        summary = f"Good morning! {len(free)} of {len(day.desks)} desks are free on {date.strftime('%A %Y-%m-%d')}"
+        summary += f": desk {', '.join(free)}." if free else "."
+        waitlist = self._database.state.waitlist(date)
+        if waitlist:
+            summary += f" Waitlist: {len(waitlist)}."
+        return summary
+
+    @beartype
+    def unconfirmed_bookers(self, date: Date) -> list[int]:
+        """
+        Returns the users who have booked a desk on the given date without checking in. Owners booking their own desks
+        do not need to check in.
+        """
+        day = self._database.day(date)
+        return list(
+            dict.fromkeys(
+                desk.booker
+                for desk in day.desks
+                if desk.booker is not None and desk.booker != desk.owner and not desk.checked_in
             )
         )
-        return Response(message=f"Desk {desk_num} is now a flex desk from {date_str} onwards.")
+
+    @beartype
+    def release_unconfirmed(self, date: Date, format_user: Callable[[int], str]) -> str | None:
+        """
+        Unbooks the desks on the given date whose bookers have not checked in, handing them to the waitlist.
+        Returns a message listing the released desks, or None if no desk was released.
+        """
+        day = self._database.day(date)
+        released = [
+            (desk_index, desk.booker)
+            for desk_index, desk in enumerate(day.desks)
+            if desk.booker is not None and desk.booker != desk.owner and not desk.checked_in
+        ]
+        for desk_index, _ in released:
+            self._database.handle_event(
+                Event(
+                    author=None,
+                    time=datetime.now(),
+                    event=UnbookDesk(start_date=date, end_date=date, desk_index=desk_index),
+                )
+            )
+        if not released:
+            return None
+        desks = ", ".join(
+            f"desk {fmt.desk_index(desk_index)} ({format_user(booker)})" for desk_index, booker in released
+        )
+        return f"Released bookings that were not checked in on {fmt.date(date)}: {desks}."
+
+    @beartype
+    def history(
+        self, info: CommandInfo, date_str: str | None, user_id: int | None, desk_num: int | None, page: int
+    ) -> Response:
+        history_date = dates.parse_date_arg(date_str, info.now.date()) if date_str is not None else None
+        desk_index = desk_num - 1 if desk_num is not None else None
+
+        indices = self._database.query_events(date=history_date, desk=desk_index, user=user_id)
+        num_pages = max(1, math.ceil(len(indices) / HISTORY_PAGE_SIZE))
+        if page < 1 or page > num_pages:
+            return Response(message=f"Page {page} does not exist. There are {num_pages} pages.", ephemeral=True)
+
+        # Newest events first.
+        end = len(indices) - (page - 1) * HISTORY_PAGE_SIZE
+        lines = []
+        for index in reversed(indices[max(0, end - HISTORY_PAGE_SIZE) : end]):
+            event = self._database.event(index)
+            author = info.format_user(event.author) if event.author is not None else "System"
+            lines.append(
+                f"`#{index}` {event.time.strftime('%Y-%m-%d %H:%M')} {author}: {event.event.describe(info.format_user)}"
+            )
+
+        return Response(
+            message="",
+            ephemeral=True,
+            embed=discord.Embed(title="Event history", description="\n".join(lines) or "No events found.").set_footer(
+                text=f"Page {page} of {num_pages}"
+            ),
+        )
+
+    @beartype
+    @staticmethod
+    def waitlist_notifications(diff: Diff, format_user: Callable[[int], str]) -> list[str]:
+        """
+        Returns a message for each desk that an event booked for a user on the waitlist.
+        """
+        if not isinstance(diff.event.event, UnbookDesk | MakeFlex | SetNumDesks):
+            return []
+        return [
+            f"{format_user(change.booker_after)}, desk {fmt.desk_index(change.desk_index)} has become free "
+            f"and has been booked for you on {fmt.date(change.date)}."
+            for change in diff.desks
+            if change.booker_after is not None and change.booker_before != change.booker_after
+        ]
 
     @beartype
     def handle_error(self, info: CommandInfo, error: AppCommandError) -> Response:  # pragma: no cover
         match error:
-            case discord.app_commands.errors.MissingAnyRole() | discord.app_commands.errors.MissingRole():
+            case (
+                discord.app_commands.errors.MissingAnyRole()
+                | discord.app_commands.errors.MissingRole()
+                | discord.app_commands.errors.MissingPermissions()
+            ):
                 return Response(message="You do not have permission to run this command.", ephemeral=True)
             case discord.app_commands.errors.CheckFailure():
                 return Response(message="This command can only be used in the office channel.", ephemeral=True)
@@ -1,28 +1,56 @@
 # pragma: coverage exclude file
+import asyncio
 import logging
-from collections.abc import Sequence
-from datetime import date, datetime
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
 
 import discord
+from aiohttp import web
 from discord import Intents, Interaction, Member, app_commands
-from discord.abc import Snowflake
+from discord.abc import GuildChannel, Snowflake
 from discord.app_commands import AppCommandError, Choice, Range
 from discord.ext import commands
 from discord.ext.commands import Bot, Context
 from pydantic import BaseModel
 
-from eadk_discord.bot import CommandInfo, EADKBot, Response
+from eadk_discord.api import AvailabilityApi, metrics_route, serve
+from eadk_discord.bot import TIME_ZONE, CommandInfo, EADKBot, Response
 from eadk_discord.database import Database
-from eadk_discord.database.event import Event, SetNumDesks
+from eadk_discord.database.bus import ChangeBus, Subscription
+from eadk_discord.database.follower import Follower, LeaderLock
+from eadk_discord.deadline import InteractionDeadline
+from eadk_discord.export import CsvSink, Exporter
+from eadk_discord.office import (
+    DEFAULT_MAX_OPEN_TENANTS,
+    OfficeConfig,
+    TenantPool,
+    create_database,
+    open_databases,
+    tenant_database_path,
+)
+from eadk_discord.profiling import PROFILER_MODES, CommandProfiler, ProfilerMode
+from eadk_discord.scheduler import Scheduler
+from eadk_discord.watchdog import LoopWatchdog
 
 INTERNAL_ERROR_MESSAGE = "INTERNAL ERROR HAS OCCURRED BEEP BOOP"
+# The journal is folded into the database file once it has this many entries.
+JOURNAL_COMPACTION_ENTRIES = 1000
+# How far into the future the exported calendar grid goes.
+EXPORT_DAYS_AHEAD = 90
+# Name of the office configured by the top-level `database_path` and `channel_ids`.
+MAIN_OFFICE = "main"
 
 
 def author_id(interaction: Interaction) -> int:
     return interaction.user.id
 
 
+def mention(user: int) -> str:
+    return f"<@{user}>"
+
+
 async def date_autocomplete(interaction: Interaction, current: str) -> list[Choice[str]]:
     options = ["today", "tomorrow", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
     return [Choice(name=option, value=option) for option in options if option.startswith(current.lower())]
@@ -35,31 +63,132 @@ class BotConfig(BaseModel):
     channel_ids: Sequence[int]
     regular_role_ids: Sequence[int]
     admin_role_ids: Sequence[int]
+    # Further offices, each with its own desks, ledger and channels.
+    offices: Sequence[OfficeConfig] = []
+    # Directory with a database for each guild that has no office configured, for hosting many guilds. Commands in
+    # such guilds are accepted in any channel, and the guild's database is created on first use. The configured roles
+    # do not apply there, so members who may manage such a guild are its admins.
+    tenant_directory: Path | None = None
+    # Number of guild databases to keep open. The least recently used one is flushed and closed to open another.
+    max_open_tenants: int = DEFAULT_MAX_OPEN_TENANTS
+    # Events older than this many days are moved to the archive on startup.
+    archive_after_days: int | None = None
+    # Days older than this many days are dropped from memory and rebuilt from the ledger if needed.
+    retention_days: int | None = None
+    # Directory to keep an up-to-date CSV calendar of desks and days in.
+    export_directory: Path | None = None
+    # Port to serve the read-only availability API on. The API is not served if this is not set.
+    api_port: int | None = None
+    api_host: str = "127.0.0.1"
+    # Local times of the daily availability digest, the check-in reminder and the release of bookings that have not
+    # been checked in. Each is disabled if not set.
+    digest_time: time | None = None
+    checkin_reminder_time: time | None = None
+    checkin_cutoff_time: time | None = None
+    # Seconds the event loop may be blocked before the blocking code is logged. The loop lag is served along with the
+    # number of deferred and late interactions as metrics at /metrics of the API. The loop is not watched if this is
+    # not set.
+    loop_lag_threshold: float | None = 1.0
+    # Directory to write the profiles of commands in, "profiles" next to the database if not set. Commands are profiled
+    # on demand by the bot's owner with `!profile`, or from startup for the given number of invocations of each command
+    # in `profile_commands`, which the environment variable EADK_DISCORD_PROFILE overrides, e.g. "book=10,info=5".
+    profile_directory: Path | None = None
+    profile_commands: dict[str, int] = {}
+    profile_mode: ProfilerMode = "sampling"
 
     def guilds(self) -> Sequence[Snowflake]:
         return [discord.Object(id=int(guild_id)) for guild_id in self.guild_ids]
 
-    def setup_bot(self) -> Bot:
-        database_path = self.database_path
+    def office_configs(self) -> list[OfficeConfig]:
+        main = OfficeConfig(name=MAIN_OFFICE, database_path=self.database_path, channel_ids=self.channel_ids)
+        return [main, *self.offices]
+
+    def setup_bot(self, database: Database | None = None) -> Bot:
+        """
+        Sets up the bot. `database` is the already opened database of the main office, if any.
+        """
         guilds = self.guilds()
-        if database_path.exists():
-            database = Database.load(database_path)
+        office_configs = self.office_configs()
+        for office_config in office_configs:
+            create_database(office_config.database_path, date.today())
+        # Events are appended to each database's journal, so other processes can use the databases at the same time.
+        if database is None:
+            databases = open_databases([office_config.database_path for office_config in office_configs])
         else:
-            database = Database.initialize(date.today())
-            database.handle_event(
-                Event(author=None, time=datetime.now(), event=SetNumDesks(date=date.today(), num_desks=6))
-            )
-        database.save(database_path)
+            databases = [database, *open_databases([office_config.database_path for office_config in self.offices])]
 
         intents: Intents = discord.Intents.default()
         intents.message_content = True
         intents.members = True
-
-        eadk_bot = EADKBot(database, set(self.regular_role_ids), set(self.admin_role_ids))
         bot = Bot(command_prefix="!", intents=intents)
 
+        offices = [
+            Office(self, office_config, office_database, bot)
+            for office_config, office_database in zip(office_configs, databases, strict=True)
+        ]
+        offices_by_channel = {channel_id: office for office in offices for channel_id in office.channel_ids}
+        for office in offices:
+            office.prepare()
+
+        def open_tenant(guild_id: int) -> Office:
+            assert self.tenant_directory is not None
+            path = tenant_database_path(self.tenant_directory, guild_id)
+            create_database(path, date.today())
+            office_config = OfficeConfig(name=f"guild-{guild_id}", database_path=path, channel_ids=[])
+            office = Office(self, office_config, Database.open(path), bot, guild_id)
+            office.prepare()
+            office.start()
+            logging.info(f"Opened the database of guild {guild_id}")
+            return office
+
+        tenants = TenantPool(open_tenant, Office.close, self.max_open_tenants)
+        # Commands are responded to through this, so interactions are deferred if the response might be late.
+        profiler = CommandProfiler(self.profile_directory or self.database_path.parent / "profiles")
+        for command_name, invocations in self.profile_commands.items():
+            profiler.arm(command_name, invocations, self.profile_mode)
+        deadline = InteractionDeadline(profiler=profiler)
+
+        def office_guild_ids() -> set[int]:
+            channels = (bot.get_channel(channel_id) for channel_id in offices_by_channel)
+            return {channel.guild.id for channel in channels if isinstance(channel, GuildChannel)}
+
+        def is_tenant(interaction: Interaction) -> bool:
+            return (
+                self.tenant_directory is not None
+                and interaction.guild_id is not None
+                and interaction.guild_id not in office_guild_ids()
+            )
+
+        @contextmanager
+        def office_for(interaction: Interaction) -> Iterator[Office]:
+            """
+            Gets the office the interaction is in. A guild's office is kept open until the block ends, so it is not
+            closed while the command awaits Discord, e.g. to defer, before changing it.
+            """
+            office = offices_by_channel.get(interaction.channel_id) if interaction.channel_id is not None else None
+            if office is None and is_tenant(interaction):
+                assert interaction.guild_id is not None
+                with tenants.use(interaction.guild_id) as tenant:
+                    yield tenant
+                return
+            if office is None:
+                raise app_commands.CheckFailure()
+            yield office
+
         async def channel_check(interaction: Interaction[discord.Client]) -> bool:
-            return interaction.channel_id in self.channel_ids
+            return interaction.channel_id in offices_by_channel or is_tenant(interaction)
+
+        async def admin_check(interaction: Interaction[discord.Client]) -> bool:
+            # Guilds hosted as tenants have no configured roles, so their admins are those who may manage the guild.
+            if is_tenant(interaction):
+                if not interaction.permissions.manage_guild:
+                    raise app_commands.MissingPermissions(["manage_guild"])
+                return True
+            if isinstance(interaction.user, Member) and any(
+                role.id in self.admin_role_ids for role in interaction.user.roles
+            ):
+                return True
+            raise app_commands.MissingAnyRole(list(self.admin_role_ids))
 
         @bot.tree.command(name="info", description="Get current booking status.", guilds=guilds)
         @app_commands.autocomplete(date_arg=date_autocomplete)
@@ -68,11 +197,44 @@ class BotConfig(BaseModel):
         async def info(
             interaction: Interaction,
             date_arg: str | None,
+            zone: str | None,
+            tags: str | None,
         ) -> None:
-            await eadk_bot.info(
-                CommandInfo.from_interaction(interaction),
-                date_arg,
-            ).send(interaction)
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.info(
+                        CommandInfo.from_interaction(interaction),
+                        date_arg,
+                        zone,
+                        tags,
+                    ),
+                    office.read,
+                )
+
+        @bot.tree.command(name="week", description="Get the booking status of a week.", guilds=guilds)
+        @app_commands.autocomplete(date_arg=date_autocomplete)
+        @app_commands.rename(date_arg="date")
+        @app_commands.check(channel_check)
+        async def week(interaction: Interaction, date_arg: str | None) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.week(CommandInfo.from_interaction(interaction), date_arg),
+                    office.read,
+                )
+
+        @bot.tree.command(name="month", description="Get the booking status of a month.", guilds=guilds)
+        @app_commands.autocomplete(date_arg=date_autocomplete)
+        @app_commands.rename(date_arg="date")
+        @app_commands.check(channel_check)
+        async def month(interaction: Interaction, date_arg: str | None) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.month(CommandInfo.from_interaction(interaction), date_arg),
+                    office.read,
+                )
 
         @bot.tree.command(name="book", description="Book a desk.", guilds=guilds)
         @app_commands.autocomplete(booking_date_arg=date_autocomplete)
@@ -84,15 +246,23 @@ class BotConfig(BaseModel):
             user: Member | None,
             desk_num_arg: Range[int, 1] | None,
             end_date_arg: str | None,
+            zone: str | None,
+            tags: str | None,
         ) -> None:
-            await eadk_bot.book(
-                CommandInfo.from_interaction(interaction),
-                booking_date_arg,
-                user.id if user else None,
-                desk_num_arg,
-                end_date_arg,
-            ).send(interaction)
-            database.save(database_path)
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.book(
+                        CommandInfo.from_interaction(interaction),
+                        booking_date_arg,
+                        user.id if user else None,
+                        desk_num_arg,
+                        end_date_arg,
+                        zone,
+                        tags,
+                    ),
+                    office.change,
+                )
 
         @bot.tree.command(name="unbook", description="Unbook a desk.", guilds=guilds)
         @app_commands.autocomplete(booking_date_arg=date_autocomplete)
@@ -105,14 +275,46 @@ class BotConfig(BaseModel):
             desk_num_arg: Range[int, 1] | None,
             end_date_arg: str | None,
         ) -> None:
-            await eadk_bot.unbook(
-                CommandInfo.from_interaction(interaction),
-                booking_date_arg,
-                user.id if user else None,
-                desk_num_arg,
-                end_date_arg,
-            ).send(interaction)
-            database.save(database_path)
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.unbook(
+                        CommandInfo.from_interaction(interaction),
+                        booking_date_arg,
+                        user.id if user else None,
+                        desk_num_arg,
+                        end_date_arg,
+                    ),
+                    office.change,
+                )
+
+        @bot.tree.command(
+            name="leavewaitlist", description="Stop waiting for a desk on a fully booked day.", guilds=guilds
+        )
+        @app_commands.autocomplete(date_arg=date_autocomplete)
+        @app_commands.rename(date_arg="date")
+        @app_commands.check(channel_check)
+        async def leavewaitlist(interaction: Interaction, date_arg: str | None, user: Member | None) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.leave_waitlist(
+                        CommandInfo.from_interaction(interaction), date_arg, user.id if user else None
+                    ),
+                    office.change,
+                )
+
+        @bot.tree.command(
+            name="checkin", description="Confirm that you are using the desk you booked today.", guilds=guilds
+        )
+        @app_commands.check(channel_check)
+        async def checkin(interaction: Interaction) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.checkin(CommandInfo.from_interaction(interaction)),
+                    office.change,
+                )
 
         @bot.tree.command(
             name="makeowned",
@@ -122,17 +324,26 @@ class BotConfig(BaseModel):
         @app_commands.autocomplete(start_date_str=date_autocomplete)
         @app_commands.rename(start_date_str="start_date", desk="desk_id")
         @app_commands.check(channel_check)
-        @app_commands.checks.has_any_role(*self.admin_role_ids)
+        @app_commands.check(admin_check)
         async def makeowned(
             interaction: Interaction,
             start_date_str: str,
             user: Member | None,
             desk: Range[int, 1],
+            preview: bool = False,
         ) -> None:
-            await eadk_bot.makeowned(
-                CommandInfo.from_interaction(interaction), start_date_str, user.id if user else None, desk
-            ).send(interaction)
-            database.save(database_path)
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.makeowned(
+                        CommandInfo.from_interaction(interaction),
+                        start_date_str,
+                        user.id if user else None,
+                        desk,
+                        preview,
+                    ),
+                    office.change,
+                )
 
         @bot.tree.command(
             name="makeflex", description="Make a desk a flex desk from a specific date onwards", guilds=guilds
@@ -140,10 +351,69 @@ class BotConfig(BaseModel):
         @app_commands.autocomplete(start_date_str=date_autocomplete)
         @app_commands.rename(start_date_str="start_date", desk="desk_id")
         @app_commands.check(channel_check)
-        @app_commands.checks.has_any_role(*self.admin_role_ids)
-        async def makeflex(interaction: Interaction, start_date_str: str, desk: Range[int, 1]) -> None:
-            await eadk_bot.makeflex(CommandInfo.from_interaction(interaction), start_date_str, desk).send(interaction)
-            database.save(database_path)
+        @app_commands.check(admin_check)
+        async def makeflex(
+            interaction: Interaction, start_date_str: str, desk: Range[int, 1], preview: bool = False
+        ) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.makeflex(
+                        CommandInfo.from_interaction(interaction), start_date_str, desk, preview
+                    ),
+                    office.change,
+                )
+
+        @bot.tree.command(
+            name="setdesk",
+            description="Set a desk's name, zone and comma-separated tags from a specific date onwards",
+            guilds=guilds,
+        )
+        @app_commands.autocomplete(start_date_str=date_autocomplete)
+        @app_commands.rename(start_date_str="start_date", desk="desk_id")
+        @app_commands.check(channel_check)
+        @app_commands.check(admin_check)
+        async def setdesk(
+            interaction: Interaction,
+            start_date_str: str,
+            desk: Range[int, 1],
+            name: str | None,
+            zone: str | None,
+            tags: str | None,
+        ) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.setdesk(
+                        CommandInfo.from_interaction(interaction), start_date_str, desk, name, zone, tags
+                    ),
+                    office.change,
+                )
+
+        @bot.tree.command(name="history", description="Show the events affecting a date, desk or user", guilds=guilds)
+        @app_commands.autocomplete(date_arg=date_autocomplete)
+        @app_commands.rename(date_arg="date", desk_num_arg="desk_id")
+        @app_commands.check(channel_check)
+        @app_commands.check(admin_check)
+        async def history(
+            interaction: Interaction,
+            date_arg: str | None,
+            user: Member | None,
+            desk_num_arg: Range[int, 1] | None,
+            page: Range[int, 1] = 1,
+        ) -> None:
+            with office_for(interaction) as office:
+                await deadline.respond(
+                    interaction,
+                    lambda: office.eadk_bot.history(
+                        CommandInfo.from_interaction(interaction),
+                        date_arg,
+                        user.id if user else None,
+                        desk_num_arg,
+                        page,
+                    ),
+                    office.read,
+                )
 
         @bot.command()
         @commands.is_owner()
@@ -160,14 +430,61 @@ class BotConfig(BaseModel):
             synced_commands = await ctx.bot.tree.sync()
             logging.info(f"Synced {synced_commands} commands globally")
 
+        @bot.command()
+        @commands.is_owner()
+        async def profile(ctx: Context, command_name: str, invocations: int = 10, mode: str = "sampling") -> None:
+            """Profile the next invocations of a command"""
+            if invocations < 1:
+                profiler.disarm(command_name)
+                await ctx.send(f"Stopped profiling /{command_name}.")
+                return
+            if mode not in PROFILER_MODES:
+                await ctx.send(f"Unknown profiler {mode}, expected one of {', '.join(PROFILER_MODES)}.")
+                return
+            profiler.arm(command_name, invocations, "cprofile" if mode == "cprofile" else "sampling")
+            await ctx.send(
+                f"Profiling the next {invocations} invocations of /{command_name} with {mode}, "
+                f"writing the results to {profiler.directory}."
+            )
+
+        watchdog = LoopWatchdog(self.loop_lag_threshold) if self.loop_lag_threshold is not None else None
+        if watchdog is not None:
+            for guild in [None, *guilds]:
+                for command in bot.tree.walk_commands(guild=guild):
+                    if isinstance(command, app_commands.Command):
+                        watchdog.register_command(command.qualified_name, command.callback)
+
+        api_runner: web.AppRunner | None = None
+        started = False
+
         @bot.event
         async def on_ready() -> None:
+            nonlocal api_runner, started
             logging.info(f"We have logged in as {bot.user}")
+            # on_ready is called again after reconnecting.
+            if not started:
+                started = True
+                for office in offices:
+                    office.start()
+                if watchdog is not None:
+                    watchdog.start()
+            if self.api_port is not None and api_runner is None:
+                # The main office is served at the root, and the other offices under /offices/<name>/.
+                app = AvailabilityApi(offices[0].database, lock=offices[0].lock).app()
+                for office in offices[1:]:
+                    app.add_subapp(f"/offices/{office.name}/", AvailabilityApi(office.database, lock=office.lock).app())
+                app.add_routes(
+                    [metrics_route(lambda: deadline.metrics() + (watchdog.metrics() if watchdog is not None else ""))]
+                )
+                api_runner = await serve(app, self.api_host, self.api_port)
+                logging.info(f"Serving the availability API on {self.api_host}:{self.api_port}")
 
         @bot.tree.error
         async def on_error(interaction: Interaction, error: AppCommandError) -> None:
             try:
-                await eadk_bot.handle_error(CommandInfo.from_interaction(interaction), error).send(interaction)
+                await (
+                    offices[0].eadk_bot.handle_error(CommandInfo.from_interaction(interaction), error).send(interaction)
+                )
             except Exception:
                 await Response(message=INTERNAL_ERROR_MESSAGE, ephemeral=True).send(interaction)
                 raise
@@ -175,6 +492,191 @@ class BotConfig(BaseModel):
         return bot
 
     def run_bot(self) -> Bot:
-        bot = self.setup_bot()
+        # The main office's database decides which bot process serves every office.
+        leader_lock = LeaderLock(self.database_path)
+        database = None
+        if not leader_lock.try_acquire():
+            # Another bot serves this database. Keep a warm copy of it and take over when that bot stops.
+            logging.info("Another bot is running, waiting in standby")
+            follower = Follower(self.database_path)
+            database = follower.follow()
+            leader_lock = follower.leader_lock
+            logging.info(f"Promoted to leader with {database.num_events} events")
+        bot = self.setup_bot(database)
         bot.run(self.bot_token)
+        leader_lock.release()
         return bot
+
+
+class Office:
+    """
+    Everything the bot keeps for one office: its database, the command logic and the consumers of its state changes.
+    Offices share nothing, so each office's ledger, journal, export and scheduled jobs are written independently.
+    """
+
+    name: str
+    database_path: Path
+    channel_ids: Sequence[int]
+    database: Database
+    eadk_bot: EADKBot
+    scheduler: Scheduler
+    # Held while a command, a job or the API uses the database, since commands run in worker threads.
+    lock: asyncio.Lock
+    _config: BotConfig
+    _bot: Bot
+    # Consumers of state changes subscribe to this bus.
+    _change_bus: ChangeBus
+    _exporter: Exporter | None
+    _tasks: list[asyncio.Task[None]]
+    # The guild of an office that has no channels configured, whose system channel is posted to instead.
+    _guild_id: int | None
+
+    def __init__(
+        self, config: BotConfig, office_config: OfficeConfig, database: Database, bot: Bot, guild_id: int | None = None
+    ) -> None:
+        self.name = office_config.name
+        self.database_path = office_config.database_path
+        self.channel_ids = office_config.channel_ids
+        self.database = database
+        if guild_id is None:
+            self.eadk_bot = EADKBot(database, set(config.regular_role_ids), set(config.admin_role_ids))
+        else:
+            # Roles belong to a single guild, so the configured roles mean nothing in a guild hosted as a tenant.
+            self.eadk_bot = EADKBot(database, set(), set(), guild_permissions=True)
+        self._config = config
+        self._bot = bot
+        self._change_bus = ChangeBus()
+        database.subscribe(self._change_bus.publish)
+        self._tasks = []
+        self._guild_id = guild_id
+        self.lock = asyncio.Lock()
+
+        export_directory = config.export_directory
+        if export_directory is not None and self.name != MAIN_OFFICE:
+            export_directory = export_directory / self.name
+        self._exporter = Exporter(database, CsvSink(export_directory), self._format_user) if export_directory else None
+
+        # Pending jobs are kept next to the database, so they survive restarts.
+        self.scheduler = Scheduler(self.database_path.with_name(f"{self.database_path.name}.jobs"), TIME_ZONE)
+        if config.digest_time is not None:
+            self.scheduler.daily("digest", config.digest_time, self._send_digest)
+        if config.checkin_reminder_time is not None:
+            self.scheduler.daily("checkin_reminder", config.checkin_reminder_time, self._remind_checkin)
+        if config.checkin_cutoff_time is not None:
+            self.scheduler.daily("checkin_cutoff", config.checkin_cutoff_time, self._release_unconfirmed)
+
+    def prepare(self) -> None:
+        """
+        Compacts, archives and exports the office's ledger on startup.
+        """
+        database = self.database
+        database.save(self.database_path)
+        if self._config.retention_days is not None:
+            database.evict_before(date.today() - timedelta(days=self._config.retention_days))
+        if self._config.archive_after_days is not None:
+            archived = database.archive_before(
+                self.database_path, datetime.now() - timedelta(days=self._config.archive_after_days)
+            )
+            logging.info(f"Archived {archived} events of office {self.name}")
+        self._export()
+
+    def start(self) -> None:
+        """
+        Starts the office's background tasks. Must be called from the event loop.
+        """
+        self._tasks.append(asyncio.create_task(self._notify_waitlist(self._change_bus.subscribe())))
+        self._tasks.append(asyncio.create_task(self.scheduler.run()))
+
+    def close(self) -> None:
+        """
+        Stops the office's background tasks, flushes its database and closes its journal and archive. Pending jobs run
+        once it is opened again.
+        """
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        self.database.unsubscribe(self._change_bus.publish)
+        self.database.save(self.database_path)
+        self._export()
+        self.database.detach_journal()
+        if self.database.archive is not None:
+            self.database.archive.close()
+
+    async def read(self, work: Callable[[], Response]) -> Response:
+        """
+        Runs a command's work in a worker thread, so that the event loop keeps serving other interactions meanwhile.
+        """
+        async with self.lock:
+            return await asyncio.to_thread(self._synced, work)
+
+    async def change(self, work: Callable[[], Response]) -> Response:
+        """
+        Runs a command's work like `read` and persists the office before the response is sent.
+        """
+        async with self.lock:
+            response = await asyncio.to_thread(self._synced, work)
+            await self.persist()
+            return response
+
+    def _synced(self, work: Callable[[], Response]) -> Response:
+        # Another process may have changed the office's ledger since the last command.
+        self.database.sync()
+        return work()
+
+    async def persist(self) -> None:
+        journal = self.database.journal
+        if journal is not None and journal.num_entries >= JOURNAL_COMPACTION_ENTRIES:
+            self.database.save(self.database_path)
+        if self._config.retention_days is not None:
+            self.database.evict_before(date.today() - timedelta(days=self._config.retention_days))
+        self.database.prune_waitlists(date.today())
+        self._export()
+        # Slows down commands if consumers of state changes fall behind.
+        await self._change_bus.drain()
+
+    def _format_user(self, user: int) -> str:
+        discord_user = self._bot.get_user(user)
+        return discord_user.display_name if discord_user is not None else str(user)
+
+    def _export(self) -> None:
+        if self._exporter is not None:
+            self._exporter.export(date.today() + timedelta(days=EXPORT_DAYS_AHEAD))
+
+    async def _post(self, message: str) -> None:
+        if self.channel_ids:
+            channel = self._bot.get_channel(self.channel_ids[0])
+        else:
+            guild = self._bot.get_guild(self._guild_id) if self._guild_id is not None else None
+            channel = guild.system_channel if guild is not None else None
+        if isinstance(channel, discord.abc.Messageable):
+            await channel.send(message)
+
+    async def _notify_waitlist(self, changes: Subscription) -> None:
+        async for diff in changes:
+            for message in EADKBot.waitlist_notifications(diff, mention):
+                await self._post(message)
+
+    async def _send_digest(self, day: date) -> None:
+        async with self.lock:
+            self.database.sync()
+            digest = self.eadk_bot.digest(day)
+        await self._post(digest)
+
+    async def _remind_checkin(self, day: date) -> None:
+        async with self.lock:
+            self.database.sync()
+            users = self.eadk_bot.unconfirmed_bookers(day)
+        if users:
+            cutoff_time = self._config.checkin_cutoff_time
+            cutoff = f" before {cutoff_time.strftime('%H:%M')}" if cutoff_time is not None else ""
+            await self._post(
+                f"{' '.join(mention(user) for user in users)} please use /checkin{cutoff} to confirm your booking."
+            )
+
+    async def _release_unconfirmed(self, day: date) -> None:
+        async with self.lock:
+            self.database.sync()
+            message = self.eadk_bot.release_unconfirmed(day, mention)
+            await self.persist()
+        if message is not None:
+            await self._post(message)
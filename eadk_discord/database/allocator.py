@@ -0,0 +1,193 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from datetime import date as Date  # noqa: N812
+
+from beartype import beartype
+from pydantic import BaseModel, Field
+
+from .database import Database
+from .diff import Diff
+from .event_errors import InvalidDateRangeError
+from .state import Day
+from .typecheck import unchecked
+
+# Ordinal used as the end of intervals that never end.
+FOREVER = Date.max.toordinal()
+
+
+class Assignment(BaseModel):
+    desk_index: int = Field()
+    start_date: Date = Field()
+    end_date: Date = Field()
+
+
+class BusyIntervals:
+    """
+    The days on which a desk cannot be booked, as sorted disjoint intervals of date ordinals with inclusive ends.
+    """
+
+    starts: list[int]
+    ends: list[int]
+
+    def __init__(self) -> None:
+        self.starts = []
+        self.ends = []
+
+    @unchecked
+    def set(self, start: int, end: int, busy: bool) -> None:
+        """
+        Marks the days from `start` to `end` as busy or free.
+        """
+        # Intervals [i, j) overlap or are adjacent to the days being set.
+        i = bisect_left(self.ends, start - 1)
+        j = bisect_right(self.starts, end + 1)
+        pieces = []
+        if busy:
+            if i < j:
+                pieces.append((min(start, self.starts[i]), max(end, self.ends[j - 1])))
+            else:
+                pieces.append((start, end))
+        elif i < j:
+            if self.starts[i] < start:
+                pieces.append((self.starts[i], start - 1))
+            if self.ends[j - 1] > end:
+                pieces.append((end + 1, self.ends[j - 1]))
+        self.starts[i:j] = [piece_start for piece_start, _ in pieces]
+        self.ends[i:j] = [piece_end for _, piece_end in pieces]
+
+
+class RangeAllocator:
+    """
+    Finds desks that are free for a range of days.
+
+    Busy days are kept per desk as sorted intervals, so checking a desk takes a binary search regardless of the length
+    of the range. The intervals are built from the state on first use and kept up to date from the state's diffs.
+    Only days from the earliest date queried so far are tracked.
+    """
+
+    _database: Database
+    # Busy intervals per desk, or None if they must be rebuilt.
+    _desks: list[BusyIntervals] | None
+    # Ordinal of the first tracked day.
+    _floor: int
+
+    @beartype
+    def __init__(self, database: Database) -> None:
+        self._database = database
+        self._desks = None
+        self._floor = FOREVER
+        database.subscribe(self._update)
+
+    @beartype
+    def find(self, start_date: Date, end_date: Date, desks: Sequence[int] | None = None) -> list[Assignment] | None:
+        """
+        Returns an assignment of desks covering every day from `start_date` to `end_date`, or None if there is a day
+        on which no desk is free. Only the given desks are considered, or every desk if None.
+
+        A single desk is used if possible, preferring the desk whose free period fits the range most tightly so that
+        longer free periods are kept for longer bookings. Otherwise the range is split across as few desks as possible.
+        """
+        if end_date < start_date:
+            raise InvalidDateRangeError(start_date=start_date, end_date=end_date)
+        start, end = start_date.toordinal(), end_date.toordinal()
+        intervals = self._intervals(start)
+        candidates = range(len(intervals)) if desks is None else desks
+        desk_index = self._best_fit(intervals, candidates, start, end)
+        if desk_index is not None:
+            return [Assignment(desk_index=desk_index, start_date=start_date, end_date=end_date)]
+        assignments = []
+        while start <= end:
+            desk_index, reach = self._furthest_reach(intervals, candidates, start)
+            if desk_index is None:
+                return None
+            reach = min(reach, end)
+            assignments.append(
+                Assignment(desk_index=desk_index, start_date=Date.fromordinal(start), end_date=Date.fromordinal(reach))
+            )
+            start = reach + 1
+        return assignments
+
+    @unchecked
+    def _best_fit(self, intervals: list[BusyIntervals], candidates: Sequence[int], start: int, end: int) -> int | None:
+        best = None
+        best_slack = 0
+        for desk_index in candidates:
+            desk = intervals[desk_index]
+            i = bisect_right(desk.starts, end)
+            if i and desk.ends[i - 1] >= start:
+                continue
+            previous_end = desk.ends[i - 1] if i else self._floor - 1
+            next_start = desk.starts[i] if i < len(desk.starts) else FOREVER
+            slack = (start - previous_end) + (next_start - end)
+            if best is None or slack < best_slack:
+                best, best_slack = desk_index, slack
+        return best
+
+    @unchecked
+    def _furthest_reach(
+        self, intervals: list[BusyIntervals], candidates: Sequence[int], start: int
+    ) -> tuple[int | None, int]:
+        """
+        Returns the desk that is free from `start` for the longest, and the last day it is free.
+        """
+        best = None
+        best_reach = start - 1
+        for desk_index in candidates:
+            desk = intervals[desk_index]
+            i = bisect_right(desk.starts, start)
+            if i and desk.ends[i - 1] >= start:
+                continue
+            reach = desk.starts[i] - 1 if i < len(desk.starts) else FOREVER
+            if reach > best_reach:
+                best, best_reach = desk_index, reach
+        return best, best_reach
+
+    def _intervals(self, floor: int) -> list[BusyIntervals]:
+        if self._desks is None or floor < self._floor:
+            self._build(min(floor, self._floor))
+        assert self._desks is not None
+        return self._desks
+
+    def _build(self, floor: int) -> None:
+        floor = max(floor, self._database.state.start_date.toordinal())
+        last_date = max(Date.fromordinal(floor), self._database.state.days[-1].date)
+        days = self._database.day_range(Date.fromordinal(floor), last_date)
+        desks = [BusyIntervals() for _ in range(max(len(day.desks) for day in days))]
+        for desk_index, desk in enumerate(desks):
+            run_start = None
+            for day in days:
+                busy = desk_index >= len(day.desks) or day.desks[desk_index].booker is not None
+                if busy and run_start is None:
+                    run_start = day.date.toordinal()
+                elif not busy and run_start is not None:
+                    desk.set(run_start, day.date.toordinal() - 1, True)
+                    run_start = None
+            if run_start is not None:
+                desk.set(run_start, last_date.toordinal(), True)
+            self._set_after_last_day(desk, desk_index, days[-1])
+        self._desks = desks
+        self._floor = floor
+
+    @staticmethod
+    def _set_after_last_day(desk: BusyIntervals, desk_index: int, last_day: Day) -> None:
+        # Days after the last materialized day are booked by the owners on that day.
+        busy = desk_index >= len(last_day.desks) or last_day.desks[desk_index].owner is not None
+        desk.set(last_day.date.toordinal() + 1, FOREVER, busy)
+
+    @beartype
+    def _update(self, diff: Diff) -> None:
+        if self._desks is None:
+            return
+        if diff.num_desks:
+            # Changes to the number of desks are rare, so simply rebuild.
+            self._desks = None
+            return
+        last_day = self._database.state.days[-1]
+        for change in diff.desks:
+            date = change.date.toordinal()
+            if date < self._floor:
+                continue
+            desk = self._desks[change.desk_index]
+            desk.set(date, date, change.booker_after is not None)
+            if change.date == last_day.date:
+                self._set_after_last_day(desk, change.desk_index, last_day)
@@ -0,0 +1,191 @@
+import bisect
+import gzip
+import os
+from collections.abc import Iterator, Sequence
+from datetime import datetime as DateTime  # noqa: N812
+from pathlib import Path
+
+from beartype import beartype
+from pydantic import BaseModel, Field, PrivateAttr
+
+from . import binary
+from .event import Event
+from .history import History
+from .mapped import MappedHistory
+from .state import State
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class Segment(BaseModel):
+    """
+    A contiguous run of events that has been moved out of the active ledger.
+    """
+
+    file_name: str = Field()
+    # Ledger index of the first event in the segment.
+    first_event: int = Field()
+    num_events: int = Field()
+    start_time: DateTime = Field()
+    end_time: DateTime = Field()
+
+
+class Manifest(BaseModel):
+    segments: list[Segment] = Field()
+    # File name of the state checkpoint taken after the last segment.
+    checkpoint: str | None = Field()
+
+
+@beartype
+def archive_path(database_path: Path) -> Path:
+    """
+    Returns the directory in which the archive of the database at the given path is stored.
+    """
+    return database_path.with_name(f"{database_path.name}.archive")
+
+
+@beartype
+def write_atomic(path: Path, data: bytes) -> None:
+    """
+    Writes the data to the given path such that readers never observe a partially written file.
+    """
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class Archive(BaseModel):
+    """
+    Archived ledger segments and the state checkpoint that summarizes them.
+
+    Segments are only read from disk when their events are requested, and only the most recently read segment is kept
+    in memory. Uncompressed binary segments are memory-mapped, so only the events that are accessed are built.
+    """
+
+    directory: Path = Field()
+    manifest: Manifest = Field()
+    _loaded: tuple[str, Sequence[Event]] | None = PrivateAttr(default=None)
+
+    @beartype
+    @staticmethod
+    def open(directory: Path) -> "Archive":
+        manifest_path = directory / MANIFEST_FILE_NAME
+        if manifest_path.exists():
+            manifest = Manifest.model_validate_json(manifest_path.read_bytes())
+        else:
+            manifest = Manifest(segments=[], checkpoint=None)
+        return Archive(directory=directory, manifest=manifest)
+
+    @property
+    def segments(self) -> Sequence[Segment]:
+        return self.manifest.segments
+
+    @property
+    def num_events(self) -> int:
+        """
+        The number of events stored in the archive.
+        """
+        if not self.manifest.segments:
+            return 0
+        last = self.manifest.segments[-1]
+        return last.first_event + last.num_events
+
+    @beartype
+    def checkpoint(self) -> State | None:
+        """
+        Loads the state resulting from applying every archived event.
+        """
+        if self.manifest.checkpoint is None:
+            return None
+        return State.model_validate_json(self._read(self.manifest.checkpoint))
+
+    @beartype
+    def segment_events(self, segment: Segment) -> Sequence[Event]:
+        match self._loaded:
+            case (file_name, loaded_events) if file_name == segment.file_name:
+                return loaded_events
+        events: Sequence[Event]
+        if segment.file_name.endswith(binary.BINARY_SUFFIX):
+            events = MappedHistory.open(self.directory / segment.file_name)
+        elif segment.file_name.endswith(f"{binary.BINARY_SUFFIX}.gz"):
+            events = binary.decode(self._read(segment.file_name)).history
+        else:
+            events = History.model_validate_json(self._read(segment.file_name)).history
+        self.close()
+        self._loaded = (segment.file_name, events)
+        return events
+
+    def close(self) -> None:
+        """
+        Drops the segment that is kept in memory and unmaps it if it is memory-mapped. Sequences returned by
+        `segment_events` for that segment must not be used afterwards, but the archive can still be read.
+        """
+        match self._loaded:
+            case (_, MappedHistory() as mapped):
+                mapped.close()
+        self._loaded = None
+
+    @beartype
+    def events(self, start_time: DateTime | None = None) -> Iterator[Event]:
+        """
+        Iterates over the archived events in ledger order, skipping segments that end before `start_time`.
+        """
+        for segment in self.manifest.segments:
+            if start_time is not None and segment.end_time < start_time:
+                continue
+            yield from self.segment_events(segment)
+
+    @beartype
+    def event(self, index: int) -> Event:
+        """
+        Returns the archived event with the given ledger index.
+        """
+        position = bisect.bisect_right(self.manifest.segments, index, key=lambda segment: segment.first_event) - 1
+        if position < 0 or index >= self.num_events:
+            raise IndexError(f"Event {index} is not in the archive")
+        segment = self.manifest.segments[position]
+        return self.segment_events(segment)[index - segment.first_event]
+
+    @beartype
+    def append(self, history: History, checkpoint: State, compress: bool, binary_format: bool = False) -> None:
+        """
+        Adds the events of `history` as a new segment and replaces the checkpoint with `checkpoint`.
+
+        `history.offset` must equal the number of events already in the archive.
+        """
+        if history.offset != self.num_events:
+            raise ValueError(f"Segment starts at event {history.offset} but the archive ends at {self.num_events}")
+        if not history.history:
+            raise ValueError("Cannot archive an empty segment")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        first_event = history.offset
+        last_event = first_event + len(history.history) - 1
+        suffix = binary.BINARY_SUFFIX if binary_format else ".json"
+        if compress:
+            suffix += ".gz"
+        segment = Segment(
+            file_name=f"segment-{first_event:010d}-{last_event:010d}{suffix}",
+            first_event=first_event,
+            num_events=len(history.history),
+            start_time=history.history[0].time,
+            end_time=history.history[-1].time,
+        )
+        checkpoint_name = f"checkpoint-{last_event + 1:010d}.json"
+        self._write(segment.file_name, binary.encode(history) if binary_format else history.to_json().encode())
+        self._write(checkpoint_name, checkpoint.model_dump_json().encode())
+
+        old_checkpoint = self.manifest.checkpoint
+        self.manifest = Manifest(segments=[*self.manifest.segments, segment], checkpoint=checkpoint_name)
+        write_atomic(self.directory / MANIFEST_FILE_NAME, self.manifest.model_dump_json().encode())
+        if old_checkpoint is not None:
+            (self.directory / old_checkpoint).unlink(missing_ok=True)
+
+    def _read(self, file_name: str) -> bytes:
+        data = (self.directory / file_name).read_bytes()
+        return gzip.decompress(data) if file_name.endswith(".gz") else data
+
+    def _write(self, file_name: str, data: bytes) -> None:
+        write_atomic(self.directory / file_name, gzip.compress(data) if file_name.endswith(".gz") else data)
@@ -0,0 +1,314 @@
+"""
+Compact binary encoding of a History.
+
+The file starts with a fixed-size header followed by one fixed-width record per event, so the position of any event
+can be computed from its index. Dates are stored as days since 1970-01-01 and times as microseconds since
+1970-01-01 in the event's own (possibly naive) time zone.
+
+Text that does not fit in a record, such as desk names, is stored in a string table after the records: a JSON array
+of strings that records refer to by index. The table is left out if there are no strings.
+"""
+
+import json
+import struct
+from collections.abc import Iterator, Sequence
+from datetime import date as Date  # noqa: N812
+from datetime import datetime as DateTime  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+from datetime import timezone as TimeZone  # noqa: N812
+from enum import IntEnum
+from typing import TypeVar
+
+from beartype import beartype
+from beartype.typing import Any  # noqa: N812
+from pydantic import BaseModel
+
+from .event import (
+    BookDesk,
+    CheckIn,
+    Event,
+    JoinWaitlist,
+    LeaveWaitlist,
+    MakeFlex,
+    MakeOwned,
+    SetDeskAttributes,
+    SetNumDesks,
+    UnbookDesk,
+)
+from .history import History
+from .typecheck import unchecked
+
+MAGIC = b"EADK"
+FORMAT_VERSION = 3
+# Database files with this suffix are saved in the binary format.
+BINARY_SUFFIX = ".bin"
+
+# magic, format version, record size, start date, offset, number of events
+HEADER = struct.Struct("<4sHHiqq")
+HEADER_SIZE = 32
+# tag, flags, utc offset in minutes, desk index or number of desks, start date, end date, user, author, time,
+# idempotency key
+RECORD = struct.Struct("<BBhiiiqqqq")
+
+
+class Tag(IntEnum):
+    SET_NUM_DESKS = 1
+    BOOK_DESK = 2
+    UNBOOK_DESK = 3
+    MAKE_OWNED = 4
+    MAKE_FLEX = 5
+    JOIN_WAITLIST = 6
+    LEAVE_WAITLIST = 7
+    CHECK_IN = 8
+    SET_DESK_ATTRIBUTES = 9
+
+
+FLAG_HAS_AUTHOR = 1
+FLAG_HAS_TIME_ZONE = 2
+FLAG_HAS_IDEMPOTENCY_KEY = 4
+
+EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+EPOCH = DateTime(1970, 1, 1)
+MICROSECOND = TimeDelta(microseconds=1)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+@beartype
+def is_binary(data: bytes | memoryview) -> bool:
+    return bytes(data[: len(MAGIC)]) == MAGIC
+
+
+def _epoch_day(date: Date) -> int:
+    return date.toordinal() - EPOCH_ORDINAL
+
+
+@beartype
+def encode_event(event: Event, strings: list[str] | None = None) -> bytes:
+    """
+    Encodes an event as a record. Text in the event is appended to `strings`, and the record refers to its index.
+    """
+    flags = 0
+    author = 0
+    if event.author is not None:
+        flags |= FLAG_HAS_AUTHOR
+        author = event.author
+    idempotency_key = 0
+    if event.idempotency_key is not None:
+        flags |= FLAG_HAS_IDEMPOTENCY_KEY
+        idempotency_key = event.idempotency_key
+    time = event.time
+    utc_offset_minutes = 0
+    match time.utcoffset():
+        case None:
+            pass
+        case utc_offset:
+            minutes, remainder = divmod(utc_offset, TimeDelta(minutes=1))
+            if remainder:
+                raise BinaryFormatError(f"UTC offset {utc_offset} is not a whole number of minutes")
+            flags |= FLAG_HAS_TIME_ZONE
+            utc_offset_minutes = minutes
+            time = time.replace(tzinfo=None)
+    micros = (time - EPOCH) // MICROSECOND
+
+    match event.event:
+        case SetNumDesks(date=date, num_desks=num_desks):
+            fields = (Tag.SET_NUM_DESKS, num_desks, _epoch_day(date), 0, 0)
+        case BookDesk(start_date=start_date, end_date=end_date, desk_index=desk_index, user=user):
+            fields = (Tag.BOOK_DESK, desk_index, _epoch_day(start_date), _epoch_day(end_date), user)
+        case UnbookDesk(start_date=start_date, end_date=end_date, desk_index=desk_index):
+            fields = (Tag.UNBOOK_DESK, desk_index, _epoch_day(start_date), _epoch_day(end_date), 0)
+        case MakeOwned(start_date=start_date, desk_index=desk_index, user=user):
+            fields = (Tag.MAKE_OWNED, desk_index, _epoch_day(start_date), 0, user)
+        case MakeFlex(start_date=start_date, desk_index=desk_index):
+            fields = (Tag.MAKE_FLEX, desk_index, _epoch_day(start_date), 0, 0)
+        case JoinWaitlist(date=date, user=user):
+            fields = (Tag.JOIN_WAITLIST, 0, _epoch_day(date), 0, user)
+        case LeaveWaitlist(date=date, user=user):
+            fields = (Tag.LEAVE_WAITLIST, 0, _epoch_day(date), 0, user)
+        case CheckIn(date=date, desk_index=desk_index, user=user):
+            fields = (Tag.CHECK_IN, desk_index, _epoch_day(date), 0, user)
+        case SetDeskAttributes(start_date=start_date, desk_index=desk_index, name=name, zone=zone, tags=tags):
+            if strings is None:
+                raise BinaryFormatError("Desk attributes can only be encoded with a string table")
+            strings.append(json.dumps({"name": name, "zone": zone, "tags": tags}))
+            fields = (Tag.SET_DESK_ATTRIBUTES, desk_index, _epoch_day(start_date), len(strings) - 1, 0)
+        case _:
+            raise BinaryFormatError(f"Event type {type(event.event).__name__} has no binary encoding")
+    tag, desk, start, end, user = fields
+    return RECORD.pack(tag, flags, utc_offset_minutes, desk, start, end, user, author, micros, idempotency_key)
+
+
+@beartype
+def encode(history: History) -> bytes:
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, RECORD.size, _epoch_day(history.start_date), history.offset, len(history.history)
+    )
+    strings: list[str] = []
+    records = [encode_event(event, strings) for event in history.history]
+    string_table = json.dumps(strings).encode() if strings else b""
+    return b"".join([header.ljust(HEADER_SIZE, b"\0"), *records, string_table])
+
+
+@unchecked
+def _construct(cls: type[ModelT], values: dict[str, Any]) -> ModelT:
+    """
+    Equivalent to `cls.model_construct(**values)` when every field is given and the model has neither private
+    attributes nor extra fields, but about three times as fast. The tests check this for every event model.
+    """
+    model = cls.__new__(cls)
+    object.__setattr__(model, "__dict__", values)
+    object.__setattr__(model, "__pydantic_fields_set__", set(values))
+    object.__setattr__(model, "__pydantic_extra__", None)
+    object.__setattr__(model, "__pydantic_private__", None)
+    return model
+
+
+class _Dates(dict[int, Date]):
+    def __missing__(self, epoch_day: int) -> Date:
+        date = Date.fromordinal(epoch_day + EPOCH_ORDINAL)
+        self[epoch_day] = date
+        return date
+
+
+class _TimeZones(dict[int, TimeZone]):
+    def __missing__(self, utc_offset_minutes: int) -> TimeZone:
+        time_zone = TimeZone(TimeDelta(minutes=utc_offset_minutes))
+        self[utc_offset_minutes] = time_zone
+        return time_zone
+
+
+class Decoder:
+    """
+    Builds events from unpacked records without going through pydantic validation.
+    Dates and time zones are memoized since the same few values are repeated throughout a ledger.
+    """
+
+    def __init__(self, strings: Sequence[str] = ()) -> None:
+        self._dates = _Dates()
+        self._time_zones = _TimeZones()
+        self._strings = strings
+
+    @unchecked
+    def event(self, record: tuple[Any, ...]) -> Event:
+        tag, flags, utc_offset_minutes, desk, start, end, user, author, micros, idempotency_key = record
+        dates = self._dates
+        payload: (
+            SetNumDesks
+            | BookDesk
+            | UnbookDesk
+            | MakeOwned
+            | MakeFlex
+            | JoinWaitlist
+            | LeaveWaitlist
+            | CheckIn
+            | SetDeskAttributes
+        )
+        match tag:
+            case Tag.SET_NUM_DESKS:
+                payload = _construct(SetNumDesks, {"date": dates[start], "num_desks": desk})
+            case Tag.BOOK_DESK:
+                payload = _construct(
+                    BookDesk, {"start_date": dates[start], "end_date": dates[end], "desk_index": desk, "user": user}
+                )
+            case Tag.UNBOOK_DESK:
+                payload = _construct(
+                    UnbookDesk, {"start_date": dates[start], "end_date": dates[end], "desk_index": desk}
+                )
+            case Tag.MAKE_OWNED:
+                payload = _construct(MakeOwned, {"start_date": dates[start], "desk_index": desk, "user": user})
+            case Tag.MAKE_FLEX:
+                payload = _construct(MakeFlex, {"start_date": dates[start], "desk_index": desk})
+            case Tag.JOIN_WAITLIST:
+                payload = _construct(JoinWaitlist, {"action": "join_waitlist", "date": dates[start], "user": user})
+            case Tag.LEAVE_WAITLIST:
+                payload = _construct(LeaveWaitlist, {"action": "leave_waitlist", "date": dates[start], "user": user})
+            case Tag.CHECK_IN:
+                payload = _construct(CheckIn, {"date": dates[start], "desk_index": desk, "user": user})
+            case Tag.SET_DESK_ATTRIBUTES:
+                if end >= len(self._strings):
+                    raise BinaryFormatError(f"String {end} is missing from the string table")
+                attributes = json.loads(self._strings[end])
+                payload = _construct(
+                    SetDeskAttributes,
+                    {
+                        "start_date": dates[start],
+                        "desk_index": desk,
+                        "name": attributes["name"],
+                        "zone": attributes["zone"],
+                        "tags": attributes["tags"],
+                    },
+                )
+            case _:
+                raise BinaryFormatError(f"Unknown event tag {tag}")
+        return _construct(
+            Event,
+            {
+                "author": author if flags & FLAG_HAS_AUTHOR else None,
+                "time": self.time(flags, utc_offset_minutes, micros),
+                "event": payload,
+                "idempotency_key": idempotency_key if flags & FLAG_HAS_IDEMPOTENCY_KEY else None,
+            },
+        )
+
+    @unchecked
+    def time(self, flags: int, utc_offset_minutes: int, micros: int) -> DateTime:
+        time = EPOCH + TimeDelta(microseconds=micros)
+        if flags & FLAG_HAS_TIME_ZONE:
+            time = time.replace(tzinfo=self._time_zones[utc_offset_minutes])
+        return time
+
+
+@beartype
+def decode_header(data: bytes | memoryview) -> tuple[Date, int, int]:
+    """
+    Returns the start date, offset and number of events of an encoded history.
+    """
+    if len(data) < HEADER_SIZE or not is_binary(data):
+        raise BinaryFormatError("Not a binary ledger")
+    _, version, record_size, start, offset, num_events = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION or record_size != RECORD.size:
+        raise BinaryFormatError(f"Unsupported binary ledger version {version} with record size {record_size}")
+    if len(data) < HEADER_SIZE + num_events * record_size:
+        raise BinaryFormatError("Binary ledger is truncated")
+    return Date.fromordinal(start + EPOCH_ORDINAL), offset, num_events
+
+
+@beartype
+def decode_events(data: bytes | memoryview, start: int = 0, stop: int | None = None) -> Iterator[Event]:
+    """
+    Decodes the events with indices in [start, stop) from an encoded history.
+    """
+    _, _, num_events = decode_header(data)
+    stop = num_events if stop is None else min(stop, num_events)
+    if start >= stop:
+        return iter(())
+    records = memoryview(data)[HEADER_SIZE + start * RECORD.size : HEADER_SIZE + stop * RECORD.size]
+    return map(Decoder(decode_strings(data, num_events)).event, RECORD.iter_unpack(records))
+
+
+@beartype
+def decode_strings(data: bytes | memoryview, num_events: int) -> list[str]:
+    """
+    Returns the string table of an encoded history with the given number of events.
+    """
+    string_table = bytes(data[HEADER_SIZE + num_events * RECORD.size :])
+    if not string_table:
+        return []
+    try:
+        strings = json.loads(string_table)
+    except ValueError as e:
+        raise BinaryFormatError("Invalid string table") from e
+    if not isinstance(strings, list) or not all(isinstance(string, str) for string in strings):
+        raise BinaryFormatError("Invalid string table")
+    return strings
+
+
+@beartype
+def decode(data: bytes | memoryview) -> History:
+    start_date, offset, _ = decode_header(data)
+    return History.model_construct(start_date=start_date, history=list(decode_events(data)), offset=offset)
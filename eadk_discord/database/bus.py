@@ -0,0 +1,118 @@
+import asyncio
+from collections import deque
+
+from beartype import beartype
+
+from .diff import Diff
+
+DEFAULT_MAX_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    """
+    A consumer's view of the diffs published on a ChangeBus, in ledger order.
+    """
+
+    _queue: asyncio.Queue[Diff]
+    # Diffs that did not fit in the queue. They are moved into the queue as the consumer catches up.
+    _overflow: deque[Diff]
+    # Set while the overflow is empty.
+    _caught_up: asyncio.Event
+    # The event loop the consumer subscribed on, if any, which diffs published from other threads are handed to.
+    _loop: asyncio.AbstractEventLoop | None
+
+    @beartype
+    def __init__(self, max_queue_size: int) -> None:
+        self._queue = asyncio.Queue(max_queue_size)
+        self._overflow = deque()
+        self._caught_up = asyncio.Event()
+        self._caught_up.set()
+        self._loop = _running_loop()
+
+    @property
+    def backlog(self) -> int:
+        """
+        The number of diffs that have been published but not yet received.
+        """
+        return self._queue.qsize() + len(self._overflow)
+
+    async def get(self) -> Diff:
+        diff = await self._queue.get()
+        self._refill()
+        return diff
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Diff:
+        return await self.get()
+
+    @beartype
+    def _publish(self, diff: Diff) -> None:
+        if self._overflow or self._queue.full():
+            self._overflow.append(diff)
+            self._caught_up.clear()
+        else:
+            self._queue.put_nowait(diff)
+
+    def _publish_from_any_thread(self, diff: Diff) -> None:
+        if self._loop is not None and _running_loop() is not self._loop:
+            self._loop.call_soon_threadsafe(self._publish, diff)
+        else:
+            self._publish(diff)
+
+    async def _drain(self) -> None:
+        await self._caught_up.wait()
+
+    def _refill(self) -> None:
+        while self._overflow and not self._queue.full():
+            self._queue.put_nowait(self._overflow.popleft())
+        if not self._overflow:
+            self._caught_up.set()
+
+
+class ChangeBus:
+    """
+    Distributes the diffs of applied events to asynchronous consumers such as exporters, notifications and caches.
+
+    Publishing never blocks, since events are applied synchronously. Instead, producers apply backpressure by awaiting
+    `drain`, which waits until every consumer's queue holds everything that has been published. Events may be applied
+    in a worker thread, in which case their diffs reach the consumers through the consumers' event loop, before
+    anything the worker thread schedules on that loop once it is done.
+    """
+
+    max_queue_size: int
+    _subscriptions: list[Subscription]
+
+    @beartype
+    def __init__(self, max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE) -> None:
+        self.max_queue_size = max_queue_size
+        self._subscriptions = []
+
+    @beartype
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.max_queue_size)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    @beartype
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.remove(subscription)
+        # Nobody is going to wait for an unsubscribed consumer to catch up.
+        subscription._caught_up.set()
+
+    @beartype
+    def publish(self, diff: Diff) -> None:
+        for subscription in self._subscriptions:
+            subscription._publish_from_any_thread(diff)
+
+    async def drain(self) -> None:
+        for subscription in list(self._subscriptions):
+            await subscription._drain()
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
@@ -1,17 +1,34 @@
+import contextlib
+import itertools
+from collections.abc import Callable, Iterator, Sequence
 from datetime import date as Date  # noqa: N812
+from datetime import datetime as DateTime  # noqa: N812
 from pathlib import Path
 
 from beartype import beartype
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
+from . import binary
+from .archive import Archive, archive_path, write_atomic
+from .dedupe import Deduplicator
+from .diff import Diff
 from .event import Event
 from .history import History
-from .state import State
+from .index import EventIndex
+from .journal import Journal
+from .preview import Preview, preview
+from .state import Day, DayEvictedError, DeskFilter, State
 
 
 class Database(BaseModel):
     history: History = Field()
     state: State = Field()
+    archive: Archive | None = Field(default=None)
+    # Built on first use, since doing so reads every archived segment.
+    _index: EventIndex | None = PrivateAttr(default=None)
+    _deduplicator: Deduplicator = PrivateAttr(default_factory=Deduplicator)
+    _journal: Journal | None = PrivateAttr(default=None)
+    _listeners: list[Callable[[Diff], None]] = PrivateAttr(default_factory=list)
 
     @beartype
     @staticmethod
@@ -21,20 +38,369 @@ class Database(BaseModel):
         return Database(history=history, state=state)
 
     @beartype
-    def save(self, path: Path) -> None:  # pragma: no cover
-        with path.open("w") as file:
-            file.write(self.history.to_json())
+    def save(self, path: Path) -> None:
+        """
+        Writes the ledger to `path`. If the database has a journal for `path`, the journal is emptied afterwards.
+        """
+        journal = self._journal if self._journal is not None and self._journal.database_path == path else None
+        with journal.lock() if journal is not None else contextlib.nullcontext():
+            self.sync()
+            if path.suffix == binary.BINARY_SUFFIX:
+                write_atomic(path, binary.encode(self.history))
+            else:
+                write_atomic(path, self.history.to_json().encode())
+            if journal is not None:
+                journal.rotate()
 
     @beartype
     @staticmethod
-    def load(path: Path) -> "Database":  # pragma: no cover
-        with path.open("r") as file:
-            data = file.read()
-        history = History.from_json(data)
-        state = State.initialize(history)
-        return Database(history=history, state=state)
+    def load(path: Path) -> "Database":
+        history, archive = Database.read_ledger(path)
+        deduplicator = Deduplicator()
+        checkpoint = archive.checkpoint() if archive is not None else None
+        state = State.initialize(history, checkpoint, deduplicator)
+        database = Database(history=history, state=state, archive=archive)
+        database._deduplicator = deduplicator
+        return database
+
+    @beartype
+    @staticmethod
+    def read_ledger(path: Path) -> tuple[History, Archive | None]:
+        """
+        Reads the active ledger of the database at `path` and opens its archive, if it has one. The state is the
+        archive's checkpoint with the events of the active ledger applied.
+        """
+        history = Database._read_history(path)
+        directory = archive_path(path)
+        if not directory.exists():
+            return history, None
+        archive = Archive.open(directory)
+        # The archive is written before the active ledger, so an interrupted archival leaves events in both.
+        already_archived = archive.num_events - history.offset
+        if already_archived > 0:
+            history = History(
+                start_date=history.start_date, offset=archive.num_events, history=history.history[already_archived:]
+            )
+        return history, archive
+
+    @beartype
+    @staticmethod
+    def open(path: Path) -> "Database":
+        """
+        Loads the database at `path` together with its journal, so that it can be shared with other processes.
+
+        Events handled by any process are appended to the journal, and other processes apply them on their next sync.
+        """
+        database = Database.load(path)
+        database.attach_journal(path)
+        return database
+
+    @beartype
+    def attach_journal(self, path: Path) -> None:
+        """
+        Shares a database that has been loaded from `path` with other processes through its journal, like `open`.
+        """
+        self._journal = Journal(path)
+        self.sync()
+
+    def detach_journal(self) -> None:
+        """
+        Stops sharing the database with other processes and closes its journal.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    @staticmethod
+    def _read_history(path: Path) -> History:
+        data = path.read_bytes()
+        return binary.decode(data) if binary.is_binary(data) else History.from_json(data.decode())
+
+    @property
+    def journal(self) -> Journal | None:
+        return self._journal
 
     @beartype
-    def handle_event(self, event: Event) -> None:
-        self.state.handle_event(event)
+    def sync(self) -> int:
+        """
+        Applies the events that other processes have appended to the journal since the last sync.
+        Returns the number of new events.
+        """
+        if self._journal is None:
+            return 0
+        num_events = self.num_events
+        replaced, entries = self._journal.read_new()
+        if replaced or (entries and entries[0].version > self.num_events):
+            # The journal has been emptied by a save, so the missing events are in the database file.
+            self._catch_up(self._journal.database_path)
+        for entry in entries:
+            if entry.version < self.num_events:
+                continue
+            if entry.version > self.num_events:
+                raise ValueError(f"Journal entry {entry.version} does not follow event {self.num_events - 1}")
+            self._replicate(entry.event)
+        return self.num_events - num_events
+
+    def _catch_up(self, path: Path) -> None:
+        history = Database._read_history(path)
+        # Another process may have archived events since they were applied here.
+        archive = Archive.open(archive_path(path)) if history.offset != self.history.offset else None
+        for index in range(self.num_events, history.offset + len(history.history)):
+            if index < history.offset:
+                assert archive is not None
+                self._replicate(archive.event(index))
+            else:
+                self._replicate(history.history[index - history.offset])
+        if archive is not None:
+            num_archived = history.offset - self.history.offset
+            self.history = History(
+                start_date=self.history.start_date,
+                offset=history.offset,
+                history=self.history.history[num_archived:],
+            )
+            if self.archive is not None:
+                self.archive.close()
+            self.archive = archive
+
+    @property
+    def num_events(self) -> int:
+        """
+        The total number of events in the ledger, including archived events.
+        """
+        return self.history.offset + len(self.history.history)
+
+    @beartype
+    def events(self, start_time: DateTime | None = None) -> Iterator[Event]:
+        """
+        Iterates over every event in the ledger, reading archived segments from disk as needed.
+
+        Archived segments that end before `start_time` are not read.
+        """
+        archived = self.archive.events(start_time) if self.archive is not None else iter(())
+        return itertools.chain(archived, self.history.history)
+
+    @beartype
+    def event(self, index: int) -> Event:
+        """
+        Returns the event with the given ledger index.
+        """
+        if index < 0 or index >= self.num_events:
+            raise IndexError(f"Event {index} does not exist")
+        if index < self.history.offset:
+            assert self.archive is not None
+            return self.archive.event(index)
+        return self.history.history[index - self.history.offset]
+
+    @beartype
+    def query_events(self, date: Date | None = None, desk: int | None = None, user: int | None = None) -> list[int]:
+        """
+        Returns the ledger indices of the events that affect the given date and desk and were made by or are about the
+        given user, in ledger order. Filters that are None are ignored.
+        """
+        if date is None and desk is None and user is None:
+            return list(range(self.num_events))
+        if self._index is None:
+            self._index = EventIndex.build(self.events())
+        return self._index.query(date=date, desk=desk, user=user)
+
+    @beartype
+    def archive_before(self, path: Path, before: DateTime, compress: bool | None = None) -> int:
+        """
+        Moves the events that happened before `before` out of the active ledger into a new archive segment.
+
+        Only a prefix of the active ledger is archived, so the ledger order is preserved.
+        Segments use the same format as the database file. By default JSON segments are compressed, while binary
+        segments are left uncompressed so that they can be memory-mapped.
+        The database is saved to `path` afterwards. Returns the number of archived events.
+        """
+        journal = self._journal
+        with journal.lock() if journal is not None else contextlib.nullcontext():
+            self.sync()
+            return self._archive_before(path, before, compress)
+
+    def _archive_before(self, path: Path, before: DateTime, compress: bool | None) -> int:
+        binary_format = path.suffix == binary.BINARY_SUFFIX
+        if compress is None:
+            compress = not binary_format
+        num_archived = 0
+        for event in self.history.history:
+            if event.time >= before:
+                break
+            num_archived += 1
+        if num_archived == 0:
+            return 0
+
+        if self.archive is None:
+            self.archive = Archive.open(archive_path(path))
+        segment = History(
+            start_date=self.history.start_date,
+            offset=self.history.offset,
+            history=self.history.history[:num_archived],
+        )
+        checkpoint = State.initialize(segment, self.archive.checkpoint())
+        self.archive.append(segment, checkpoint, compress, binary_format)
+
+        self.history = History(
+            start_date=self.history.start_date,
+            offset=self.history.offset + num_archived,
+            history=self.history.history[num_archived:],
+        )
+        self.save(path)
+        return num_archived
+
+    @beartype
+    def day(self, date: Date) -> Day:
+        """
+        Returns the Day object for the given date, rebuilding it if it has been evicted. The day must not be changed.
+        """
+        return self.day_range(date, date)[0]
+
+    @beartype
+    def day_range(self, start_date: Date, end_date: Date) -> Sequence[Day]:
+        """
+        Returns the days from `start_date` to `end_date`, which must not be changed, without copying them.
+        """
+        try:
+            return self.state.days_between(start_date, end_date)
+        except DayEvictedError:
+            self._restore_days()
+            return self.state.days_between(start_date, end_date)
+
+    @beartype
+    def matching_desks(self, date: Date, desk_filter: DeskFilter) -> list[int]:
+        try:
+            return self.state.matching_desks(date, desk_filter)
+        except DayEvictedError:
+            self._restore_days()
+            return self.state.matching_desks(date, desk_filter)
+
+    @beartype
+    def snapshot(self) -> State:
+        """
+        Returns a copy of the current state in O(1), e.g. for reading a consistent state while events are handled.
+        Evicted days are not included, so accessing them raises DayEvictedError.
+        """
+        return self.state.snapshot()
+
+    @beartype
+    def preview(self, event: Event) -> Preview:
+        """
+        Returns every conflict that would make the event fail, or the changes it would make, without applying it.
+        """
+        try:
+            return preview(self.state, self.num_events, event)
+        except DayEvictedError:
+            self._restore_days()
+            return preview(self.state, self.num_events, event)
+
+    @beartype
+    def evict_before(self, date: Date) -> int:
+        """
+        Drops materialized days before the given date from memory. They are rebuilt from the ledger if accessed again.
+        """
+        return self.state.evict(date)
+
+    @beartype
+    def prune_waitlists(self, before: Date) -> int:
+        """
+        Drops the waitlists of the dates before the given date. Returns the number of dropped waitlists.
+        """
+        return self.state.prune_waitlists(before)
+
+    def _restore_days(self) -> None:
+        checkpoint = self.archive.checkpoint() if self.archive is not None else None
+        self.state.restore(State.initialize(self.history, checkpoint))
+
+    @beartype
+    def subscribe(self, listener: Callable[[Diff], None]) -> None:
+        """
+        Calls the listener with the diff of every event appended to the ledger from now on, including events from other
+        processes. Diffs are only computed while there are listeners.
+        """
+        self._listeners.append(listener)
+
+    @beartype
+    def unsubscribe(self, listener: Callable[[Diff], None]) -> None:
+        self._listeners.remove(listener)
+
+    @beartype
+    def recorded_event(self, idempotency_key: int | None) -> Event | None:
+        """
+        Returns the recently applied event with the given idempotency key, if any.
+        """
+        return self._deduplicator.get(idempotency_key)
+
+    @beartype
+    def handle_event(self, event: Event) -> Event:
+        """
+        Applies the event and appends it to the ledger.
+
+        If an event with the same idempotency key was applied recently, nothing is done and that event is returned
+        instead, so retried requests are only applied once. Otherwise the given event is returned.
+
+        If the database has a journal, events from other processes are applied first and the event is only appended if
+        no other process has appended an event in the meantime.
+        """
+        journal = self._journal
+        with journal.lock() if journal is not None else contextlib.nullcontext():
+            self.sync()
+            original = self._deduplicator.get(event.idempotency_key)
+            if original is not None:
+                return original
+            if journal is not None:
+                journal.check(self.num_events)
+            diff = self._apply(event)
+            if journal is not None:
+                journal.append(self.num_events, event)
+            self._append(event, diff)
+            return event
+
+    def _replicate(self, event: Event) -> None:
+        # Duplicates are kept in the ledger but not applied, matching how the ledger is replayed on load.
+        diff = None
+        if self._deduplicator.get(event.idempotency_key) is None:
+            diff = self._apply(event)
+        self._append(event, diff)
+
+    def _apply(self, event: Event) -> Diff | None:
+        """
+        Applies the event to the state. Returns its diff if there are listeners.
+        """
+        if not self._listeners:
+            self._apply_to_state(event)
+            return None
+        start_date, end_date = event.event.date_range()
+        if end_date is None:
+            end_date = max(start_date, self.state.days[-1].date)
+        # Materializes the affected days, which does not change the state.
+        try:
+            self.state.days_between(start_date, end_date)
+        except DayEvictedError:
+            self._restore_days()
+        before = self.state.snapshot()
+        self._apply_to_state(event)
+        return Diff.between(
+            self.num_events,
+            event,
+            before.days_between(start_date, end_date),
+            self.state.days_between(start_date, end_date),
+        )
+
+    def _apply_to_state(self, event: Event) -> None:
+        try:
+            self.state.handle_event(event)
+        except DayEvictedError:
+            # Events are validated before anything is changed, so it is safe to apply the event again.
+            self._restore_days()
+            self.state.handle_event(event)
+
+    def _append(self, event: Event, diff: Diff | None) -> None:
         self.history.append(event)
+        if self._index is not None:
+            self._index.add(self.num_events - 1, event)
+        self._deduplicator.add(event)
+        if self._listeners:
+            if diff is None:
+                diff = Diff(index=self.num_events - 1, event=event, num_desks=[], desks=[])
+            for listener in self._listeners:
+                listener(diff)
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from datetime import timedelta as TimeDelta  # noqa: N812
+
+from beartype import beartype
+
+from .event import Event
+
+# Discord interactions can be responded to for 15 minutes, so retries cannot arrive later than that.
+DEFAULT_WINDOW = TimeDelta(minutes=15)
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+class Deduplicator:
+    """
+    Remembers recently applied events by their idempotency key.
+
+    Keys are forgotten once they are older than `window` relative to the newest event, or when more than
+    `max_entries` keys are remembered, so memory use is bounded.
+    """
+
+    window: TimeDelta
+    max_entries: int
+    _events: OrderedDict[int, Event]
+
+    @beartype
+    def __init__(self, window: TimeDelta = DEFAULT_WINDOW, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.window = window
+        self.max_entries = max_entries
+        self._events = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    @beartype
+    def get(self, key: int | None) -> Event | None:
+        """
+        Returns the event that was applied with the given idempotency key, if it is still remembered.
+        """
+        if key is None:
+            return None
+        return self._events.get(key)
+
+    @beartype
+    def add(self, event: Event) -> None:
+        if event.idempotency_key is None:
+            return
+        self._events[event.idempotency_key] = event
+        cutoff = event.time - self.window
+        while self._events:
+            _, oldest = next(iter(self._events.items()))
+            if len(self._events) <= self.max_entries and oldest.time >= cutoff:
+                break
+            self._events.popitem(last=False)
@@ -0,0 +1,73 @@
+from collections.abc import Sequence
+from datetime import date as Date  # noqa: N812
+
+from beartype import beartype
+from pydantic import BaseModel, Field
+
+from .event import Event
+from .state import Day, DeskStatus
+
+FREE_DESK = DeskStatus(booker=None, owner=None)
+
+
+class DeskChange(BaseModel):
+    date: Date = Field()
+    desk_index: int = Field()
+    booker_before: int | None = Field()
+    booker_after: int | None = Field()
+    owner_before: int | None = Field()
+    owner_after: int | None = Field()
+
+
+class NumDesksChange(BaseModel):
+    date: Date = Field()
+    before: int = Field()
+    after: int = Field()
+
+
+class Diff(BaseModel):
+    """
+    The changes to the state made by a single event.
+
+    Days after the last changed day are only listed if they had been materialized. Any day after that is derived from
+    the last materialized day, so it changes in the same way.
+    """
+
+    # Ledger index of the event.
+    index: int = Field()
+    event: Event = Field()
+    num_desks: list[NumDesksChange] = Field()
+    desks: list[DeskChange] = Field()
+
+    @beartype
+    @staticmethod
+    def between(index: int, event: Event, before: Sequence[Day], after: Sequence[Day]) -> "Diff":
+        """
+        Compares the same days of state snapshots taken before and after applying the event.
+        Days that the event did not change are shared between the snapshots, so they are skipped.
+        """
+        num_desks = []
+        desks = []
+        for day_before, day_after in zip(before, after, strict=True):
+            if day_before is day_after:
+                continue
+            date = day_after.date
+            if len(day_before.desks) != len(day_after.desks):
+                num_desks.append(NumDesksChange(date=date, before=len(day_before.desks), after=len(day_after.desks)))
+            # Desks that do not exist on one side count as free, so desks that are added and booked for waitlisted
+            # users at once are listed too.
+            for desk_index in range(max(len(day_before.desks), len(day_after.desks))):
+                desk_before = day_before.desks[desk_index] if desk_index < len(day_before.desks) else FREE_DESK
+                desk_after = day_after.desks[desk_index] if desk_index < len(day_after.desks) else FREE_DESK
+                if desk_before.booker != desk_after.booker or desk_before.owner != desk_after.owner:
+                    desks.append(
+                        DeskChange(
+                            date=date,
+                            desk_index=desk_index,
+                            booker_before=desk_before.booker,
+                            booker_after=desk_after.booker,
+                            owner_before=desk_before.owner,
+                            owner_after=desk_after.owner,
+                        )
+                    )
+        return Diff(index=index, event=event, num_desks=num_desks, desks=desks)
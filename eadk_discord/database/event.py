@@ -1,13 +1,34 @@
+from collections.abc import Callable
 from datetime import date as Date  # noqa: N812
 from datetime import datetime as DateTime  # noqa: N812
+from typing import Literal
 
 from pydantic import BaseModel, Field
 
+# Each event type implements the following methods:
+#  - date_range: the first and last date affected by the event, where a last date of None means every date from the
+#    first date onwards.
+#  - desk: the index of the affected desk, or None if the event affects every desk or no particular desk.
+#  - affected_user: the user the event books a desk for or makes an owner, if any.
+#  - describe: a human-readable description of the event.
+
 
 class SetNumDesks(BaseModel):
     date: Date = Field()
     num_desks: int = Field()
 
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.date, None
+
+    def desk(self) -> int | None:
+        return None
+
+    def affected_user(self) -> int | None:
+        return None
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        return f"Set the number of desks to {self.num_desks} from {self.date} onwards"
+
 
 class BookDesk(BaseModel):
     start_date: Date = Field()
@@ -15,25 +36,171 @@ class BookDesk(BaseModel):
     desk_index: int = Field()
     user: int = Field()
 
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.start_date, self.end_date
+
+    def desk(self) -> int | None:
+        return self.desk_index
+
+    def affected_user(self) -> int | None:
+        return self.user
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        if self.start_date == self.end_date:
+            return f"Booked desk {self.desk_index + 1} for {format_user(self.user)} on {self.start_date}"
+        return (
+            f"Booked desk {self.desk_index + 1} for {format_user(self.user)} from {self.start_date} to {self.end_date}"
+        )
+
 
 class UnbookDesk(BaseModel):
     start_date: Date = Field()
     end_date: Date = Field()
     desk_index: int = Field()
 
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.start_date, self.end_date
+
+    def desk(self) -> int | None:
+        return self.desk_index
+
+    def affected_user(self) -> int | None:
+        return None
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        if self.start_date == self.end_date:
+            return f"Unbooked desk {self.desk_index + 1} on {self.start_date}"
+        return f"Unbooked desk {self.desk_index + 1} from {self.start_date} to {self.end_date}"
+
 
 class MakeOwned(BaseModel):
     start_date: Date = Field()
     desk_index: int = Field()
     user: int = Field()
 
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.start_date, None
+
+    def desk(self) -> int | None:
+        return self.desk_index
+
+    def affected_user(self) -> int | None:
+        return self.user
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        return f"Made desk {self.desk_index + 1} owned by {format_user(self.user)} from {self.start_date} onwards"
+
 
 class MakeFlex(BaseModel):
     start_date: Date = Field()
     desk_index: int = Field()
 
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.start_date, None
+
+    def desk(self) -> int | None:
+        return self.desk_index
+
+    def affected_user(self) -> int | None:
+        return None
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        return f"Made desk {self.desk_index + 1} a flex desk from {self.start_date} onwards"
+
+
+# The waitlist events have the same fields otherwise, so `action` tells them apart when they are parsed.
+class JoinWaitlist(BaseModel):
+    action: Literal["join_waitlist"] = Field(default="join_waitlist")
+    date: Date = Field()
+    user: int = Field()
+
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.date, self.date
+
+    def desk(self) -> int | None:
+        return None
+
+    def affected_user(self) -> int | None:
+        return self.user
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        return f"Added {format_user(self.user)} to the waitlist on {self.date}"
+
+
+class LeaveWaitlist(BaseModel):
+    action: Literal["leave_waitlist"] = Field(default="leave_waitlist")
+    date: Date = Field()
+    user: int = Field()
+
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.date, self.date
+
+    def desk(self) -> int | None:
+        return None
+
+    def affected_user(self) -> int | None:
+        return self.user
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        return f"Removed {format_user(self.user)} from the waitlist on {self.date}"
+
+
+class CheckIn(BaseModel):
+    date: Date = Field()
+    desk_index: int = Field()
+    user: int = Field()
+
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.date, self.date
+
+    def desk(self) -> int | None:
+        return self.desk_index
+
+    def affected_user(self) -> int | None:
+        return self.user
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        return f"Checked {format_user(self.user)} in at desk {self.desk_index + 1} on {self.date}"
+
+
+class SetDeskAttributes(BaseModel):
+    start_date: Date = Field()
+    desk_index: int = Field()
+    name: str | None = Field()
+    zone: str | None = Field()
+    tags: list[str] = Field()
+
+    def date_range(self) -> tuple[Date, Date | None]:
+        return self.start_date, None
+
+    def desk(self) -> int | None:
+        return self.desk_index
+
+    def affected_user(self) -> int | None:
+        return None
+
+    def describe(self, format_user: Callable[[int], str]) -> str:
+        attributes = [
+            f"name {self.name}" if self.name is not None else "no name",
+            f"zone {self.zone}" if self.zone is not None else "no zone",
+            f"tags {', '.join(self.tags)}" if self.tags else "no tags",
+        ]
+        return f"Gave desk {self.desk_index + 1} {'; '.join(attributes)} from {self.start_date} onwards"
+
 
 class Event(BaseModel):
     author: int | None = Field()
     time: DateTime = Field()
-    event: SetNumDesks | BookDesk | UnbookDesk | MakeOwned | MakeFlex = Field()
+    event: (
+        SetNumDesks
+        | BookDesk
+        | UnbookDesk
+        | MakeOwned
+        | MakeFlex
+        | JoinWaitlist
+        | LeaveWaitlist
+        | CheckIn
+        | SetDeskAttributes
+    ) = Field()
+    # Identifies the request that caused the event, e.g. the Discord interaction id, so retries are only applied once.
+    idempotency_key: int | None = Field(default=None)
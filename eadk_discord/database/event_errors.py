@@ -131,3 +131,43 @@ class DeskNotOwnedError(EventError):
 
     def message(self, format_user: Callable[[int], str]) -> str:
         return f"Desk {self.desk + 1} on {self.day} is already a flex desk."
+
+
+@dataclass
+class AlreadyWaitlistedError(EventError):
+    """
+    Raised when adding a user to a waitlist they are already on.
+    """
+
+    user: int
+    day: Date
+
+    def message(self, format_user: Callable[[int], str]) -> str:
+        return f"{format_user(self.user)} is already on the waitlist for {self.day}."
+
+
+@dataclass
+class NotWaitlistedError(EventError):
+    """
+    Raised when removing a user from a waitlist they are not on.
+    """
+
+    user: int
+    day: Date
+
+    def message(self, format_user: Callable[[int], str]) -> str:
+        return f"{format_user(self.user)} is not on the waitlist for {self.day}."
+
+
+@dataclass
+class DeskNotBookedByError(EventError):
+    """
+    Raised when checking a user in at a desk that somebody else has booked.
+    """
+
+    user: int
+    desk: int
+    day: Date
+
+    def message(self, format_user: Callable[[int], str]) -> str:
+        return f"Desk {self.desk + 1} is not booked by {format_user(self.user)} on {self.day}."
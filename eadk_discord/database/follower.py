@@ -0,0 +1,99 @@
+import fcntl
+import time
+from datetime import timedelta as TimeDelta  # noqa: N812
+from pathlib import Path
+from typing import IO
+
+from beartype import beartype
+
+from .database import Database
+
+DEFAULT_POLL_INTERVAL = TimeDelta(seconds=1)
+
+
+class LeaderLock:
+    """
+    Lock held by the process that serves commands for a database, for as long as that process is alive.
+
+    The lock is released by the operating system when the process dies, however it dies.
+    """
+
+    path: Path
+    _file: IO[bytes] | None
+
+    @beartype
+    def __init__(self, database_path: Path) -> None:
+        self.path = database_path.with_name(f"{database_path.name}.leader")
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    @beartype
+    def try_acquire(self) -> bool:
+        """
+        Acquires the lock if no other process holds it. Returns whether the lock is held afterwards.
+        """
+        if self._file is not None:
+            return True
+        file = self.path.open("ab")
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class Follower:
+    """
+    Keeps an up-to-date copy of a database that is written to by another process, so that it can take over with
+    almost nothing to replay if that process dies.
+
+    The follower never handles events itself until it has been promoted.
+    """
+
+    database: Database
+    leader_lock: LeaderLock
+    poll_interval: TimeDelta
+
+    @beartype
+    def __init__(self, database_path: Path, poll_interval: TimeDelta = DEFAULT_POLL_INTERVAL) -> None:
+        self.database = Database.open(database_path)
+        self.leader_lock = LeaderLock(database_path)
+        self.poll_interval = poll_interval
+
+    @beartype
+    def poll(self) -> int:
+        """
+        Applies the events written by the leader since the last poll. Returns the number of new events.
+        """
+        return self.database.sync()
+
+    @beartype
+    def try_promote(self) -> bool:
+        """
+        Becomes the leader if no other process is. The database is brought up to date before returning True.
+        """
+        if not self.leader_lock.try_acquire():
+            return False
+        self.database.sync()
+        return True
+
+    @beartype
+    def follow(self) -> Database:
+        """
+        Polls the ledger until the leader dies, then promotes this follower and returns the up-to-date database.
+        """
+        while not self.try_promote():
+            self.poll()
+            time.sleep(self.poll_interval.total_seconds())
+        return self.database
@@ -10,6 +10,8 @@ from .event import Event
 class History(BaseModel):
     start_date: Date = Field()
     history: list[Event] = Field()
+    # Number of events preceding `history` in the ledger that have been moved to the archive.
+    offset: int = Field(default=0)
 
     @staticmethod
     def initialize(start_date: Date) -> "History":
@@ -0,0 +1,89 @@
+import bisect
+import heapq
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date as Date  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+
+from beartype import beartype
+
+from .event import Event
+
+
+class EventIndex:
+    """
+    Secondary indexes from affected dates, desks and users to ledger indices of events.
+
+    Events are added in ledger order, so every list of ledger indices is sorted.
+    """
+
+    # Events affecting a bounded range of dates are indexed under each date in the range.
+    _by_date: defaultdict[Date, list[int]]
+    # Events affecting every date from some date onwards.
+    _open_ended: list[tuple[Date, int]]
+    _by_desk: defaultdict[int, list[int]]
+    # Events affecting every desk.
+    _all_desks: list[int]
+    # Events by author and by the user they are about.
+    _by_user: defaultdict[int, list[int]]
+
+    def __init__(self) -> None:
+        self._by_date = defaultdict(list)
+        self._open_ended = []
+        self._by_desk = defaultdict(list)
+        self._all_desks = []
+        self._by_user = defaultdict(list)
+
+    @beartype
+    @staticmethod
+    def build(events: Iterable[Event]) -> "EventIndex":
+        index = EventIndex()
+        for ledger_index, event in enumerate(events):
+            index.add(ledger_index, event)
+        return index
+
+    @beartype
+    def add(self, ledger_index: int, event: Event) -> None:
+        start_date, end_date = event.event.date_range()
+        if end_date is None:
+            self._open_ended.append((start_date, ledger_index))
+        else:
+            for offset in range((end_date - start_date).days + 1):
+                self._by_date[start_date + TimeDelta(days=offset)].append(ledger_index)
+
+        match event.event.desk():
+            case None:
+                self._all_desks.append(ledger_index)
+            case desk:
+                self._by_desk[desk].append(ledger_index)
+
+        users = {event.author, event.event.affected_user()}
+        for user in users:
+            if user is not None:
+                self._by_user[user].append(ledger_index)
+
+    @beartype
+    def query(self, date: Date | None = None, desk: int | None = None, user: int | None = None) -> list[int]:
+        """
+        Returns the ledger indices of the events that affect the given date and desk and were made by or are about the
+        given user, in ledger order. Filters that are None are ignored.
+        """
+        candidates: list[list[int]] = []
+        if date is not None:
+            open_ended = [ledger_index for start_date, ledger_index in self._open_ended if start_date <= date]
+            candidates.append(list(heapq.merge(self._by_date.get(date, []), open_ended)))
+        if desk is not None:
+            candidates.append(list(heapq.merge(self._by_desk.get(desk, []), self._all_desks)))
+        if user is not None:
+            candidates.append(self._by_user.get(user, []))
+        if not candidates:
+            raise ValueError("At least one filter must be given")
+
+        candidates.sort(key=len)
+        smallest, *others = candidates
+        return [ledger_index for ledger_index in smallest if all(_contains(other, ledger_index) for other in others)]
+
+
+def _contains(sorted_indices: list[int], ledger_index: int) -> bool:
+    position = bisect.bisect_left(sorted_indices, ledger_index)
+    return position < len(sorted_indices) and sorted_indices[position] == ledger_index
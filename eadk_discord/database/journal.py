@@ -0,0 +1,195 @@
+import fcntl
+import os
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+
+from beartype import beartype
+from pydantic import BaseModel, Field
+
+from .archive import write_atomic
+from .event import Event
+
+
+class JournalHeader(BaseModel):
+    # Identifies the journal, so that readers notice when it has been replaced by a new one.
+    generation: str = Field()
+
+
+class JournalEntry(BaseModel):
+    # Ledger index of the event, i.e. the version of the ledger before the event was appended.
+    version: int = Field()
+    event: Event = Field()
+
+
+@dataclass
+class VersionConflictError(Exception):
+    """
+    Raised when appending to a journal that has been appended to since it was last read.
+    """
+
+    version: int
+
+
+class Journal:
+    """
+    Append-only log of the events that have been applied since the database file was last written.
+
+    Any number of processes may share a journal. Appends are serialized by a lock file and only succeed if the
+    appending process has read every entry in the journal, so that it has validated the event against the latest state.
+    Other processes pick up new entries by reading from where they left off.
+
+    Writing the database file starts a new, empty journal. Each journal starts with a header line holding a random
+    generation, which readers compare with the generation they read last to notice that the journal has been replaced.
+    """
+
+    database_path: Path
+    path: Path
+    lock_path: Path
+    _offset: int
+    _generation: str | None
+    _num_entries: int
+    _lock_file: IO[bytes] | None
+    _lock_depth: int
+
+    @beartype
+    def __init__(self, database_path: Path) -> None:
+        self.database_path = database_path
+        self.path = database_path.with_name(f"{database_path.name}.journal")
+        self.lock_path = database_path.with_name(f"{database_path.name}.lock")
+        self._offset = 0
+        self._generation = None
+        self._num_entries = 0
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @property
+    def num_entries(self) -> int:
+        """
+        The number of entries in the journal that have been read or appended by this process.
+        """
+        return self._num_entries
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """
+        Holds an exclusive lock on the journal across processes. The lock is reentrant within a process.
+        """
+        if self._lock_file is None:
+            self._lock_file = self.lock_path.open("ab")
+        if self._lock_depth == 0:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        """
+        Closes the lock file. It is opened again if the journal is locked again.
+        """
+        if self._lock_file is not None and self._lock_depth == 0:
+            self._lock_file.close()
+            self._lock_file = None
+
+    @beartype
+    def read_new(self) -> tuple[bool, list[JournalEntry]]:
+        """
+        Reads the entries appended since the last call.
+
+        The first value is True if the journal has been replaced since the last call, in which case the database file
+        must be read to find the entries that were in the old journal. Incomplete trailing lines are left for later.
+        """
+        try:
+            file = self.path.open("rb")
+        except FileNotFoundError:
+            replaced = self._generation is not None
+            self._reset(None, 0)
+            return replaced, []
+        with file:
+            generation = self._read_generation(file)
+            replaced = self._generation is not None and generation != self._generation
+            if generation != self._generation:
+                self._reset(generation, file.tell())
+            file.seek(self._offset)
+            data = file.read()
+        end = data.rfind(b"\n") + 1
+        entries = [JournalEntry.model_validate_json(line) for line in data[:end].splitlines() if line]
+        self._offset += end
+        self._num_entries += len(entries)
+        return replaced, entries
+
+    @beartype
+    def check(self, version: int) -> None:
+        """
+        Raises VersionConflictError if the journal contains entries that have not been read by this process.
+        Must be called while holding the lock for the result to stay valid.
+        """
+        try:
+            file = self.path.open("rb")
+        except FileNotFoundError:
+            if self._generation is not None:
+                raise VersionConflictError(version=version) from None
+            return
+        with file:
+            self._check(file, version)
+
+    @beartype
+    def append(self, version: int, event: Event) -> None:
+        """
+        Appends an event to the journal. Must be called while holding the lock.
+
+        Raises VersionConflictError if the journal contains entries that have not been read by this process.
+        """
+        if self._lock_depth == 0:
+            raise RuntimeError("The journal must be locked while appending")
+        line = JournalEntry(version=version, event=event).model_dump_json().encode() + b"\n"
+        if self._generation is None and not self.path.exists():
+            self._start()
+        # Writes go to the end of the file regardless of where the header has been read from.
+        with self.path.open("a+b") as file:
+            self._check(file, version)
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self._offset += len(line)
+        self._num_entries += 1
+
+    def rotate(self) -> None:
+        """
+        Replaces the journal with an empty one. Must be called while holding the lock, after writing the database file.
+        """
+        if self._lock_depth == 0:
+            raise RuntimeError("The journal must be locked while rotating")
+        self._start()
+
+    def _start(self) -> None:
+        """
+        Writes a new journal with a fresh generation in place of the current one.
+        """
+        generation = uuid.uuid4().hex
+        header = JournalHeader(generation=generation).model_dump_json().encode() + b"\n"
+        write_atomic(self.path, header)
+        self._reset(generation, len(header))
+
+    def _check(self, file: IO[bytes], version: int) -> None:
+        file.seek(0)
+        generation = self._read_generation(file)
+        if generation != self._generation or os.fstat(file.fileno()).st_size != self._offset:
+            raise VersionConflictError(version=version)
+
+    @staticmethod
+    def _read_generation(file: IO[bytes]) -> str:
+        # The header is written atomically with the journal, so it is always complete.
+        return JournalHeader.model_validate_json(file.readline()).generation
+
+    def _reset(self, generation: str | None, offset: int) -> None:
+        self._generation = generation
+        self._offset = offset
+        self._num_entries = 0
@@ -0,0 +1,173 @@
+import mmap
+import weakref
+from collections.abc import Iterator, Sequence
+from datetime import date as Date  # noqa: N812
+from datetime import datetime as DateTime  # noqa: N812
+from pathlib import Path
+from typing import overload
+
+from beartype import beartype
+
+from .binary import (
+    EPOCH,
+    FLAG_HAS_TIME_ZONE,
+    HEADER_SIZE,
+    MICROSECOND,
+    RECORD,
+    Decoder,
+    decode_header,
+    decode_strings,
+)
+from .event import Event
+from .history import History
+
+
+def _sort_key(flags: int, utc_offset_minutes: int, micros: int) -> int:
+    """
+    Time of an event as microseconds since the epoch, in UTC if the event has a time zone.
+    """
+    if flags & FLAG_HAS_TIME_ZONE:
+        return micros - utc_offset_minutes * 60_000_000
+    return micros
+
+
+class MappedHistory(Sequence[Event]):
+    """
+    Read-only view of a ledger in the binary format backed by a memory map.
+
+    Records are read in place, and events are only built when they are accessed, so opening a view is O(1) regardless of
+    the size of the ledger. Slicing returns another view over the same memory map, which keeps the view it was sliced
+    from alive.
+    """
+
+    start_date: Date
+    offset: int
+    _mmap: mmap.mmap | None
+    _records: memoryview
+    _decoder: Decoder
+    _parent: "MappedHistory | None"
+    _views: "weakref.WeakSet[MappedHistory]"
+
+    @beartype
+    def __init__(
+        self,
+        start_date: Date,
+        offset: int,
+        records: memoryview,
+        owner: mmap.mmap | None = None,
+        decoder: Decoder | None = None,
+        parent: "MappedHistory | None" = None,
+    ) -> None:
+        self.start_date = start_date
+        self.offset = offset
+        self._mmap = owner
+        self._records = records
+        self._decoder = decoder if decoder is not None else Decoder()
+        self._parent = parent
+        self._views = weakref.WeakSet()
+        if parent is not None:
+            parent._views.add(self)
+
+    @beartype
+    @staticmethod
+    def open(path: Path) -> "MappedHistory":
+        with path.open("rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+        start_date, offset, num_events = decode_header(view)
+        records = view[HEADER_SIZE : HEADER_SIZE + num_events * RECORD.size]
+        decoder = Decoder(decode_strings(view, num_events))
+        view.release()
+        return MappedHistory(start_date, offset, records, owner=buffer, decoder=decoder)
+
+    def close(self) -> None:
+        """
+        Unmaps the file. Views created by slicing this one are closed as well and must not be used afterwards.
+        """
+        # The memory map can only be closed once no view exports its memory.
+        for view in list(self._views):
+            view.close()
+        self._records.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self) -> "MappedHistory":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._records) // RECORD.size
+
+    @overload
+    def __getitem__(self, index: int) -> Event: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "MappedHistory": ...
+
+    def __getitem__(self, index: int | slice) -> "Event | MappedHistory":
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("MappedHistory only supports contiguous slices")
+            stop = max(start, stop)
+            return MappedHistory(
+                self.start_date,
+                self.offset + start,
+                self._records[start * RECORD.size : stop * RECORD.size],
+                decoder=self._decoder,
+                parent=self,
+            )
+        return self.event(index)
+
+    @beartype
+    def event(self, index: int) -> Event:
+        length = len(self)
+        if index < 0:
+            index += length
+        if index < 0 or index >= length:
+            raise IndexError(f"Event {index} is out of range for a ledger of {length} events")
+        event: Event = self._decoder.event(RECORD.unpack_from(self._records, index * RECORD.size))
+        return event
+
+    def __iter__(self) -> Iterator[Event]:
+        # Unpacks one record at a time instead of using `iter_unpack`, which would hold an export of the records until
+        # the iterator is garbage collected and keep `close` from releasing them.
+        records = self._records
+        for offset in range(0, len(records), RECORD.size):
+            yield self._decoder.event(RECORD.unpack_from(records, offset))
+
+    @beartype
+    def time(self, index: int) -> DateTime:
+        """
+        Returns the time of the event with the given index without building the event.
+        """
+        _, flags, utc_offset_minutes, _, _, _, _, _, micros, _ = RECORD.unpack_from(self._records, index * RECORD.size)
+        return self._decoder.time(flags, utc_offset_minutes, micros)
+
+    @beartype
+    def bisect_time(self, time: DateTime) -> int:
+        """
+        Returns the index of the first event that happened at or after the given time.
+        Assumes that events are stored in the order they happened.
+        """
+        match time.utcoffset():
+            case None:
+                target = (time - EPOCH) // MICROSECOND
+            case utc_offset:
+                target = (time.replace(tzinfo=None) - utc_offset - EPOCH) // MICROSECOND
+        records = self._records
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            _, flags, utc_offset_minutes, _, _, _, _, _, micros, _ = RECORD.unpack_from(records, middle * RECORD.size)
+            if _sort_key(flags, utc_offset_minutes, micros) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @beartype
+    def to_history(self) -> History:
+        return History.model_construct(start_date=self.start_date, history=list(self), offset=self.offset)
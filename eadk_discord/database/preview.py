@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+
+from beartype import beartype
+
+from .diff import Diff
+from .event import Event
+from .event_errors import EventError
+from .state import State
+
+
+@dataclass
+class Preview:
+    """
+    What handling an event would do: every conflict that would make it fail, or the changes it would make.
+    """
+
+    event: Event
+    conflicts: list[EventError]
+    # The changes the event would make, if it would succeed.
+    diff: Diff | None
+
+    @property
+    def succeeds(self) -> bool:
+        return not self.conflicts
+
+
+@beartype
+def preview(state: State, index: int, event: Event) -> Preview:
+    """
+    Previews handling the event as the event at ledger index `index` by trying it on an overlay of the state, which
+    only copies the days the event changes. The state is not changed.
+    """
+    overlay = state.overlay()
+    start_date, end_date = event.event.date_range()
+    try:
+        conflicts = overlay.conflicts(event)
+        if conflicts:
+            return Preview(event=event, conflicts=conflicts, diff=None)
+        if end_date is None:
+            end_date = max(start_date, overlay.days[-1].date)
+        # Materializes the affected days first, so that they are compared to how they were before the event.
+        overlay.days_between(start_date, end_date)
+        before = overlay.snapshot()
+        overlay.handle_event(event)
+    except EventError as error:
+        return Preview(event=event, conflicts=[error], diff=None)
+    diff = Diff.between(
+        index, event, before.days_between(start_date, end_date), overlay.days_between(start_date, end_date)
+    )
+    return Preview(event=event, conflicts=[], diff=diff)
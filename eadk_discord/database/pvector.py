@@ -0,0 +1,210 @@
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
+from typing import Any, Generic, TypeVar, get_args, overload
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+from .typecheck import unchecked
+
+T = TypeVar("T")
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class PVector(Sequence[T], Generic[T]):
+    """
+    Persistent vector: an immutable sequence where `set` and `append` return a new vector sharing all but O(log n)
+    nodes with the old one, so keeping old versions around costs nothing until they diverge.
+
+    Elements are stored in a trie of 32-wide nodes with the last, partially filled leaf kept aside as the tail, so
+    indexing and updates touch O(log32 n) nodes and appending is amortized O(1). Nodes are never modified once a vector
+    refers to them. Slicing returns a list.
+    """
+
+    __slots__ = ("_count", "_shift", "_root", "_tail")
+
+    _count: int
+    # Number of index bits consumed above the leaves, i.e. BITS times the depth of the trie.
+    _shift: int
+    _root: list[Any]
+    _tail: list[T]
+
+    @unchecked
+    def __init__(self, items: Iterable[T] = ()) -> None:
+        items = list(items)
+        count = len(items)
+        tail_offset = _tail_offset(count)
+        nodes: list[Any] = [items[i : i + WIDTH] for i in range(0, tail_offset, WIDTH)]
+        shift = BITS
+        while len(nodes) > WIDTH:
+            nodes = [nodes[i : i + WIDTH] for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+        self._count = count
+        self._shift = shift
+        self._root = nodes
+        self._tail = items[tail_offset:]
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        (item_type,) = get_args(source) or (Any,)
+        list_schema = handler.generate_schema(list[item_type])  # type: ignore[valid-type]
+        from_list = core_schema.no_info_after_validator_function(cls, list_schema)
+        return core_schema.json_or_python_schema(
+            json_schema=from_list,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_list]),
+            serialization=core_schema.plain_serializer_function_ser_schema(list, return_schema=list_schema),
+        )
+
+    @unchecked
+    def __len__(self) -> int:
+        return self._count
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[T]: ...
+
+    @unchecked
+    def __getitem__(self, index: int | slice) -> T | list[T]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if step != 1:
+                return list(self)[index]
+            return list(islice(self.iter_from(start), max(stop - start, 0)))
+        index = self._index(index)
+        return self._leaf(index)[index & MASK]
+
+    @unchecked
+    def __iter__(self) -> Iterator[T]:
+        return self.iter_from(0)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PVector):
+            return NotImplemented
+        return self is other or (
+            self._count == other._count and all(a is b or a == b for a, b in zip(self, other, strict=True))
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PVector({list(self)!r})"
+
+    @unchecked
+    def iter_from(self, start: int) -> Iterator[T]:
+        """
+        Iterates over the elements from index `start` onwards, a leaf at a time.
+        """
+        tail_offset = _tail_offset(self._count)
+        leaf_start = start & ~MASK
+        while leaf_start < tail_offset:
+            yield from self._leaf(leaf_start)[max(start - leaf_start, 0) :]
+            leaf_start += WIDTH
+        yield from self._tail[max(start - tail_offset, 0) :]
+
+    @unchecked
+    def set(self, index: int, value: T) -> "PVector[T]":
+        """
+        Returns a copy of the vector with the element at `index` replaced.
+        """
+        index = self._index(index)
+        if index >= _tail_offset(self._count):
+            tail = list(self._tail)
+            tail[index & MASK] = value
+            return self._with(self._count, self._shift, self._root, tail)
+        return self._with(self._count, self._shift, _set(self._shift, self._root, index, value), self._tail)
+
+    @unchecked
+    def append(self, value: T) -> "PVector[T]":
+        """
+        Returns a copy of the vector with `value` added at the end.
+        """
+        count = self._count
+        if count - _tail_offset(count) < WIDTH:
+            return self._with(count + 1, self._shift, self._root, [*self._tail, value])
+        # The tail is full, so it moves into the trie, which grows a level if the root is full as well.
+        shift = self._shift
+        if (count >> BITS) > (1 << shift):
+            root = [self._root, _new_path(shift, self._tail)]
+            shift += BITS
+        else:
+            root = _push_tail(count, shift, self._root, self._tail)
+        return self._with(count + 1, shift, root, [value])
+
+    @unchecked
+    def extend(self, values: Iterable[T]) -> "PVector[T]":
+        vector = self
+        for value in values:
+            vector = vector.append(value)
+        return vector
+
+    @unchecked
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("PVector index out of range")
+        return index
+
+    @unchecked
+    def _leaf(self, index: int) -> list[T]:
+        if index >= _tail_offset(self._count):
+            return self._tail
+        node = self._root
+        for level in range(self._shift, 0, -BITS):
+            node = node[(index >> level) & MASK]
+        return node
+
+    @classmethod
+    @unchecked
+    def _with(cls, count: int, shift: int, root: list[Any], tail: list[T]) -> "PVector[T]":
+        vector = cls.__new__(cls)
+        vector._count = count
+        vector._shift = shift
+        vector._root = root
+        vector._tail = tail
+        return vector
+
+
+@unchecked
+def _tail_offset(count: int) -> int:
+    return 0 if count < WIDTH else ((count - 1) >> BITS) << BITS
+
+
+@unchecked
+def _set(level: int, node: list[Any], index: int, value: Any) -> list[Any]:
+    node = list(node)
+    if level == 0:
+        node[index & MASK] = value
+    else:
+        sub_index = (index >> level) & MASK
+        node[sub_index] = _set(level - BITS, node[sub_index], index, value)
+    return node
+
+
+@unchecked
+def _new_path(level: int, node: list[Any]) -> list[Any]:
+    for _ in range(0, level, BITS):
+        node = [node]
+    return node
+
+
+@unchecked
+def _push_tail(count: int, level: int, parent: list[Any], tail: list[Any]) -> list[Any]:
+    sub_index = ((count - 1) >> level) & MASK
+    node = list(parent)
+    if level == BITS:
+        child = tail
+    elif sub_index < len(parent):
+        child = _push_tail(count, level - BITS, parent[sub_index], tail)
+    else:
+        child = _new_path(level - BITS, tail)
+    if sub_index < len(node):
+        node[sub_index] = child
+    else:
+        node.append(child)
+    return node
@@ -1,29 +1,78 @@
 import itertools
+import weakref
+from bisect import bisect_right
+from collections.abc import Iterator
+from dataclasses import dataclass
 from datetime import date as Date  # noqa: N812
 from datetime import timedelta as TimeDelta  # noqa: N812
 
 from beartype import beartype
-from beartype.typing import Sequence  # noqa: N812
-from pydantic import BaseModel, Field
+from beartype.typing import Any, Sequence  # noqa: N812
+from pydantic import BaseModel, Field, PrivateAttr
 
 from eadk_discord.database.event_errors import (
+    AlreadyWaitlistedError,
     DateTooEarlyError,
     DeskAlreadyBookedError,
     DeskAlreadyOwnedError,
+    DeskNotBookedByError,
     DeskNotBookedError,
     DeskNotOwnedError,
+    EventError,
     InvalidDateRangeError,
     NonExistentDeskError,
+    NotWaitlistedError,
     RemoveDeskError,
 )
 
-from .event import BookDesk, Event, MakeFlex, MakeOwned, SetNumDesks, UnbookDesk
+from .dedupe import Deduplicator
+from .event import (
+    BookDesk,
+    CheckIn,
+    Event,
+    JoinWaitlist,
+    LeaveWaitlist,
+    MakeFlex,
+    MakeOwned,
+    SetDeskAttributes,
+    SetNumDesks,
+    UnbookDesk,
+)
 from .history import History
+from .pvector import PVector
+from .typecheck import unchecked
+
+
+class DeskAttributes(BaseModel, frozen=True):
+    name: str | None = Field(default=None)
+    zone: str | None = Field(default=None)
+    tags: frozenset[str] = Field(default=frozenset())
+
+
+NO_ATTRIBUTES = DeskAttributes()
+
+
+class DeskFilter(BaseModel, frozen=True):
+    """
+    Selects the desks in a zone that have all of the given tags. An empty filter selects every desk.
+    """
+
+    zone: str | None = Field(default=None)
+    tags: frozenset[str] = Field(default=frozenset())
+
+    def is_empty(self) -> bool:
+        return self.zone is None and not self.tags
+
+    @beartype
+    def matches(self, attributes: DeskAttributes) -> bool:
+        return (self.zone is None or attributes.zone == self.zone) and self.tags <= attributes.tags
 
 
 class DeskStatus(BaseModel):
     booker: int | None = Field(serialization_alias="booker")
     owner: int | None = Field(serialization_alias="owner")
+    # Whether the booker has checked in. Bookings that are not checked in by the cutoff may be released.
+    checked_in: bool = Field(default=False, serialization_alias="checked_in")
 
     @beartype
     def _make_owned(self, user: int) -> None:
@@ -41,6 +90,7 @@ class DeskStatus(BaseModel):
         """
         if self.owner == self.booker:
             self.booker = None
+            self.checked_in = False
         self.owner = None
 
 
@@ -72,10 +122,16 @@ class Day(BaseModel):
         return result
 
     @beartype
-    def get_available_desk(self) -> int | None:
+    def get_available_desk(self, candidates: Sequence[int] | None = None) -> int | None:
         """
         Returns the first available desk, or None if all desks are booked.
+        If candidates are given, only those desks are considered, e.g. the desks matching a filter.
         """
+        if candidates is not None:
+            for i in candidates:
+                if i < len(self.desks) and self.desks[i].booker is None:
+                    return i
+            return None
         for i, desk in enumerate(self.desks):
             if desk.booker is None:
                 return i
@@ -89,38 +145,260 @@ class Day(BaseModel):
         return [i for i, desk in enumerate(self.desks) if desk.booker == member]
 
 
+@dataclass
+class DayEvictedError(Exception):
+    """
+    Raised when accessing a date whose Day has been evicted from memory.
+    The owner of the state is expected to restore the evicted days and retry.
+    """
+
+    date: Date
+
+
+@unchecked
+def _copy_day(day: Day) -> Day:
+    return day.model_copy(update={"desks": [desk.model_copy() for desk in day.desks]})
+
+
 class State(BaseModel):
+    """
+    The bookings resulting from the ledger.
+
+    Days are kept in a persistent vector, so `snapshot` can hand out a copy of the state in O(1) that shares every day
+    with the original. Days are copied on write: before the state first changes a day after a snapshot, the snapshots
+    that share the day are given a copy of it, which costs O(num desks + log num days) for each snapshot that is still
+    alive. The state keeps changing its own Day objects, so the days returned by `day` stay current. Days that are
+    still shared are the same objects in both copies, which makes it cheap to find the days an event changed.
+    """
+
     start_date: Date = Field(serialization_alias="start_date")
-    days: list[Day] = Field(serialization_alias="days")
+    days: PVector[Day] = Field(serialization_alias="days")
+    # Number of days from `start_date` that have been evicted, i.e. `days[0]` is `start_date + day_offset`.
+    day_offset: int = Field(default=0, serialization_alias="day_offset")
+    # Users waiting for a desk on each date, in the order they will get one.
+    waitlists: dict[Date, list[int]] = Field(default_factory=dict, serialization_alias="waitlists")
+    # Attributes of each desk as (first date, attributes) pairs sorted by date. Each applies until the next one.
+    desk_attributes: dict[int, list[tuple[Date, DeskAttributes]]] = Field(
+        default_factory=dict, serialization_alias="desk_attributes"
+    )
+    # Desks that have a tag or are in a zone on some date, so that filters only need to look at those desks.
+    _desks_by_tag: dict[str, set[int]] = PrivateAttr(default_factory=dict)
+    _desks_by_zone: dict[str, set[int]] = PrivateAttr(default_factory=dict)
+    # Days that are not shared with a snapshot and may be changed in place, as day numbers counted from `start_date`.
+    _owned_days: set[int] = PrivateAttr(default_factory=set)
+    # Snapshots copy the days they change for themselves, instead of handing copies to the other snapshots.
+    _is_snapshot: bool = PrivateAttr(default=False)
+    # The snapshots taken of this state, and of its snapshots, that may still share its days.
+    _snapshots: list[weakref.ref["State"]] = PrivateAttr(default_factory=list)
+    # Whether the dicts of waitlists, and of desk attributes and their indexes, are shared with a snapshot and must be
+    # copied before they are changed. The values in them may always be shared, so they are replaced instead of changed.
+    _shared_waitlists: bool = PrivateAttr(default=False)
+    _shared_attributes: bool = PrivateAttr(default=False)
+
+    def model_post_init(self, context: Any) -> None:
+        for desk_index, timeline in self.desk_attributes.items():
+            for _, attributes in timeline:
+                for tag in attributes.tags:
+                    self._desks_by_tag.setdefault(tag, set()).add(desk_index)
+                if attributes.zone is not None:
+                    self._desks_by_zone.setdefault(attributes.zone, set()).add(desk_index)
+        self._owned_days = set(range(self.day_offset, self.day_offset + len(self.days)))
+
+    def __eq__(self, other: object) -> bool:
+        # Only the fields are compared, since the private attributes are derived from them or track sharing.
+        if not isinstance(other, State):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
+
+    @beartype
+    def snapshot(self) -> "State":
+        """
+        Returns a copy of the state that is not affected by later changes to this state, and vice versa. Takes O(1).
+        """
+        snapshot = self.model_copy()
+        for state in (self, snapshot):
+            state._owned_days = set()
+            state._shared_waitlists = True
+            state._shared_attributes = True
+        snapshot._is_snapshot = True
+        # The list is shared with the snapshot, so the state also hands copies to snapshots of the snapshot.
+        self._snapshots[:] = [ref for ref in self._snapshots if ref() is not None]
+        self._snapshots.append(weakref.ref(snapshot))
+        snapshot._snapshots = self._snapshots
+        return snapshot
+
+    @beartype
+    def overlay(self) -> "State":
+        """
+        Returns a copy of the state to try events on, e.g. to preview them. Like `snapshot` it takes O(1) and the copy
+        copies days as it changes them, but this state keeps its days, so the copy must not be used after this state
+        changes.
+        """
+        overlay = self.model_copy()
+        overlay._owned_days = set()
+        overlay._shared_waitlists = True
+        overlay._shared_attributes = True
+        overlay._is_snapshot = True
+        overlay._snapshots = []
+        return overlay
+
+    def _set_waitlist(self, date: Date, waitlist: list[int]) -> None:
+        """
+        Replaces the waitlist of the date, copying the dict of waitlists first if it is shared with a snapshot.
+        """
+        if self._shared_waitlists:
+            self.waitlists = dict(self.waitlists)
+            self._shared_waitlists = False
+        if waitlist:
+            self.waitlists[date] = waitlist
+        else:
+            self.waitlists.pop(date, None)
+
+    @beartype
+    def prune_waitlists(self, before: Date) -> int:
+        """
+        Drops the waitlists of the dates before the given date, on which nobody can get a desk anymore.
+        Returns the number of dropped waitlists.
+        """
+        past = [date for date in self.waitlists if date < before]
+        for date in past:
+            self._set_waitlist(date, [])
+        return len(past)
+
+    @unchecked
+    def _writable_day(self, day_index: int) -> Day:
+        """
+        Returns the day at the index in `days` to be changed. If the day is shared, a snapshot copies it for itself,
+        while any other state gives a copy to the snapshots that share it.
+        """
+        day_number = self.day_offset + day_index
+        day = self.days[day_index]
+        if day_number in self._owned_days:
+            return day
+        if self._is_snapshot:
+            day = _copy_day(day)
+            self.days = self.days.set(day_index, day)
+        else:
+            copy = None
+            for ref in self._snapshots:
+                snapshot = ref()
+                if snapshot is None:
+                    continue
+                snapshot_index = day_number - snapshot.day_offset
+                if 0 <= snapshot_index < len(snapshot.days) and snapshot.days[snapshot_index] is day:
+                    if copy is None:
+                        copy = _copy_day(day)
+                    snapshot.days = snapshot.days.set(snapshot_index, copy)
+        self._owned_days.add(day_number)
+        return day
+
+    def _writable_days(self, day_index: int) -> Iterator[Day]:
+        """
+        Iterates over the materialized days from the index in `days` onwards to be changed, like `_writable_day`.
+        """
+        for i in range(day_index, len(self.days)):
+            yield self._writable_day(i)
 
     @beartype
     @staticmethod
-    def initialize(history: History) -> "State":
-        state = State(start_date=history.start_date, days=[Day.create_unbooked(history.start_date, 0)])
+    def initialize(
+        history: History, checkpoint: "State | None" = None, deduplicator: Deduplicator | None = None
+    ) -> "State":
+        """
+        Replays the events of the history, starting from the checkpoint if one is given.
+
+        The checkpoint must be the state resulting from the events preceding the history, and is consumed.
+        Events that repeat the idempotency key of a recent event are skipped. If a deduplicator is given, it is used to
+        recognize such events and is left remembering the most recent keys.
+        """
+        if checkpoint is None:
+            state = State(start_date=history.start_date, days=PVector([Day.create_unbooked(history.start_date, 0)]))
+        else:
+            state = checkpoint
+        if deduplicator is None:
+            deduplicator = Deduplicator()
         for event in history.history:
+            if deduplicator.get(event.idempotency_key) is not None:
+                continue
             state.handle_event(event)
+            deduplicator.add(event)
         return state
 
     @beartype
     def day(self, date: Date) -> tuple[Day, int]:
         """
-        Returns the Day object for the given date, or None if the date is not in the database.
+        Returns the Day object for the given date along with its index in `days`. The day may be changed.
+        Raises DayEvictedError if the day has been evicted.
+        """
+        day_index = self._day_index(date)
+        return self._writable_day(day_index), day_index
+
+    @beartype
+    def days_between(self, start_date: Date, end_date: Date) -> Sequence[Day]:
+        """
+        Returns the days from `start_date` to `end_date` without copying them, so they must not be changed.
+        """
+        indices = self._day_indices(start_date, end_date)
+        return self.days[indices.start : indices.stop]
+
+    @unchecked
+    def _day_indices(self, start_date: Date, end_date: Date) -> range:
+        if end_date < start_date:
+            raise InvalidDateRangeError(start_date=start_date, end_date=end_date)
+        start_index = self._day_index(start_date)
+        return range(start_index, self._day_index(end_date) + 1)
+
+    @unchecked
+    def _day_index(self, date: Date) -> int:
+        """
+        Returns the index of the date in `days`, materializing the days up to it.
         """
         day_index = (date - self.start_date).days
         if day_index < 0:
             raise DateTooEarlyError(date=date, start_date=self.start_date)
+        day_index -= self.day_offset
+        if day_index < 0:
+            raise DayEvictedError(date=date)
         while len(self.days) <= day_index:
-            self.days.append(Day.create_from_previous(self.days[-1]))
-        return self.days[day_index], day_index
+            self._owned_days.add(self.day_offset + len(self.days))
+            self.days = self.days.append(Day.create_from_previous(self.days[-1]))
+        return day_index
+
+    @beartype
+    def evict(self, before: Date) -> int:
+        """
+        Drops the materialized days before the given date. The last materialized day is always kept.
+        Returns the number of evicted days.
+        """
+        num_evicted = min((before - self.days[0].date).days, len(self.days) - 1)
+        if num_evicted <= 0:
+            return 0
+        self.days = PVector(self.days[num_evicted:])
+        self._owned_days.difference_update(range(self.day_offset, self.day_offset + num_evicted))
+        self.day_offset += num_evicted
+        self.prune_waitlists(self.days[0].date)
+        return num_evicted
+
+    @beartype
+    def restore(self, rebuilt: "State") -> None:
+        """
+        Brings back the evicted days from a rebuilt copy of this state.
+        """
+        if rebuilt.start_date != self.start_date or rebuilt.day_offset != 0:
+            raise ValueError("The rebuilt state must contain every day from the start date")
+        if self.day_offset == 0:
+            return
+        rebuilt.days_between(self.start_date, self.start_date + TimeDelta(self.day_offset - 1))
+        first_kept = self.days[0].date
+        self.days = PVector([*rebuilt.days[: self.day_offset], *self.days])
+        self.day_offset = 0
+        for date, waitlist in rebuilt.waitlists.items():
+            if date < first_kept:
+                self._set_waitlist(date, waitlist)
 
     @beartype
     def day_range(self, start_date: Date, end_date: Date) -> Sequence[Day]:
-        if end_date < start_date:
-            raise InvalidDateRangeError(start_date=start_date, end_date=end_date)
-        start_day, start_index = self.day(start_date)
-        end_day, end_index = self.day(end_date)
-        # The two lines above should ensure that this line is valid.
-        return self.days[start_index : end_index + 1]
+        return [self._writable_day(i) for i in self._day_indices(start_date, end_date)]
 
     @beartype
     def handle_event(self, event: Event) -> None:
@@ -135,11 +413,124 @@ class State(BaseModel):
                 self._make_owned(event.event)
             case MakeFlex():
                 self._make_flex(event.event)
+            case JoinWaitlist():
+                self._join_waitlist(event.event)
+            case LeaveWaitlist():
+                self._leave_waitlist(event.event)
+            case CheckIn():
+                self._check_in(event.event)
+            case SetDeskAttributes():
+                self._set_desk_attributes(event.event)
+
+    @beartype
+    def conflicts(self, event: Event) -> list[EventError]:
+        """
+        Returns every conflict that would make the event fail, where handling the event only raises the first. These
+        are the conflicts that can occur on many days: booked or owned desks that SetNumDesks would remove, desks that
+        MakeOwned would take from another owner and desks that BookDesk would book twice, up to the first day without
+        the desk, which is a conflict as well. Other errors are only raised by handling the event. Materializes the days
+        that handling the event would.
+        """
+        payload = event.event
+        conflicts: list[EventError] = []
+        match payload:
+            case SetNumDesks():
+                for day in self.days.iter_from(self._day_index(payload.date)):
+                    for desk_index in range(payload.num_desks, len(day.desks)):
+                        desk = day.desks[desk_index]
+                        if desk.booker or desk.owner:
+                            conflicts.append(
+                                RemoveDeskError(
+                                    booker=desk.booker, owner=desk.owner, desk_index=desk_index, day=day.date
+                                )
+                            )
+            case MakeOwned() if payload.desk_index >= 0:
+                for day in self.days.iter_from(self._day_index(payload.start_date)):
+                    if payload.desk_index >= len(day.desks):
+                        break
+                    owner = day.desks[payload.desk_index].owner
+                    if owner and owner != payload.user:
+                        conflicts.append(DeskAlreadyOwnedError(owner=owner, desk=payload.desk_index, day=day.date))
+            case BookDesk() if payload.desk_index >= 0:
+                indices = self._day_indices(payload.start_date, payload.end_date)
+                for day in self.days[indices.start : indices.stop]:
+                    try:
+                        booker = day.desk(payload.desk_index).booker
+                    except NonExistentDeskError as error:
+                        # Handling the event stops at the first day without the desk.
+                        conflicts.append(error)
+                        break
+                    if booker is not None:
+                        conflicts.append(DeskAlreadyBookedError(booker=booker, desk=payload.desk_index, day=day.date))
+        return conflicts
+
+    @beartype
+    def attributes(self, desk_index: int, date: Date) -> DeskAttributes:
+        timeline = self.desk_attributes.get(desk_index)
+        if not timeline:
+            return NO_ATTRIBUTES
+        i = bisect_right(timeline, date, key=lambda entry: entry[0])
+        return timeline[i - 1][1] if i else NO_ATTRIBUTES
+
+    @beartype
+    def matching_desks(self, date: Date, desk_filter: DeskFilter) -> list[int]:
+        """
+        Returns the indices of the desks on the given date that match the filter, in order.
+        Only the desks that have one of the filter's attributes on some date are checked.
+        """
+        day = self.days[self._day_index(date)]
+        if desk_filter.is_empty():
+            return list(range(len(day.desks)))
+        candidate_sets = [self._desks_by_tag.get(tag, set()) for tag in desk_filter.tags]
+        if desk_filter.zone is not None:
+            candidate_sets.append(self._desks_by_zone.get(desk_filter.zone, set()))
+        candidates = set.intersection(*candidate_sets)
+        return sorted(
+            desk_index
+            for desk_index in candidates
+            if desk_index < len(day.desks) and desk_filter.matches(self.attributes(desk_index, date))
+        )
+
+    def _index_desk(self, desk_index: int) -> None:
+        """
+        Updates the indexes after the attributes of the desk changed, replacing the sets that change.
+        """
+        timeline = self.desk_attributes.get(desk_index, [])
+        tags = {tag for _, attributes in timeline for tag in attributes.tags}
+        zones = {attributes.zone for _, attributes in timeline if attributes.zone is not None}
+        for index, keys in ((self._desks_by_tag, tags), (self._desks_by_zone, zones)):
+            for key in keys | set(index):
+                desks = index.get(key, set())
+                if (desk_index in desks) != (key in keys):
+                    index[key] = desks ^ {desk_index}
+
+    @beartype
+    def waitlist(self, date: Date) -> Sequence[int]:
+        return self.waitlists.get(date, [])
+
+    def _assign_waitlisted(self, day: Day) -> None:
+        """
+        Books the free desks of the day for the users waiting for one, in order.
+        Users who have booked a desk on the day since joining the waitlist are skipped.
+        """
+        waitlist = self.waitlists.get(day.date)
+        if not waitlist:
+            return
+        remaining = list(waitlist)
+        for desk in day.desks:
+            while remaining and day.booked_desks(remaining[0]):
+                remaining.pop(0)
+            if not remaining:
+                break
+            if desk.booker is None:
+                desk.booker = remaining.pop(0)
+        if remaining != waitlist:
+            self._set_waitlist(day.date, remaining)
 
     @beartype
     def _set_num_desks(self, event: SetNumDesks) -> None:
-        _, day_index = self.day(event.date)
-        for day in self.days[day_index:]:
+        day_index = self._day_index(event.date)
+        for day in self._writable_days(day_index):
             if len(day.desks) > event.num_desks:
                 for desk_index, desk in enumerate(day.desks[event.num_desks :]):
                     desk_index += event.num_desks
@@ -152,50 +543,63 @@ class State(BaseModel):
                         (DeskStatus(booker=None, owner=None) for _ in range(event.num_desks - len(day.desks))),
                     )
                 )
-        for day in self.days[day_index:]:
+        for day in self._writable_days(day_index):
             day.desks = day.desks[: event.num_desks]
+            self._assign_waitlisted(day)
 
     @beartype
     def _book_desk(self, event: BookDesk) -> None:
-        days = self.day_range(event.start_date, event.end_date)
         desk_index = event.desk_index
-        for day in days:
+        indices = self._day_indices(event.start_date, event.end_date)
+        for day in self.days[indices.start : indices.stop]:
             booker = day.desk(desk_index).booker
             if booker is not None:
                 raise DeskAlreadyBookedError(booker=booker, desk=desk_index, day=day.date)
-        for day in days:
-            day.desk(desk_index).booker = event.user
+        for i in indices:
+            day = self._writable_day(i)
+            desk = day.desks[desk_index]
+            desk.booker = event.user
+            desk.checked_in = False
+            waitlist = self.waitlists.get(day.date)
+            if waitlist is not None and event.user in waitlist:
+                self._set_waitlist(day.date, [user for user in waitlist if user != event.user])
 
     @beartype
     def _unbook_desk(self, event: UnbookDesk) -> None:
-        days = self.day_range(event.start_date, event.end_date)
         desk_index = event.desk_index
-        for day in days:
+        indices = self._day_indices(event.start_date, event.end_date)
+        for day in self.days[indices.start : indices.stop]:
             if day.desk(desk_index) is None:
                 raise DeskNotBookedError(desk=desk_index, day=day.date)
-        for day in days:
-            day.desk(desk_index).booker = None
+        for i in indices:
+            day = self._writable_day(i)
+            desk = day.desks[desk_index]
+            desk.booker = None
+            desk.checked_in = False
+            self._assign_waitlisted(day)
 
     @beartype
     def _make_owned(self, event: MakeOwned) -> None:
-        day, day_index = self.day(event.start_date)
+        day_index = self._day_index(event.start_date)
+        day = self.days[day_index]
         desk_index = event.desk_index
         if desk_index >= len(day.desks) or desk_index < 0:
             raise NonExistentDeskError(desk=desk_index, num_desks=len(day.desks), day=event.start_date)
-        for day in self.days[day_index:]:
+        for day in self.days.iter_from(day_index):
             if desk_index >= len(day.desks):
                 break
             owner = day.desks[desk_index].owner
             if owner and owner != event.user:
                 raise DeskAlreadyOwnedError(owner=owner, desk=desk_index, day=day.date)
-        for day in self.days[day_index:]:
+        for day in self._writable_days(day_index):
             if desk_index >= len(day.desks):
                 break
             day.desks[desk_index]._make_owned(event.user)
 
     @beartype
     def _make_flex(self, event: MakeFlex) -> None:
-        day, day_index = self.day(event.start_date)
+        day_index = self._day_index(event.start_date)
+        day = self.days[day_index]
         desk_index = event.desk_index
         if desk_index >= len(day.desks) or desk_index < 0:
             raise NonExistentDeskError(desk=desk_index, num_desks=len(day.desks), day=event.start_date)
@@ -203,8 +607,50 @@ class State(BaseModel):
             raise DeskNotOwnedError(desk=desk_index, day=event.start_date)
         else:
             desk_owner = day.desks[desk_index].owner
-        for day in self.days[day_index:]:
+        for i in range(day_index, len(self.days)):
+            day = self.days[i]
             if desk_index >= len(day.desks) or day.desks[desk_index].owner != desk_owner:
                 break
+            day = self._writable_day(i)
             desk = day.desks[desk_index]
             desk._make_flex()
+            self._assign_waitlisted(day)
+
+    @beartype
+    def _join_waitlist(self, event: JoinWaitlist) -> None:
+        self._day_index(event.date)
+        waitlist = self.waitlists.get(event.date, [])
+        if event.user in waitlist:
+            raise AlreadyWaitlistedError(user=event.user, day=event.date)
+        self._set_waitlist(event.date, [*waitlist, event.user])
+
+    @beartype
+    def _leave_waitlist(self, event: LeaveWaitlist) -> None:
+        self._day_index(event.date)
+        waitlist = self.waitlists.get(event.date, [])
+        if event.user not in waitlist:
+            raise NotWaitlistedError(user=event.user, day=event.date)
+        self._set_waitlist(event.date, [user for user in waitlist if user != event.user])
+
+    @beartype
+    def _check_in(self, event: CheckIn) -> None:
+        day, _ = self.day(event.date)
+        desk = day.desk(event.desk_index)
+        if desk.booker != event.user:
+            raise DeskNotBookedByError(user=event.user, desk=event.desk_index, day=event.date)
+        desk.checked_in = True
+
+    @beartype
+    def _set_desk_attributes(self, event: SetDeskAttributes) -> None:
+        self.days[self._day_index(event.start_date)].desk(event.desk_index)
+        attributes = DeskAttributes(name=event.name, zone=event.zone, tags=frozenset(event.tags))
+        # Like ownership, the attributes apply from the start date onwards, replacing any later changes.
+        timeline = [entry for entry in self.desk_attributes.get(event.desk_index, []) if entry[0] < event.start_date]
+        timeline.append((event.start_date, attributes))
+        if self._shared_attributes:
+            self.desk_attributes = dict(self.desk_attributes)
+            self._desks_by_tag = dict(self._desks_by_tag)
+            self._desks_by_zone = dict(self._desks_by_zone)
+            self._shared_attributes = False
+        self.desk_attributes[event.desk_index] = timeline
+        self._index_desk(event.desk_index)
@@ -0,0 +1,5 @@
+from beartype import BeartypeConf, BeartypeStrategy, beartype
+
+# Opts a function out of the runtime type checks that `beartype_this_package` adds, for functions called so often that
+# the checks would dominate their run time, e.g. once per replayed event or per changed day. mypy still checks them.
+unchecked = beartype(conf=BeartypeConf(strategy=BeartypeStrategy.O0))
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime as DateTime  # noqa: N812
+from datetime import timezone
+from typing import TypeVar
+
+import discord
+from beartype import beartype
+
+from eadk_discord.bot import Response
+from eadk_discord.profiling import CommandProfiler
+from eadk_discord.watchdog import INTERACTION_DEADLINE
+
+# Weight of the latest run time in the moving average of a command's run time.
+RUN_TIME_WEIGHT = 0.2
+
+T = TypeVar("T")
+
+
+class InteractionDeadline:
+    """
+    Responds to interactions before Discord's deadline, deferring them if the response might come too late.
+
+    The time an interaction has already waited, e.g. behind other commands or a blocked loop, is known from its creation
+    time, and the time a command will take is estimated from a moving average of its previous run times. If the two
+    add up to more than the deadline minus `margin`, the interaction is deferred before the command runs. Otherwise the
+    command runs off the event loop and the interaction is deferred if it is still running at the deadline minus
+    `margin`. Deferred interactions get their response as a followup. Responses sent without deferring later than
+    `near_miss` seconds after the interaction was created are counted as near misses.
+
+    If a `profiler` is given, commands armed in it are profiled while they run.
+    """
+
+    margin: float
+    near_miss: float
+    deferrals: int
+    near_misses: int
+    # Responses sent after the deadline without deferring, which Discord has most likely rejected.
+    misses: int
+    responses: int
+    profiler: CommandProfiler | None
+    _run_times: dict[str, float]
+
+    @beartype
+    def __init__(self, margin: float = 1.0, near_miss: float = 2.0, profiler: CommandProfiler | None = None) -> None:
+        self.margin = margin
+        self.near_miss = near_miss
+        self.deferrals = 0
+        self.near_misses = 0
+        self.misses = 0
+        self.responses = 0
+        self.profiler = profiler
+        self._run_times = {}
+
+    @beartype
+    def expected_run_time(self, command: str) -> float:
+        return self._run_times.get(command, 0.0)
+
+    @beartype
+    def should_defer(self, command: str, elapsed: float) -> bool:
+        """
+        Returns whether a command whose interaction was created `elapsed` seconds ago should be deferred.
+        """
+        return elapsed + self.expected_run_time(command) >= INTERACTION_DEADLINE - self.margin
+
+    @beartype
+    def record(self, command: str, run_time: float, elapsed: float, deferred: bool) -> None:
+        """
+        Records that the command ran for `run_time` seconds and was responded to `elapsed` seconds after its
+        interaction was created.
+        """
+        previous = self._run_times.get(command)
+        self._run_times[command] = run_time if previous is None else previous + RUN_TIME_WEIGHT * (run_time - previous)
+        self.responses += 1
+        if deferred:
+            self.deferrals += 1
+        elif elapsed >= INTERACTION_DEADLINE:
+            self.misses += 1
+            logging.warning(f"Responded to /{command} {elapsed:.2f} seconds after the interaction, past the deadline")
+        elif elapsed >= self.near_miss:
+            self.near_misses += 1
+            logging.warning(f"Responded to /{command} {elapsed:.2f} seconds after the interaction")
+
+    async def run(
+        self,
+        command: str,
+        work: Callable[[], T],
+        runner: Callable[[Callable[[], T]], Awaitable[T]],
+        waited: float,
+        defer: Callable[[], Awaitable[object]],
+    ) -> tuple[T, float, bool]:
+        """
+        Runs the command's work with `runner`, which must run it off the event loop, e.g. in a worker thread, and may
+        do more afterwards, such as saving the changes. The interaction was created `waited` seconds ago, and `defer`
+        is called if the response might be late, before the work if it is expected to take long and otherwise when the
+        deadline minus the margin passes while the work runs. Returns the result, the run time and whether the
+        interaction was deferred.
+        """
+        deferred = self.should_defer(command, waited)
+        if deferred:
+            await defer()
+        start = time.monotonic()
+        task = asyncio.ensure_future(runner(lambda: self._profiled(command, work)))
+        if not deferred:
+            done, _ = await asyncio.wait({task}, timeout=max(INTERACTION_DEADLINE - self.margin - waited, 0.0))
+            if not done:
+                deferred = True
+                await defer()
+        result = await task
+        return result, time.monotonic() - start, deferred
+
+    async def respond(
+        self,
+        interaction: discord.Interaction,
+        work: Callable[[], Response],
+        runner: Callable[[Callable[[], Response]], Awaitable[Response]] = asyncio.to_thread,
+    ) -> None:  # pragma: no cover
+        """
+        Runs the command with `runner` like `run` and sends its response, deferring the interaction if needed.
+        """
+        command = interaction.command.qualified_name if interaction.command is not None else "unknown"
+        response, run_time, deferred = await self.run(
+            command, work, runner, self._elapsed(interaction), lambda: interaction.response.defer(thinking=True)
+        )
+        elapsed = self._elapsed(interaction)
+        await response.send(interaction)
+        self.record(command, run_time, elapsed, deferred)
+
+    def _profiled(self, command: str, work: Callable[[], T]) -> T:
+        return work() if self.profiler is None else self.profiler.run(command, work)
+
+    def metrics(self) -> str:
+        """
+        Renders the metrics in the Prometheus text format.
+        """
+        lines = [
+            "# HELP eadk_interaction_responses_total Interactions responded to.",
+            "# TYPE eadk_interaction_responses_total counter",
+            f"eadk_interaction_responses_total {self.responses}",
+            "# HELP eadk_interaction_deferrals_total Interactions deferred because the response might be late.",
+            "# TYPE eadk_interaction_deferrals_total counter",
+            f"eadk_interaction_deferrals_total {self.deferrals}",
+            "# HELP eadk_interaction_near_misses_total Responses sent close to the deadline without deferring.",
+            "# TYPE eadk_interaction_near_misses_total counter",
+            f"eadk_interaction_near_misses_total {self.near_misses}",
+            "# HELP eadk_interaction_misses_total Responses sent after the deadline without deferring.",
+            "# TYPE eadk_interaction_misses_total counter",
+            f"eadk_interaction_misses_total {self.misses}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _elapsed(interaction: discord.Interaction) -> float:  # pragma: no cover
+        return (DateTime.now(timezone.utc) - interaction.created_at).total_seconds()
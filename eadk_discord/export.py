@@ -0,0 +1,166 @@
+import csv
+import io
+import itertools
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Sequence
+from datetime import date as Date  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+from pathlib import Path
+
+from beartype import beartype
+from pydantic import BaseModel, Field
+
+from eadk_discord.database import Database
+from eadk_discord.database.archive import write_atomic
+from eadk_discord.database.state import DeskStatus
+
+PROGRESS_FILE_NAME = "progress.json"
+
+# A row of the calendar grid: the date followed by one cell per desk.
+Row = tuple[Date, list[str]]
+
+
+class ExportProgress(BaseModel):
+    # Number of ledger events reflected in the export.
+    offset: int = Field()
+    # Last date in the export.
+    until: Date = Field()
+
+
+class Sink(ABC):
+    """
+    Destination of a calendar grid with a row per date and a column per desk.
+
+    Subclasses can write to e.g. a remote spreadsheet. Rows must be replaced by date, so that only changed rows need
+    to be written.
+    """
+
+    @abstractmethod
+    def load_progress(self) -> ExportProgress | None:
+        """
+        Returns the progress saved by the last export, or None if nothing has been exported.
+        """
+
+    @abstractmethod
+    def write_rows(self, rows: Sequence[Row]) -> None:
+        """
+        Adds the rows to the grid, replacing any existing rows for the same dates. Rows are sorted by date.
+        """
+
+    @abstractmethod
+    def save_progress(self, progress: ExportProgress) -> None:
+        """
+        Saves the progress of an export once its rows have been written.
+        """
+
+
+class CsvSink(Sink):
+    """
+    Writes the grid to a directory with one CSV file per month, so that a change only rewrites the files of the
+    months it touches.
+    """
+
+    directory: Path
+
+    @beartype
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    @beartype
+    def load_progress(self) -> ExportProgress | None:
+        path = self.directory / PROGRESS_FILE_NAME
+        if not path.exists():
+            return None
+        return ExportProgress.model_validate_json(path.read_bytes())
+
+    @beartype
+    def write_rows(self, rows: Sequence[Row]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for (year, month), month_rows in itertools.groupby(rows, key=lambda row: (row[0].year, row[0].month)):
+            path = self.month_path(year, month)
+            cells = self._read_month(path)
+            for date, row in month_rows:
+                cells[date] = row
+            self._write_month(path, cells)
+
+    @beartype
+    def save_progress(self, progress: ExportProgress) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.directory / PROGRESS_FILE_NAME, progress.model_dump_json().encode())
+
+    @beartype
+    def month_path(self, year: int, month: int) -> Path:
+        return self.directory / f"{year:04d}-{month:02d}.csv"
+
+    @staticmethod
+    def _read_month(path: Path) -> dict[Date, list[str]]:
+        if not path.exists():
+            return {}
+        with path.open(newline="") as file:
+            reader = csv.reader(file)
+            next(reader)
+            return {Date.fromisoformat(row[0]): row[1:] for row in reader}
+
+    @staticmethod
+    def _write_month(path: Path, cells: dict[Date, list[str]]) -> None:
+        num_desks = max((len(row) for row in cells.values()), default=0)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["date", *(f"desk {desk_num}" for desk_num in range(1, num_desks + 1))])
+        for date in sorted(cells):
+            writer.writerow([date.isoformat(), *cells[date]])
+        write_atomic(path, buffer.getvalue().encode())
+
+
+@beartype
+def format_cell(desk: DeskStatus, format_user: Callable[[int], str]) -> str:
+    if desk.owner is None or desk.owner == desk.booker:
+        return format_user(desk.booker) if desk.booker is not None else ""
+    booker = format_user(desk.booker) if desk.booker is not None else "free"
+    return f"{booker} (owned by {format_user(desk.owner)})"
+
+
+class Exporter:
+    """
+    Keeps a calendar grid in a sink up to date with the database, rewriting only the rows of dates that have been
+    touched by events since the last export.
+    """
+
+    database: Database
+    sink: Sink
+    format_user: Callable[[int], str]
+
+    @beartype
+    def __init__(self, database: Database, sink: Sink, format_user: Callable[[int], str] = str) -> None:
+        self.database = database
+        self.sink = sink
+        self.format_user = format_user
+
+    @beartype
+    def export(self, until: Date) -> int:
+        """
+        Brings the grid up to date for every date up to and including `until`. Returns the number of rewritten rows.
+        """
+        start_date = self.database.state.start_date
+        progress = self.sink.load_progress()
+        if progress is None:
+            dates = set(_date_range(start_date, until))
+            offset = self.database.num_events
+        else:
+            dates = set(_date_range(progress.until + TimeDelta(days=1), until))
+            offset = progress.offset
+        for index in range(offset, self.database.num_events):
+            event_start, event_end = self.database.event(index).event.date_range()
+            dates.update(_date_range(max(event_start, start_date), min(event_end or until, until)))
+
+        rows = [self._row(date) for date in sorted(dates)]
+        self.sink.write_rows(rows)
+        self.sink.save_progress(ExportProgress(offset=self.database.num_events, until=until))
+        return len(rows)
+
+    def _row(self, date: Date) -> Row:
+        return date, [format_cell(desk, self.format_user) for desk in self.database.day(date).desks]
+
+
+def _date_range(start: Date, end: Date) -> list[Date]:
+    return [start + TimeDelta(days=offset) for offset in range((end - start).days + 1)]
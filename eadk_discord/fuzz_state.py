@@ -0,0 +1,441 @@
+"""
+Differential fuzzing of alternate state engines against `State`.
+
+Random sequences of SetNumDesks, BookDesk, UnbookDesk, MakeOwned and MakeFlex events are applied to `State`, the
+reference, and to each alternate engine. After every event, the engines must have raised the same error, if any, and
+have the same grid of bookers and owners. Engines that publish diffs must have published one for each event that
+succeeded, with the changes between the reference's grids before and after the event. Failing sequences are shrunk to a
+minimal sequence that still fails. The time each engine spends handling events is recorded as a ratio to the reference,
+to catch performance regressions.
+
+Example: python -m eadk_discord.fuzz_state --runs 500 --engine fast=my_module:FastState --max-ratio 1.0
+"""
+
+import argparse
+import importlib
+import json
+import random
+import sys
+import time
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import date as Date  # noqa: N812
+from datetime import datetime as DateTime  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+from pathlib import Path
+from typing import Protocol, runtime_checkable
+
+from beartype import beartype
+
+from eadk_discord.database import Database
+from eadk_discord.database.diff import DeskChange, Diff, NumDesksChange
+from eadk_discord.database.event import BookDesk, Event, MakeFlex, MakeOwned, SetNumDesks, UnbookDesk
+from eadk_discord.database.event_errors import EventError
+from eadk_discord.database.pvector import PVector
+from eadk_discord.database.state import Day, State
+
+REFERENCE = "reference"
+START_DATE = Date(2024, 1, 1)
+START_TIME = DateTime(2024, 1, 1, 8)
+# Events reach this many days past the start date, and a day before it to hit DateTooEarlyError.
+HORIZON_DAYS = 14
+# Desk indices go one past the number of desks in either direction to hit NonExistentDeskError.
+MAX_DESKS = 5
+NUM_USERS = 4
+
+# Booker and owner of each desk of each day.
+Grid = list[tuple[tuple[int | None, int | None], ...]]
+
+
+@runtime_checkable
+class Engine(Protocol):
+    def handle_event(self, event: Event) -> object: ...
+
+    def days_between(self, start_date: Date, end_date: Date) -> Sequence[Day]: ...
+
+
+@runtime_checkable
+class DiffingEngine(Engine, Protocol):
+    # The diffs published for the events that succeeded, in order.
+    diffs: list[Diff]
+
+
+# Creates an engine with no events whose first day is the given date.
+EngineFactory = Callable[[Date], Engine]
+
+
+@beartype
+def reference_engine(start_date: Date) -> State:
+    return State(start_date=start_date, days=PVector([Day.create_unbooked(start_date, 0)]))
+
+
+class SnapshottingEngine:
+    """
+    A State that is snapshotted before every event, with the snapshots kept alive, so every change copies on write.
+    """
+
+    state: State
+    snapshots: list[State]
+
+    @beartype
+    def __init__(self, start_date: Date) -> None:
+        self.state = reference_engine(start_date)
+        self.snapshots = []
+
+    @beartype
+    def handle_event(self, event: Event) -> None:
+        self.snapshots.append(self.state.snapshot())
+        self.state.handle_event(event)
+
+    @beartype
+    def days_between(self, start_date: Date, end_date: Date) -> Sequence[Day]:
+        return self.state.days_between(start_date, end_date)
+
+
+class DatabaseEngine:
+    """
+    A Database with a listener, so events go through the ledger, the deduplicator and the computation of diffs, which
+    are checked against the reference.
+    """
+
+    database: Database
+    diffs: list[Diff]
+
+    @beartype
+    def __init__(self, start_date: Date) -> None:
+        self.database = Database.initialize(start_date)
+        self.diffs = []
+        self.database.subscribe(self.diffs.append)
+
+    @beartype
+    def handle_event(self, event: Event) -> None:
+        self.database.handle_event(event)
+
+    @beartype
+    def days_between(self, start_date: Date, end_date: Date) -> Sequence[Day]:
+        return self.database.state.days_between(start_date, end_date)
+
+
+DEFAULT_ENGINES: dict[str, EngineFactory] = {"snapshots": SnapshottingEngine, "database": DatabaseEngine}
+
+
+@dataclass
+class Mismatch:
+    """
+    The first event after which an engine differed from the reference, along with the events leading up to it.
+    """
+
+    engine: str
+    events: list[Event]
+    expected: str
+    actual: str
+
+    def describe(self) -> str:
+        lines = [f"Engine {self.engine} differs from the reference after {len(self.events)} events:"]
+        lines += [f"  {event.event!r}" for event in self.events]
+        lines += [f"  expected: {self.expected}", f"  actual:   {self.actual}"]
+        return "\n".join(lines)
+
+
+@dataclass
+class FuzzReport:
+    runs: int = 0
+    events: int = 0
+    mismatches: list[Mismatch] = field(default_factory=list)
+    # Seconds each engine spent handling events.
+    times: dict[str, float] = field(default_factory=dict)
+
+    def ratios(self) -> dict[str, float]:
+        """
+        Returns the time each alternate engine spent handling events relative to the reference.
+        """
+        reference = self.times.get(REFERENCE, 0.0)
+        return {name: t / reference for name, t in self.times.items() if name != REFERENCE and reference > 0}
+
+
+@beartype
+def random_events(rng: random.Random, length: int, start_date: Date = START_DATE) -> list[Event]:
+    def random_date() -> Date:
+        return start_date + TimeDelta(rng.randrange(-1, HORIZON_DAYS))
+
+    def random_desk() -> int:
+        return rng.randrange(-1, MAX_DESKS + 1)
+
+    def random_user() -> int:
+        return rng.randrange(1, NUM_USERS + 1)
+
+    events = []
+    for i in range(length):
+        # Start with desks most of the time, so that most events can succeed.
+        if i == 0 and rng.random() < 0.9:
+            kind = "set"
+        else:
+            kind = rng.choices(["set", "book", "unbook", "own", "flex"], weights=[1, 5, 3, 1, 1])[0]
+        start = random_date()
+        # End dates are mostly on or after the start date, and sometimes before it to hit InvalidDateRangeError.
+        end = start + TimeDelta(rng.randrange(-1, 4))
+        match kind:
+            case "set":
+                payload: SetNumDesks | BookDesk | UnbookDesk | MakeOwned | MakeFlex = SetNumDesks(
+                    date=start, num_desks=rng.randrange(MAX_DESKS + 1)
+                )
+            case "book":
+                payload = BookDesk(start_date=start, end_date=end, desk_index=random_desk(), user=random_user())
+            case "unbook":
+                payload = UnbookDesk(start_date=start, end_date=end, desk_index=random_desk())
+            case "own":
+                payload = MakeOwned(start_date=start, desk_index=random_desk(), user=random_user())
+            case _:
+                payload = MakeFlex(start_date=start, desk_index=random_desk())
+        events.append(Event(author=None, time=START_TIME + TimeDelta(seconds=i), event=payload))
+    return events
+
+
+@beartype
+def grid(engine: Engine, start_date: Date, end_date: Date) -> Grid:
+    return [tuple((desk.booker, desk.owner) for desk in day.desks) for day in engine.days_between(start_date, end_date)]
+
+
+def _diff_span(state: State, event: Event) -> tuple[Date, Date] | None:
+    """
+    Returns the dates the diff of the event covers, like `Database` does, materializing them. Returns None if the event
+    fails on its dates.
+    """
+    start_date, end_date = event.event.date_range()
+    if end_date is None:
+        end_date = max(start_date, state.days[-1].date)
+    try:
+        state.days_between(start_date, end_date)
+    except EventError:
+        return None
+    return start_date, end_date
+
+
+def _grid_changes(start_date: Date, before: Grid, after: Grid) -> tuple[list[NumDesksChange], list[DeskChange]]:
+    """
+    Returns the changes between the grids of the same days as a diff lists them.
+    """
+    num_desks = []
+    desks = []
+    for day, (desks_before, desks_after) in enumerate(zip(before, after, strict=True)):
+        date = start_date + TimeDelta(day)
+        if len(desks_before) != len(desks_after):
+            num_desks.append(NumDesksChange(date=date, before=len(desks_before), after=len(desks_after)))
+        for desk_index in range(max(len(desks_before), len(desks_after))):
+            booker_before, owner_before = desks_before[desk_index] if desk_index < len(desks_before) else (None, None)
+            booker_after, owner_after = desks_after[desk_index] if desk_index < len(desks_after) else (None, None)
+            if (booker_before, owner_before) != (booker_after, owner_after):
+                desks.append(
+                    DeskChange(
+                        date=date,
+                        desk_index=desk_index,
+                        booker_before=booker_before,
+                        booker_after=booker_after,
+                        owner_before=owner_before,
+                        owner_after=owner_after,
+                    )
+                )
+    return num_desks, desks
+
+
+def _describe_diffs(diffs: Sequence[Diff]) -> str:
+    if len(diffs) != 1:
+        return f"{len(diffs)} diffs"
+    [diff] = diffs
+    return f"diff {(diff.num_desks, diff.desks)}"
+
+
+def _handle(engine: Engine, event: Event) -> tuple[str, float]:
+    """
+    Applies the event, returning the error it raised, if any, and the time it took.
+    """
+    start = time.perf_counter()
+    try:
+        engine.handle_event(event)
+        outcome = "no error"
+    except Exception as error:
+        outcome = repr(error)
+    return outcome, time.perf_counter() - start
+
+
+@beartype
+def run_case(
+    events: Sequence[Event],
+    engines: Mapping[str, EngineFactory],
+    times: dict[str, float] | None = None,
+    start_date: Date = START_DATE,
+) -> list[Mismatch]:
+    """
+    Applies the events to the reference and to each engine, comparing them after every event. Returns the first
+    mismatch of each engine that differs from the reference. Adds the time spent handling events to `times`.
+    """
+    if times is None:
+        times = {}
+    reference = reference_engine(start_date)
+    alternates = {name: factory(start_date) for name, factory in engines.items()}
+    end_date = start_date + TimeDelta(HORIZON_DAYS)
+    mismatches = []
+    for i, event in enumerate(events):
+        span = _diff_span(reference, event)
+        span_before = grid(reference, *span) if span is not None else []
+        expected, elapsed = _handle(reference, event)
+        times[REFERENCE] = times.get(REFERENCE, 0.0) + elapsed
+        expected_grid = grid(reference, start_date, end_date)
+        expected_diff = "0 diffs"
+        if expected == "no error":
+            assert span is not None
+            expected_diff = f"diff {_grid_changes(span[0], span_before, grid(reference, *span))}"
+        for name, engine in list(alternates.items()):
+            num_diffs = len(engine.diffs) if isinstance(engine, DiffingEngine) else 0
+            actual, elapsed = _handle(engine, event)
+            times[name] = times.get(name, 0.0) + elapsed
+            if actual != expected:
+                mismatches.append(Mismatch(name, list(events[: i + 1]), expected, actual))
+                del alternates[name]
+                continue
+            actual_grid = grid(engine, start_date, end_date)
+            if actual_grid != expected_grid:
+                day = next(j for j, (a, b) in enumerate(zip(expected_grid, actual_grid, strict=True)) if a != b)
+                date = start_date + TimeDelta(day)
+                mismatches.append(
+                    Mismatch(
+                        name,
+                        list(events[: i + 1]),
+                        f"desks on {date}: {expected_grid[day]}",
+                        f"desks on {date}: {actual_grid[day]}",
+                    )
+                )
+                del alternates[name]
+                continue
+            if isinstance(engine, DiffingEngine):
+                actual_diff = _describe_diffs(engine.diffs[num_diffs:])
+                if actual_diff != expected_diff:
+                    mismatches.append(Mismatch(name, list(events[: i + 1]), expected_diff, actual_diff))
+                    del alternates[name]
+    return mismatches
+
+
+def _simplifications(event: Event, start_date: Date) -> list[Event]:
+    """
+    Returns variants of the event that are a step simpler: shorter ranges, earlier dates and fewer or lower desks and
+    users. Taking such steps until none fails anymore gives a minimal event.
+    """
+    payload = event.event
+    day = TimeDelta(1)
+    updates: list[dict[str, object]] = []
+    if isinstance(payload, BookDesk | UnbookDesk):
+        if payload.end_date > payload.start_date:
+            updates.append({"end_date": payload.end_date - day})
+            updates.append({"start_date": payload.start_date + day})
+        if payload.start_date > start_date:
+            updates.append({"start_date": payload.start_date - day, "end_date": payload.end_date - day})
+    if isinstance(payload, MakeOwned | MakeFlex) and payload.start_date > start_date:
+        updates.append({"start_date": payload.start_date - day})
+    if isinstance(payload, SetNumDesks):
+        if payload.date > start_date:
+            updates.append({"date": payload.date - day})
+        if payload.num_desks > 0:
+            updates.append({"num_desks": payload.num_desks - 1})
+    if isinstance(payload, BookDesk | UnbookDesk | MakeOwned | MakeFlex) and payload.desk_index > 0:
+        updates.append({"desk_index": payload.desk_index - 1})
+    if isinstance(payload, BookDesk | MakeOwned) and payload.user > 1:
+        updates.append({"user": payload.user - 1})
+    return [event.model_copy(update={"event": payload.model_copy(update=update)}) for update in updates]
+
+
+@beartype
+def shrink(events: Sequence[Event], fails: Callable[[list[Event]], bool], start_date: Date = START_DATE) -> list[Event]:
+    """
+    Returns a shorter and simpler sequence of the events that still fails, by removing chunks of events and then
+    simplifying the remaining events one at a time.
+    """
+    current = list(events)
+    chunk = len(current) // 2
+    while chunk >= 1:
+        i = 0
+        while i < len(current):
+            candidate = current[:i] + current[i + chunk :]
+            if candidate and fails(candidate):
+                current = candidate
+            else:
+                i += chunk
+        chunk //= 2
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(current)):
+            for simpler in _simplifications(current[i], start_date):
+                candidate = [*current[:i], simpler, *current[i + 1 :]]
+                if fails(candidate):
+                    current = candidate
+                    changed = True
+                    break
+    return current
+
+
+def _shrink_mismatch(mismatch: Mismatch, engine: Mapping[str, EngineFactory]) -> Mismatch:
+    events = shrink(mismatch.events, lambda candidate: bool(run_case(candidate, engine)))
+    [shrunk] = run_case(events, engine)
+    return shrunk
+
+
+@beartype
+def fuzz(
+    engines: Mapping[str, EngineFactory] = DEFAULT_ENGINES, runs: int = 100, length: int = 30, seed: int = 0
+) -> FuzzReport:
+    """
+    Compares the engines to the reference on `runs` random sequences of `length` events. Each engine is compared until
+    its first mismatch, which is shrunk.
+    """
+    rng = random.Random(seed)
+    report = FuzzReport()
+    remaining = dict(engines)
+    for _ in range(runs):
+        if not remaining:
+            break
+        events = random_events(rng, length)
+        report.runs += 1
+        report.events += len(events)
+        for mismatch in run_case(events, remaining, report.times):
+            engine = {mismatch.engine: remaining.pop(mismatch.engine)}
+            report.mismatches.append(_shrink_mismatch(mismatch, engine))
+    return report
+
+
+def load_engine(spec: str) -> tuple[str, EngineFactory]:  # pragma: no cover
+    """
+    Loads an engine given as `name=module:attribute`.
+    """
+    name, _, path = spec.partition("=")
+    module_name, _, attribute = path.partition(":")
+    factory: EngineFactory = getattr(importlib.import_module(module_name), attribute)
+    return name, factory
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(prog="EADK Discord state engine fuzzer")
+    parser.add_argument("--engine", action="append", default=[], help="alternate engine as name=module:attribute")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--length", type=int, default=30, help="events per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ratio", type=float, help="fail if an engine is slower than this relative to State")
+    parser.add_argument("--record", type=Path, help="file to append the timing ratios of the run to as a JSON line")
+    args = parser.parse_args()
+
+    engines = dict(load_engine(spec) for spec in args.engine) if args.engine else DEFAULT_ENGINES
+    report = fuzz(engines, args.runs, args.length, args.seed)
+    for mismatch in report.mismatches:
+        print(mismatch.describe())
+    ratios = report.ratios()
+    print(f"{report.runs} runs of {args.length} events, {len(report.mismatches)} mismatching engines")
+    for name, ratio in ratios.items():
+        print(f"{name:<20}{ratio:>8.2f}x the time of State")
+    if args.record is not None:
+        record = {"time": DateTime.now().isoformat(), "seed": args.seed, "runs": report.runs, "ratios": ratios}
+        with args.record.open("a") as record_file:
+            record_file.write(json.dumps(record) + "\n")
+    too_slow = [name for name, ratio in ratios.items() if args.max_ratio is not None and ratio > args.max_ratio]
+    if report.mismatches or too_slow:
+        if too_slow:
+            print(f"Slower than {args.max_ratio}x State: {', '.join(too_slow)}")
+        sys.exit(1)
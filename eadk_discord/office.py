@@ -0,0 +1,146 @@
+import os
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date as Date  # noqa: N812
+from datetime import datetime as DateTime  # noqa: N812
+from pathlib import Path
+from typing import Generic, TypeVar
+
+from beartype import beartype
+from pydantic import BaseModel, Field
+
+from eadk_discord.database import Database
+from eadk_discord.database.event import Event, SetNumDesks
+
+# Number of desks in a newly created office.
+DEFAULT_NUM_DESKS = 6
+# Number of guilds whose databases are kept open at the same time when hosting many guilds.
+DEFAULT_MAX_OPEN_TENANTS = 16
+
+TenantT = TypeVar("TenantT")
+
+
+class OfficeConfig(BaseModel):
+    """
+    An office with its own desks and ledger. Commands are handled by the office whose channel they are sent in.
+    """
+
+    name: str = Field()
+    database_path: Path = Field()
+    channel_ids: Sequence[int] = Field()
+
+
+@beartype
+def create_database(path: Path, today: Date) -> None:
+    """
+    Creates a database with the default number of desks at `path` if there is none yet.
+    """
+    if path.exists():
+        return
+    database = Database.initialize(today)
+    database.handle_event(
+        Event(author=None, time=DateTime.now(), event=SetNumDesks(date=today, num_desks=DEFAULT_NUM_DESKS))
+    )
+    database.save(path)
+
+
+@beartype
+def open_databases(paths: Sequence[Path], max_workers: int | None = None) -> list[Database]:
+    """
+    Opens the databases at the given paths like `Database.open`.
+
+    Replaying the ledgers is CPU-bound, so with several databases they are loaded in parallel worker processes and
+    sent back. Each database is attached to its journal afterwards, since file locks cannot be moved between
+    processes.
+    """
+    if len(paths) <= 1:
+        return [Database.open(path) for path in paths]
+    max_workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        databases = list(pool.map(Database.load, paths))
+    for database, path in zip(databases, paths, strict=True):
+        database.attach_journal(path)
+    return databases
+
+
+@beartype
+def tenant_database_path(directory: Path, guild_id: int) -> Path:
+    return directory / f"{guild_id}.bin"
+
+
+class TenantPool(Generic[TenantT]):
+    """
+    Offices of guilds that each have their own database, for hosting many unrelated guilds in one process.
+
+    A guild's office is opened when it is first used, and at most `max_open` offices are kept open. When another
+    office must be opened, the least recently used one is closed, which is expected to flush it to disk. Memory use
+    thus depends on the number of active guilds rather than on the number of guilds.
+
+    Offices that are in use are never closed. If every open office is in use, more than `max_open` are kept open until
+    they are no longer used.
+    """
+
+    max_open: int
+    _open_tenant: Callable[[int], TenantT]
+    _close_tenant: Callable[[TenantT], None]
+    _tenants: OrderedDict[int, TenantT]
+    # Number of unfinished uses of each office that is in use.
+    _uses: dict[int, int]
+
+    @beartype
+    def __init__(
+        self,
+        open_tenant: Callable[[int], TenantT],
+        close_tenant: Callable[[TenantT], None],
+        max_open: int = DEFAULT_MAX_OPEN_TENANTS,
+    ) -> None:
+        if max_open < 1:
+            raise ValueError("At least one tenant must be kept open")
+        self.max_open = max_open
+        self._open_tenant = open_tenant
+        self._close_tenant = close_tenant
+        self._tenants = OrderedDict()
+        self._uses = {}
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._tenants
+
+    @beartype
+    def get(self, guild_id: int) -> TenantT:
+        tenant = self._tenants.get(guild_id)
+        if tenant is not None:
+            self._tenants.move_to_end(guild_id)
+            return tenant
+        self._close_unused(self.max_open - 1)
+        tenant = self._open_tenant(guild_id)
+        self._tenants[guild_id] = tenant
+        return tenant
+
+    @contextmanager
+    def use(self, guild_id: int) -> Iterator[TenantT]:
+        """
+        Gets the guild's office like `get` and keeps it open until the block ends, e.g. while a command that changes
+        the office awaits its response.
+        """
+        tenant = self.get(guild_id)
+        self._uses[guild_id] = self._uses.get(guild_id, 0) + 1
+        try:
+            yield tenant
+        finally:
+            self._uses[guild_id] -= 1
+            if self._uses[guild_id] == 0:
+                del self._uses[guild_id]
+            self._close_unused(self.max_open)
+
+    def _close_unused(self, max_open: int) -> None:
+        """
+        Closes the least recently used offices that are not in use until at most `max_open` are open, if possible.
+        """
+        unused = [guild_id for guild_id in self._tenants if guild_id not in self._uses]
+        for guild_id in unused[: max(len(self._tenants) - max_open, 0)]:
+            self._close_tenant(self._tenants.pop(guild_id))
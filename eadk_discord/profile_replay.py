@@ -0,0 +1,198 @@
+# pragma: coverage exclude file
+"""
+Profiles replaying the ledger of a database, which is what loading the database spends its time on.
+
+Run it on a copy of the production database, as synthetic ledgers do not have its skew. Like loading the database,
+each replay reads the archive's checkpoint, if there is an archive, and applies the events of the active ledger to it.
+The database is only read. Reports the time per event type, where the time goes
+according to cProfile, the events replayed per second and the peak memory, and writes the stacks sampled during a
+replay in the collapsed format, for flamegraph tools such as flamegraph.pl or speedscope.
+
+Example: python -m eadk_discord.profile_replay db.bin --output replay.collapsed
+"""
+
+import argparse
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+from eadk_discord.benchmark_ledger import best_time
+from eadk_discord.database import Database
+from eadk_discord.database.archive import Archive
+from eadk_discord.database.dedupe import Deduplicator
+from eadk_discord.database.history import History
+from eadk_discord.database.pvector import PVector
+from eadk_discord.database.state import Day, State
+from eadk_discord.profiling import StackSampler, write_collapsed
+
+# cProfile's key of a function: file name, line number and function name.
+FunctionKey = tuple[str, int, str]
+
+
+@dataclass
+class Ledger:
+    """
+    The active ledger of a database and the archive whose checkpoint it continues from, if any.
+    """
+
+    history: History
+    archive: Archive | None
+
+    @staticmethod
+    def read(path: Path) -> "Ledger":
+        return Ledger(*Database.read_ledger(path))
+
+    def initial_state(self) -> State:
+        """
+        Returns the state the active ledger is replayed onto, read from the archive's checkpoint like `Database.load`.
+        """
+        checkpoint = self.archive.checkpoint() if self.archive is not None else None
+        if checkpoint is None:
+            start_date = self.history.start_date
+            return State(start_date=start_date, days=PVector([Day.create_unbooked(start_date, 0)]))
+        return checkpoint
+
+    def replay(self) -> State:
+        return State.initialize(self.history, self.initial_state())
+
+
+def replay_by_event_type(ledger: Ledger) -> dict[str, list[float]]:
+    """
+    Replays the ledger like `State.initialize`, returning the time each event took by event type.
+    Events skipped as duplicates are counted as "duplicate".
+    """
+    state = ledger.initial_state()
+    deduplicator = Deduplicator()
+    times: dict[str, list[float]] = defaultdict(list)
+    for event in ledger.history.history:
+        start = time.perf_counter()
+        if deduplicator.get(event.idempotency_key) is not None:
+            times["duplicate"].append(time.perf_counter() - start)
+            continue
+        state.handle_event(event)
+        deduplicator.add(event)
+        times[type(event.event).__name__].append(time.perf_counter() - start)
+    return times
+
+
+def hot_spot(key: FunctionKey) -> str | None:
+    file_name, _, function_name = key
+    # Functions implemented in C have no file, and their name includes their module or class.
+    if "/pydantic/" in file_name or "/pydantic_core/" in file_name or "pydantic_core" in function_name:
+        return "pydantic"
+    if "/beartype/" in file_name or file_name.startswith("<@beartype("):
+        return "beartype"
+    return None
+
+
+def function_name(key: FunctionKey) -> str:
+    file_name, line, name = key
+    return name if file_name == "~" else f"{name} ({Path(file_name).name}:{line})"
+
+
+def profile_replay(ledger: Ledger) -> dict[FunctionKey, tuple[int, int, float, float]]:
+    """
+    Returns cProfile's statistics of replaying the ledger: the number of primitive calls, the number of calls, the
+    time spent in the function itself and the cumulative time of each function.
+    """
+    profile = cProfile.Profile()
+    profile.runcall(ledger.replay)
+    stats = pstats.Stats(profile)
+    return {key: value[:4] for key, value in stats.stats.items()}  # type: ignore[attr-defined]
+
+
+def sample_replay(ledger: Ledger, path: Path) -> int:
+    """
+    Writes the stacks sampled while replaying the ledger to `path`. Returns the number of samples.
+    """
+    sampler = StackSampler(threading.get_ident())
+    # The sampler can only take a sample when the replaying thread yields the GIL, so make it yield as often.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(sampler.interval)
+    sampler.start()
+    try:
+        sampler.sampled(ledger.replay)
+    finally:
+        sampler.stop()
+        sys.setswitchinterval(switch_interval)
+    write_collapsed(sampler.stacks, path)
+    return sampler.stacks.total()
+
+
+def peak_memory(ledger: Ledger) -> tuple[int, int]:
+    """
+    Returns the memory allocated by the replayed state and the peak memory allocated while replaying, in bytes.
+    """
+    tracemalloc.start()
+    try:
+        state = ledger.replay()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del state
+    return current, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="EADK Discord ledger replay profiler")
+    parser.add_argument("database_path", type=Path)
+    parser.add_argument("--output", type=Path, help="file to write the collapsed stacks to")
+    parser.add_argument("--repeat", type=int, default=3, help="replays to take the fastest of")
+    parser.add_argument("--top", type=int, default=15, help="number of functions to list")
+    args = parser.parse_args()
+    output: Path = args.output or args.database_path.with_suffix(".collapsed")
+
+    decode_start = time.perf_counter()
+    ledger = Ledger.read(args.database_path)
+    decode_time = time.perf_counter() - decode_start
+    history = ledger.history
+    num_events = len(history.history)
+    print(
+        f"{num_events} events from {history.start_date} after {history.offset} archived events, decoded in"
+        f" {decode_time * 1000:.1f} ms"
+    )
+
+    replay_time = best_time(ledger.replay, args.repeat)
+    print(f"Replayed in {replay_time * 1000:.1f} ms, {num_events / replay_time:,.0f} events per second")
+
+    times = replay_by_event_type(ledger)
+    timed_total = sum(sum(event_times) for event_times in times.values())
+    print()
+    print(f"{'event type':<20}{'count':>10}{'total (ms)':>12}{'share':>8}{'mean (us)':>12}{'max (us)':>12}")
+    for event_type, event_times in sorted(times.items(), key=lambda item: -sum(item[1])):
+        total = sum(event_times)
+        print(
+            f"{event_type:<20}{len(event_times):>10}{total * 1000:>12.1f}{total / timed_total:>8.1%}"
+            f"{total / len(event_times) * 10**6:>12.1f}{max(event_times) * 10**6:>12.1f}"
+        )
+
+    stats = profile_replay(ledger)
+    own_total = sum(function_stats[2] for function_stats in stats.values())
+    by_hot_spot: dict[str, float] = defaultdict(float)
+    for key, function_stats in stats.items():
+        by_hot_spot[hot_spot(key) or "other"] += function_stats[2]
+    # Materializing days happens in `_day_index`, which `day()` and the other day accessors go through.
+    day_extension = sum(function_stats[3] for key, function_stats in stats.items() if key[2] == "_day_index")
+    print()
+    print("Hot spots under cProfile, as shares of the replay:")
+    print(f"  {'pydantic validation and copying':<40}{by_hot_spot['pydantic'] / own_total:>8.1%}")
+    print(f"  {'beartype checks':<40}{by_hot_spot['beartype'] / own_total:>8.1%}")
+    print(f"  {'day() extension, including the above':<40}{day_extension / own_total:>8.1%}")
+    print()
+    print(f"{'function':<60}{'calls':>10}{'own (ms)':>12}{'cumulative (ms)':>18}")
+    top = sorted(stats.items(), key=lambda item: -item[1][2])[: args.top]
+    for key, (_, calls, own_time, cumulative) in top:
+        print(f"{function_name(key)[:59]:<60}{calls:>10}{own_time * 1000:>12.1f}{cumulative * 1000:>18.1f}")
+
+    num_samples = sample_replay(ledger, output)
+    print()
+    print(f"Wrote {num_samples} sampled stacks to {output}")
+
+    current, peak = peak_memory(ledger)
+    print(f"Replayed state takes {current / 2**20:.1f} MiB, peaking at {peak / 2**20:.1f} MiB while replaying")
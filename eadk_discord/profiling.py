@@ -0,0 +1,202 @@
+import cProfile
+import logging
+import sys
+import threading
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime as DateTime  # noqa: N812
+from pathlib import Path
+from types import FrameType
+from typing import Literal, TypeVar
+
+from beartype import beartype
+
+ProfilerMode = Literal["cprofile", "sampling"]
+PROFILER_MODES: tuple[ProfilerMode, ...] = ("cprofile", "sampling")
+# Seconds between the stack samples taken by the sampling profiler.
+SAMPLE_INTERVAL = 0.001
+
+T = TypeVar("T")
+
+
+@beartype
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    # Wrappers generated by beartype have a file name unique to the process.
+    if code.co_filename.startswith("<@beartype("):
+        return f"{code.co_name} (beartype)"
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stack of a thread from another thread, counting each stack in the collapsed format used by flamegraph
+    tools: frame labels from the outermost frame inwards, separated by semicolons.
+
+    Only stacks running `sampled` are kept, and only their frames called by it, so the stacks start at the profiled code
+    rather than at the event loop. The profiled thread is never paused or traced, which keeps the overhead low.
+    """
+
+    stacks: Counter[str]
+    interval: float
+    _thread_id: int
+    # Frame of the call to `sampled`, while it runs.
+    _root: FrameType | None
+    _stopped: threading.Event
+    _thread: threading.Thread | None
+
+    @beartype
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        self.stacks = Counter()
+        self.interval = interval
+        self._thread_id = thread_id
+        self._root = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sampled(self, work: Callable[[], T]) -> T:
+        """
+        Runs `work`, whose stacks are the ones sampled.
+        """
+        self._root = sys._getframe()
+        try:
+            return work()
+        finally:
+            self._root = None
+
+    def sample(self) -> None:
+        root = self._root
+        frame = sys._current_frames().get(self._thread_id)
+        labels = []
+        while frame is not None and frame is not root:
+            labels.append(frame_label(frame))
+            frame = frame.f_back
+        if root is not None and frame is root and labels:
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+
+@beartype
+def write_collapsed(stacks: Counter[str], path: Path) -> None:
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+
+
+class _Session:
+    mode: ProfilerMode
+    remaining: int
+    profile: cProfile.Profile | None
+    stacks: Counter[str]
+
+    def __init__(self, mode: ProfilerMode, invocations: int) -> None:
+        self.mode = mode
+        self.remaining = invocations
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self.stacks = Counter()
+
+
+class CommandProfiler:
+    """
+    Profiles the next invocations of chosen commands and writes the results to files in `directory`.
+
+    A command is armed for a number of invocations with either cProfile, whose statistics are aggregated over the
+    invocations and written as a .prof file for pstats or snakeviz, or a sampling profiler, whose stacks are written in
+    the collapsed format as a .collapsed file for flamegraph tools. Commands that are not armed only cost a dictionary
+    lookup.
+    """
+
+    directory: Path
+    # Files written so far, most recent last.
+    reports: list[Path]
+    _sessions: dict[str, _Session]
+
+    @beartype
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.reports = []
+        self._sessions = {}
+
+    @beartype
+    def arm(self, command: str, invocations: int, mode: ProfilerMode = "sampling") -> None:
+        if invocations < 1:
+            raise ValueError("At least one invocation must be profiled")
+        self._sessions[command] = _Session(mode, invocations)
+
+    @beartype
+    def disarm(self, command: str) -> None:
+        self._sessions.pop(command, None)
+
+    def armed(self) -> dict[str, int]:
+        """
+        Returns the number of invocations left to profile of each armed command.
+        """
+        return {command: session.remaining for command, session in self._sessions.items()}
+
+    def run(self, command: str, work: Callable[[], T]) -> T:
+        """
+        Runs `work` as an invocation of the command, profiling it if the command is armed.
+        """
+        session = self._sessions.get(command)
+        if session is None:
+            return work()
+        try:
+            if session.profile is not None:
+                return session.profile.runcall(work)
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            try:
+                return sampler.sampled(work)
+            finally:
+                sampler.stop()
+                session.stacks.update(sampler.stacks)
+        finally:
+            session.remaining -= 1
+            if session.remaining == 0:
+                del self._sessions[command]
+                self._write(command, session)
+
+    def _write(self, command: str, session: _Session) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{command}-{DateTime.now().strftime('%Y%m%d-%H%M%S')}"
+        if session.profile is not None:
+            path = self.directory / f"{stem}.prof"
+            session.profile.dump_stats(path)
+        else:
+            path = self.directory / f"{stem}.collapsed"
+            write_collapsed(session.stacks, path)
+        self.reports.append(path)
+        logging.info(f"Wrote the profile of /{command} to {path}")
+
+
+@beartype
+def parse_profile_spec(spec: str) -> dict[str, int]:
+    """
+    Parses commands to profile given as comma-separated `command=invocations` pairs, e.g. "book=10,info=5". A command
+    without a number of invocations is profiled once. Raises ValueError naming the first malformed entry.
+    """
+    commands = {}
+    for part in spec.split(","):
+        entry = part.strip()
+        if not entry:
+            continue
+        command, equals, invocations = (item.strip() for item in entry.partition("="))
+        if not command or (equals and not (invocations.isdigit() and int(invocations) >= 1)):
+            raise ValueError(
+                f"Invalid profile entry {entry!r}, expected a command and optionally '=' and a positive number of "
+                "invocations"
+            )
+        commands[command] = int(invocations) if equals else 1
+    return commands
@@ -0,0 +1,35 @@
+# pragma: coverage exclude file
+"""
+Prints the events affecting a date, desk or user.
+
+Example: python -m eadk_discord.query_history db.json --date 2024-10-02 --desk 3
+"""
+
+import argparse
+import time
+from datetime import date
+from pathlib import Path
+
+from eadk_discord.database import Database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="EADK Discord history query")
+    parser.add_argument("database_path", type=Path)
+    parser.add_argument("--date", type=date.fromisoformat)
+    parser.add_argument("--desk", type=int, help="desk number, starting from 1")
+    parser.add_argument("--user", type=int, help="id of the author or the user the event is about")
+    parser.add_argument("--limit", type=int, default=50, help="only print the most recent events")
+    args = parser.parse_args()
+
+    database = Database.open(args.database_path)
+
+    start = time.perf_counter()
+    indices = database.query_events(
+        date=args.date, desk=args.desk - 1 if args.desk is not None else None, user=args.user
+    )
+    elapsed = time.perf_counter() - start
+
+    for index in indices[-args.limit :]:
+        event = database.event(index)
+        print(f"#{index} {event.time.isoformat()} {event.author}: {event.event.describe(str)}")
+    print(f"{len(indices)} matching events found in {elapsed * 1000:.1f} ms")
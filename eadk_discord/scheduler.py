@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import date as Date  # noqa: N812
+from datetime import datetime as DateTime  # noqa: N812
+from datetime import time as Time  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+from datetime import tzinfo as TzInfo  # noqa: N812
+from pathlib import Path
+
+from beartype import beartype
+from pydantic import BaseModel, Field
+
+from eadk_discord.database.archive import write_atomic
+
+
+class Job(BaseModel):
+    time: DateTime = Field()
+    kind: str = Field()
+    # The day the job is for.
+    date: Date = Field()
+
+
+@beartype
+def next_daily(after: DateTime, at: Time) -> DateTime:
+    """
+    Returns the first time after `after` at which the clock shows `at`, in the time zone of `after`.
+    """
+    run = DateTime.combine(after.date(), at, tzinfo=after.tzinfo)
+    if run <= after:
+        run = DateTime.combine(after.date() + TimeDelta(days=1), at, tzinfo=after.tzinfo)
+    return run
+
+
+class Scheduler:
+    """
+    Runs jobs at given times on the asyncio loop.
+
+    Pending jobs are kept in a heap ordered by time, so the loop only ever looks at the earliest job and sleeps until
+    it is due. The pending jobs are written to a file whenever they change and read back on startup, so starting up
+    takes time proportional to the number of pending jobs.
+
+    Daily jobs reschedule themselves for the next day after running. A daily job that was missed, e.g. because the bot
+    was not running, runs once when the bot starts again, but only if it is still the job's day.
+    """
+
+    path: Path | None
+    _time_zone: TzInfo
+    # Heap of (time, sequence number, job), where the sequence number keeps jobs at the same time in order.
+    _heap: list[tuple[DateTime, int, Job]]
+    _sequence: int
+    _daily: dict[str, tuple[Time, Callable[[Date], Awaitable[None]]]]
+    _wakeup: asyncio.Event
+
+    @beartype
+    def __init__(self, path: Path | None, time_zone: TzInfo) -> None:
+        self.path = path
+        self._time_zone = time_zone
+        self._heap = []
+        self._sequence = 0
+        self._daily = {}
+        self._wakeup = asyncio.Event()
+        if path is not None and path.exists():
+            for job_json in json.loads(path.read_bytes()):
+                self._push(Job.model_validate(job_json))
+
+    @property
+    def pending(self) -> list[Job]:
+        return [job for _, _, job in sorted(self._heap)]
+
+    def now(self) -> DateTime:
+        return DateTime.now(self._time_zone)
+
+    @beartype
+    def daily(self, kind: str, at: Time, handler: Callable[[Date], Awaitable[None]]) -> None:
+        """
+        Runs `handler` every day at the given local time with the day's date.
+
+        Pending jobs of the kind that are at another time, because the time has been changed since they were scheduled,
+        are moved to the given time on the same day.
+        """
+        self._daily[kind] = (at, handler)
+        pending = [entry for entry in self._heap if entry[2].kind == kind]
+        if not pending:
+            self._schedule_daily(kind, self.now())
+            return
+        moved = [entry for entry in pending if entry[2].time.astimezone(self._time_zone).time() != at]
+        if not moved:
+            return
+        self._heap = [entry for entry in self._heap if entry not in moved]
+        heapq.heapify(self._heap)
+        for _, _, job in moved:
+            self.schedule(Job(time=DateTime.combine(job.date, at, tzinfo=self._time_zone), kind=kind, date=job.date))
+
+    @beartype
+    def schedule(self, job: Job) -> None:
+        self._push(job)
+        self._save()
+        # The loop may be sleeping until a later job.
+        self._wakeup.set()
+
+    @beartype
+    async def run_due(self, now: DateTime) -> int:
+        """
+        Runs every job that is due at `now`. Returns the number of jobs run.
+        """
+        num_run = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, _, job = heapq.heappop(self._heap)
+            self._save()
+            num_run += 1
+            daily = self._daily.get(job.kind)
+            if daily is None:
+                logging.warning(f"Dropping job {job} with no handler")
+                continue
+            _, handler = daily
+            if job.date == now.astimezone(self._time_zone).date():
+                try:
+                    await handler(job.date)
+                except Exception:
+                    logging.exception(f"Job {job} failed")
+            else:
+                logging.info(f"Skipping job {job} for a day that has passed")
+            self._schedule_daily(job.kind, now)
+        return num_run
+
+    async def run(self) -> None:
+        """
+        Runs jobs as they become due. Never returns.
+        """
+        while True:
+            self._wakeup.clear()
+            now = self.now()
+            await self.run_due(now)
+            timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    def _schedule_daily(self, kind: str, after: DateTime) -> None:
+        at, _ = self._daily[kind]
+        time = next_daily(after.astimezone(self._time_zone), at)
+        self.schedule(Job(time=time, kind=kind, date=time.date()))
+
+    def _push(self, job: Job) -> None:
+        heapq.heappush(self._heap, (job.time, self._sequence, job))
+        self._sequence += 1
+
+    def _save(self) -> None:
+        if self.path is not None:
+            write_atomic(self.path, json.dumps([job.model_dump(mode="json") for _, _, job in self._heap]).encode())
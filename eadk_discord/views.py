@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import date as Date  # noqa: N812
+from datetime import timedelta as TimeDelta  # noqa: N812
+
+from beartype import beartype
+
+from eadk_discord.database import Database
+from eadk_discord.database.diff import Diff
+from eadk_discord.database.state import Day
+
+VIEW_CACHE_SIZE = 64
+GRID_LEGEND = "x booked, o owned but free, . free"
+# Discord rejects embeds whose description is longer than 4096 characters, and the grid is sent as a code block.
+GRID_MAX_LENGTH = 4096 - len("```\n\n```")
+
+
+@beartype
+def week_window(date: Date) -> tuple[Date, Date]:
+    """
+    Returns the Monday and Sunday of the week containing the date.
+    """
+    start = date - TimeDelta(days=date.weekday())
+    return start, start + TimeDelta(days=6)
+
+
+@beartype
+def month_window(date: Date) -> tuple[Date, Date]:
+    """
+    Returns the first and last day of the month containing the date.
+    """
+    start = date.replace(day=1)
+    next_month = (start + TimeDelta(days=32)).replace(day=1)
+    return start, next_month - TimeDelta(days=1)
+
+
+def _cell(day: Day, desk_index: int) -> str:
+    if desk_index >= len(day.desks):
+        return ""
+    desk = day.desks[desk_index]
+    if desk.booker is not None:
+        return "x"
+    return "o" if desk.owner is not None else "."
+
+
+@beartype
+def render_grid(days: Sequence[Day], max_length: int = GRID_MAX_LENGTH) -> str:
+    """
+    Renders a grid with a column per day and a row per desk, followed by the number of free desks on each day.
+
+    If the grid would be longer than `max_length` characters, the rows of the desks are left out.
+    """
+    num_desks = max(len(day.desks) for day in days)
+    header = [
+        "Day  " + "".join(f"{day.date.strftime('%a')[:2]:>3}" for day in days),
+        "     " + "".join(f"{day.date.day:>3}" for day in days),
+    ]
+    desk_rows = [
+        f"{desk_index + 1:<5}" + "".join(f"{_cell(day, desk_index):>3}" for day in days)
+        for desk_index in range(num_desks)
+    ]
+    free_row = "Free " + "".join(f"{sum(desk.booker is None for desk in day.desks):>3}" for day in days)
+    grid = "\n".join([*header, *desk_rows, free_row])
+    if len(grid) <= max_length:
+        return grid
+    return "\n".join([*header, free_row, "", f"{num_desks} desks are too many to show here, use /info for a day."])
+
+
+class ViewCache:
+    """
+    Rendered grids of date windows. A grid is dropped when an event changes any of its dates.
+    """
+
+    _database: Database
+    _max_size: int
+    _grids: OrderedDict[tuple[Date, Date], str]
+
+    @beartype
+    def __init__(self, database: Database, max_size: int = VIEW_CACHE_SIZE) -> None:
+        self._database = database
+        self._max_size = max_size
+        self._grids = OrderedDict()
+        database.subscribe(self._invalidate)
+
+    def __len__(self) -> int:
+        return len(self._grids)
+
+    @beartype
+    def grid(self, start_date: Date, end_date: Date) -> str:
+        window = (start_date, end_date)
+        grid = self._grids.get(window)
+        if grid is not None:
+            self._grids.move_to_end(window)
+            return grid
+        grid = render_grid(self._database.day_range(start_date, end_date))
+        self._grids[window] = grid
+        if len(self._grids) > self._max_size:
+            self._grids.popitem(last=False)
+        return grid
+
+    @beartype
+    def _invalidate(self, diff: Diff) -> None:
+        changed = {change.date for change in diff.desks} | {change.date for change in diff.num_desks}
+        if not changed:
+            return
+        first, last = min(changed), max(changed)
+        for start_date, end_date in list(self._grids):
+            if first <= end_date and start_date <= last and any(start_date <= date <= end_date for date in changed):
+                del self._grids[(start_date, end_date)]
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from types import CodeType, FrameType
+from typing import Any
+
+from beartype import beartype
+
+# Upper bounds in seconds of the buckets of the loop lag histogram.
+LAG_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0)
+# Discord invalidates an interaction that has not been acknowledged within this many seconds.
+INTERACTION_DEADLINE = 3.0
+
+
+class LoopWatchdog:
+    """
+    Measures the lag of the event loop and reports what blocks it.
+
+    A coroutine on the loop sleeps for `interval` at a time and records how much later than requested it woke up,
+    which is how long timers, and thus interactions, were kept waiting. Since a blocked loop cannot report on itself, a
+    separate thread watches the coroutine's heartbeat. Once the loop has been stuck for `threshold` seconds, it logs the
+    stack of the loop's thread along with the command whose callback is on that stack, while the loop is still stuck.
+
+    The lag histogram and the number of stalls are rendered in the Prometheus text format by `metrics`.
+    """
+
+    interval: float
+    threshold: float
+    stalls: int
+    lag_counts: list[int]
+    lag_sum: float
+    max_lag: float
+    # Code objects of command callbacks, to find the command being handled on the stack.
+    _commands: dict[CodeType, str]
+    _thread_id: int | None
+    _heartbeat: float
+    _reported_heartbeat: float | None
+    _stopped: threading.Event
+    _thread: threading.Thread | None
+    _task: asyncio.Task[None] | None
+
+    @beartype
+    def __init__(self, threshold: float = 1.0, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = 0
+        # One count per bucket and a final one for lags above every bucket.
+        self.lag_counts = [0] * (len(LAG_BUCKETS) + 1)
+        self.lag_sum = 0.0
+        self.max_lag = 0.0
+        self._commands = {}
+        self._thread_id = None
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self._task = None
+
+    @beartype
+    def register_command(self, name: str, callback: Callable[..., Any]) -> None:
+        """
+        Makes stalls inside the callback be reported as happening in the named command.
+        """
+        # Decorators such as beartype's wrap the callback, and the wrapper and the callback are both on the stack.
+        function: Any = callback
+        while function is not None:
+            code = getattr(function, "__code__", None)
+            if isinstance(code, CodeType):
+                self._commands[code] = name
+            function = getattr(function, "__wrapped__", None)
+
+    def start(self) -> None:
+        """
+        Starts measuring the lag of the running loop. Must be called from the loop's thread.
+        """
+        if self._task is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @beartype
+    def record_lag(self, lag: float) -> None:
+        bucket = next((i for i, bound in enumerate(LAG_BUCKETS) if lag <= bound), len(LAG_BUCKETS))
+        self.lag_counts[bucket] += 1
+        self.lag_sum += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            logging.warning(f"The event loop was blocked for {lag:.2f} seconds")
+
+    @beartype
+    def check(self, now: float) -> bool:
+        """
+        Reports a stall if the loop has not run the heartbeat for longer than the threshold. Each stall is reported
+        once. Returns whether a stall was reported.
+        """
+        heartbeat = self._heartbeat
+        if now - heartbeat - self.interval < self.threshold or self._reported_heartbeat == heartbeat:
+            return False
+        self._reported_heartbeat = heartbeat
+        self.stalls += 1
+        blocked_for = now - heartbeat
+        frame = sys._current_frames().get(self._thread_id) if self._thread_id is not None else None
+        command = self._command_on_stack(frame) if frame is not None else None
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        during = f" while handling /{command}" if command is not None else ""
+        deadline = (
+            f", past the {INTERACTION_DEADLINE:.0f} second deadline" if blocked_for > INTERACTION_DEADLINE else ""
+        )
+        logging.warning(f"The event loop has been blocked for {blocked_for:.2f} seconds{during}{deadline}:\n{stack}")
+        return True
+
+    def metrics(self) -> str:
+        """
+        Renders the metrics in the Prometheus text format.
+        """
+        lines = [
+            "# HELP eadk_loop_lag_seconds How much later than scheduled the event loop ran a timer.",
+            "# TYPE eadk_loop_lag_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip((*LAG_BUCKETS, float("inf")), self.lag_counts, strict=True):
+            cumulative += count
+            label = "+Inf" if bound == float("inf") else f"{bound}"
+            lines.append(f'eadk_loop_lag_seconds_bucket{{le="{label}"}} {cumulative}')
+        lines += [
+            f"eadk_loop_lag_seconds_sum {self.lag_sum}",
+            f"eadk_loop_lag_seconds_count {cumulative}",
+            "# HELP eadk_loop_lag_max_seconds Largest lag of the event loop so far.",
+            "# TYPE eadk_loop_lag_max_seconds gauge",
+            f"eadk_loop_lag_max_seconds {self.max_lag}",
+            "# HELP eadk_loop_stalls_total Times the event loop was blocked for longer than the threshold.",
+            "# TYPE eadk_loop_stalls_total counter",
+            f"eadk_loop_stalls_total {self.stalls}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _command_on_stack(self, frame: FrameType) -> str | None:
+        current: FrameType | None = frame
+        while current is not None:
+            command = self._commands.get(current.f_code)
+            if command is not None:
+                return command
+            current = current.f_back
+        return None
+
+    async def _measure(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._heartbeat = time.monotonic()
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record_lag(max(loop.time() - start - self.interval, 0.0))
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.check(time.monotonic())
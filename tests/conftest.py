@@ -1,11 +1,12 @@
 from collections.abc import Callable, Sequence
 from datetime import date, datetime
+from pathlib import Path
 
 import pytest
 
 from eadk_discord.bot import CommandInfo, EADKBot
 from eadk_discord.database.database import Database
-from eadk_discord.database.event import Event, SetNumDesks
+from eadk_discord.database.event import BookDesk, Event, SetNumDesks
 
 NOW: datetime = datetime.fromisoformat("2024-09-13")  # Friday
 TODAY: date = NOW.date()
@@ -14,12 +15,28 @@ REGULAR_ROLE_ID: int = 1
 ADMIN_ROLE_ID: int = 2
 
 
-@pytest.fixture
-def bot() -> EADKBot:
+def new_database() -> Database:
     database = Database.initialize(TODAY)
     database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=6)))
+    return database
+
+
+def save_database(path: Path) -> None:
+    new_database().save(path)
+
 
-    bot = EADKBot(database, set([REGULAR_ROLE_ID]), set([ADMIN_ROLE_ID]))
+def book_event(desk_index: int = 0, user: int = 1, key: int | None = None, time: datetime = NOW) -> Event:
+    return Event(
+        author=user,
+        time=time,
+        event=BookDesk(start_date=TODAY, end_date=TODAY, desk_index=desk_index, user=user),
+        idempotency_key=key,
+    )
+
+
+@pytest.fixture
+def bot() -> EADKBot:
+    bot = EADKBot(new_database(), set([REGULAR_ROLE_ID]), set([ADMIN_ROLE_ID]))
 
     return bot
 
@@ -29,10 +46,14 @@ def command_info(
     format_user: Callable[[int], str] = lambda user: str(user),
     author_id: int = 1,
     author_role_ids: Sequence[int] = [],
+    interaction_id: int | None = None,
+    author_manages_guild: bool = False,
 ) -> CommandInfo:
     return CommandInfo(
         now=now,
         format_user=format_user,
         author_id=author_id,
         author_role_ids=set(author_role_ids),
+        interaction_id=interaction_id,
+        author_manages_guild=author_manages_guild,
     )
@@ -0,0 +1,124 @@
+import random
+from datetime import timedelta
+
+from conftest import ADMIN_ROLE_ID, NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database import Database
+from eadk_discord.database.allocator import Assignment, BusyIntervals, RangeAllocator
+from eadk_discord.database.event import BookDesk, Event, MakeOwned, SetNumDesks, UnbookDesk
+from eadk_discord.database.event_errors import EventError
+
+
+def book(database: Database, desk_index: int, start: int, end: int, user: int = 1) -> None:
+    event = BookDesk(
+        start_date=TODAY + timedelta(days=start), end_date=TODAY + timedelta(days=end), desk_index=desk_index, user=user
+    )
+    database.handle_event(Event(author=user, time=NOW, event=event))
+
+
+def test_busy_intervals() -> None:
+    rng = random.Random(0)
+    intervals = BusyIntervals()
+    busy: set[int] = set()
+    for _ in range(500):
+        start = rng.randrange(100)
+        end = start + rng.randrange(10)
+        value = rng.random() < 0.5
+        intervals.set(start, end, value)
+        if value:
+            busy.update(range(start, end + 1))
+        else:
+            busy.difference_update(range(start, end + 1))
+        expected = {
+            day for start, end in zip(intervals.starts, intervals.ends, strict=True) for day in range(start, end + 1)
+        }
+        assert expected == busy
+        # Intervals are sorted, disjoint and not adjacent.
+        assert all(intervals.ends[i] + 1 < intervals.starts[i + 1] for i in range(len(intervals.starts) - 1))
+
+
+def test_find(bot: EADKBot) -> None:
+    database = bot.database
+    allocator = RangeAllocator(database)
+    day = [TODAY + timedelta(days=offset) for offset in range(10)]
+
+    for desk_index in range(6):
+        book(database, desk_index, 0, 0)
+    assert allocator.find(day[0], day[3]) is None
+    assert allocator.find(day[1], day[3]) == [Assignment(desk_index=0, start_date=day[1], end_date=day[3])]
+
+    # Desk 3 is free for exactly the range, which is a tighter fit than the other desks.
+    for desk_index in range(6):
+        if desk_index != 2:
+            book(database, desk_index, 4, 4)
+    book(database, 2, 5, 5)
+    assert allocator.find(day[1], day[4]) == [Assignment(desk_index=2, start_date=day[1], end_date=day[4])]
+
+    # No desk is free on both day 4 and day 5, so the range is split once.
+    assert allocator.find(day[3], day[6]) == [
+        Assignment(desk_index=2, start_date=day[3], end_date=day[4]),
+        Assignment(desk_index=0, start_date=day[5], end_date=day[6]),
+    ]
+    assert allocator.find(day[3], day[6], desks=[3, 4]) is None
+
+
+def test_incremental_updates() -> None:
+    rng = random.Random(1)
+    database = Database.initialize(TODAY)
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=8)))
+    allocator = RangeAllocator(database)
+    allocator.find(TODAY, TODAY)
+    for _ in range(300):
+        desk_index = rng.randrange(8)
+        start = rng.randrange(40)
+        date = TODAY + timedelta(days=start)
+        match rng.randrange(4):
+            case 0:
+                end = date + timedelta(days=rng.randrange(5))
+                event: BookDesk | UnbookDesk | MakeOwned | None = BookDesk(
+                    start_date=date, end_date=end, desk_index=desk_index, user=1
+                )
+            case 1:
+                event = UnbookDesk(start_date=date, end_date=date, desk_index=desk_index)
+            case 2:
+                event = MakeOwned(start_date=date, desk_index=desk_index, user=2)
+            case _:
+                event = None
+        if event is not None:
+            try:
+                database.handle_event(Event(author=1, time=NOW, event=event))
+            except EventError:
+                pass
+        else:
+            start_date = TODAY + timedelta(days=rng.randrange(40))
+            end_date = start_date + timedelta(days=rng.randrange(20))
+            rebuilt = RangeAllocator(database)
+            rebuilt.find(TODAY, TODAY)
+            assert allocator.find(start_date, end_date) == rebuilt.find(start_date, end_date)
+
+
+def test_book_range_without_desk(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    for desk_num in range(1, 7):
+        bot.book(admin, date_str="monday", user_id=10 + desk_num, desk_num=desk_num, end_date_str=None)
+    bot.unbook(admin, date_str="monday", user_id=None, desk_num=4, end_date_str=None)
+    bot.book(admin, date_str="tuesday", user_id=20, desk_num=4, end_date_str=None)
+
+    response = bot.book(admin, date_str="today", user_id=5, desk_num=None, end_date_str="tuesday")
+    assert not response.ephemeral
+    assert response.message == (
+        "No single desk is free for the whole range, so desks have been booked for 5: "
+        "desk 4 from 2024-09-13 to 2024-09-16, desk 1 from 2024-09-17 to 2024-09-17."
+    )
+    assert [desk.booker for desk in bot.database.day(TODAY + timedelta(days=3)).desks] == [11, 12, 13, 5, 15, 16]
+
+    # Desks 1 and 4 are booked right up to the range, so they fit it best.
+    response = bot.book(admin, date_str="2024-09-18", user_id=5, desk_num=None, end_date_str="2024-09-20")
+    assert response.message == "Desk 1 has been booked for 5 from 2024-09-18 to 2024-09-20."
+
+    # Regular users can only make range bookings of desks they own.
+    response = bot.book(
+        command_info(author_id=5), date_str="saturday", user_id=None, desk_num=None, end_date_str="sunday"
+    )
+    assert response.ephemeral
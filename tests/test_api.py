@@ -0,0 +1,74 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from aiohttp.test_utils import TestClient, TestServer
+from conftest import ADMIN_ROLE_ID, TODAY, command_info
+
+from eadk_discord.api import AvailabilityApi
+from eadk_discord.bot import EADKBot
+
+
+def with_client(bot: EADKBot, test: Callable[[TestClient], Awaitable[None]]) -> None:
+    async def run() -> None:
+        api = AvailabilityApi(bot.database, today=lambda: TODAY)
+        async with TestClient(TestServer(api.app())) as client:
+            await test(client)
+
+    asyncio.run(run())
+
+
+def test_day_and_etag(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+
+    async def test(client: TestClient) -> None:
+        bot.book(admin, date_str="today", user_id=4, desk_num=2, end_date_str=None)
+        response = await client.get("/days/today")
+        assert response.status == 200
+        body = await response.json()
+        assert body["date"] == TODAY.isoformat()
+        assert body["desks"][1] == {"desk": 2, "booker": 4, "owner": None}
+        assert body["available"] == [1, 3, 4, 5, 6]
+        etag = response.headers["ETag"]
+
+        response = await client.get(f"/days/{TODAY.isoformat()}", headers={"If-None-Match": etag})
+        assert response.status == 304
+        assert await response.read() == b""
+
+        bot.book(admin, date_str="today", user_id=5, desk_num=3, end_date_str=None)
+        response = await client.get("/days/today", headers={"If-None-Match": etag})
+        assert response.status == 200
+        assert response.headers["ETag"] != etag
+
+        assert (await client.get("/days/yesterday")).status == 400
+        assert (await client.get("/days/2020-01-01")).status == 400
+
+    with_client(bot, test)
+
+
+def test_ranges_and_bookings(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+
+    async def test(client: TestClient) -> None:
+        bot.book(admin, date_str="monday", user_id=4, desk_num=1, end_date_str=None)
+        bot.book(admin, date_str="tuesday", user_id=4, desk_num=6, end_date_str=None)
+
+        response = await client.get("/days", params={"start": "today", "end": "tuesday"})
+        assert response.status == 200
+        assert [day["date"] for day in await response.json()] == [
+            "2024-09-13",
+            "2024-09-14",
+            "2024-09-15",
+            "2024-09-16",
+            "2024-09-17",
+        ]
+
+        response = await client.get("/users/4/bookings")
+        assert await response.json() == [{"date": "2024-09-16", "desk": 1}, {"date": "2024-09-17", "desk": 6}]
+        response = await client.get("/users/4/bookings", params={"start": "tuesday"})
+        assert await response.json() == [{"date": "2024-09-17", "desk": 6}]
+
+        assert (await client.get("/days")).status == 400
+        assert (await client.get("/days", params={"end": "2026-01-01"})).status == 400
+        assert (await client.get("/users/me/bookings")).status == 400
+
+    with_client(bot, test)
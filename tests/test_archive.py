@@ -0,0 +1,80 @@
+from datetime import timedelta
+from pathlib import Path
+
+from conftest import NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database import Database
+from eadk_discord.database.archive import archive_path
+
+
+def book_days(bot: EADKBot, num_days: int) -> None:
+    for i in range(num_days):
+        bot.book(
+            command_info(now=NOW + timedelta(days=i)),
+            date_str=None,
+            user_id=None,
+            desk_num=None,
+            end_date_str=None,
+        )
+
+
+def test_archive_roundtrip(bot: EADKBot, tmp_path: Path) -> None:
+    database = bot.database
+    path = tmp_path / "db.json"
+    book_days(bot, 5)
+    for i, event in enumerate(database.history.history):
+        event.time = NOW + timedelta(days=i)
+
+    archived = database.archive_before(path, NOW + timedelta(days=3))
+    assert archived == 3
+    assert database.history.offset == 3
+    assert len(database.history.history) == 3
+    assert database.num_events == 6
+
+    loaded = Database.load(path)
+    assert loaded.state == database.state
+    assert loaded.num_events == 6
+    assert list(loaded.events()) == list(database.events())
+    assert loaded.event(1) == database.event(1)
+    assert loaded.state.day(TODAY + timedelta(days=4))[0].desk(0).booker == 1
+
+
+def test_archive_multiple_segments(bot: EADKBot, tmp_path: Path) -> None:
+    database = bot.database
+    path = tmp_path / "db.json"
+    book_days(bot, 6)
+    for i, event in enumerate(database.history.history):
+        event.time = NOW + timedelta(days=i)
+
+    assert database.archive_before(path, NOW + timedelta(days=2), compress=False) == 2
+    assert database.archive_before(path, NOW + timedelta(days=2)) == 0
+    assert database.archive_before(path, NOW + timedelta(days=5)) == 3
+    assert database.archive is not None
+    assert len(database.archive.segments) == 2
+    assert len(list(archive_path(path).glob("checkpoint-*"))) == 1
+
+    loaded = Database.load(path)
+    assert loaded.state == database.state
+    assert [event.time for event in loaded.events(start_time=NOW + timedelta(days=3))] == [
+        NOW + timedelta(days=i) for i in range(2, 7)
+    ]
+
+
+def test_archive_interrupted(bot: EADKBot, tmp_path: Path) -> None:
+    database = bot.database
+    path = tmp_path / "db.json"
+    book_days(bot, 4)
+    for i, event in enumerate(database.history.history):
+        event.time = NOW + timedelta(days=i)
+    database.save(path)
+    stale_active = path.read_text()
+
+    database.archive_before(path, NOW + timedelta(days=2))
+    # Simulate a crash after the archive was written but before the active ledger was replaced.
+    path.write_text(stale_active)
+
+    loaded = Database.load(path)
+    assert loaded.history.offset == 2
+    assert loaded.num_events == 5
+    assert loaded.state == database.state
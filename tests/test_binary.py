@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import get_args
+
+import pytest
+from conftest import NOW, TODAY
+
+from eadk_discord.database import Database, binary
+from eadk_discord.database.event import (
+    BookDesk,
+    CheckIn,
+    Event,
+    JoinWaitlist,
+    LeaveWaitlist,
+    MakeFlex,
+    MakeOwned,
+    SetDeskAttributes,
+    SetNumDesks,
+    UnbookDesk,
+)
+from eadk_discord.database.history import History
+from eadk_discord.database.mapped import MappedHistory
+
+
+def sample_history() -> History:
+    history = History(start_date=TODAY, history=[], offset=17)
+    for event in [
+        Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=6)),
+        Event(
+            author=1234567890123456789,
+            time=datetime(2024, 9, 13, 9, 30, 1, 123456),
+            event=BookDesk(start_date=TODAY, end_date=TODAY + timedelta(days=3), desk_index=2, user=42),
+        ),
+        Event(
+            author=0,
+            time=datetime(2024, 9, 13, 10, tzinfo=timezone(timedelta(hours=2))),
+            event=UnbookDesk(start_date=TODAY + timedelta(days=1), end_date=TODAY + timedelta(days=2), desk_index=2),
+        ),
+        Event(
+            author=5,
+            time=datetime(1969, 12, 31, 23, 59, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+            event=MakeOwned(start_date=TODAY, desk_index=4, user=9),
+        ),
+        Event(author=5, time=NOW, event=MakeFlex(start_date=TODAY + timedelta(days=30), desk_index=4)),
+        Event(author=6, time=NOW, event=JoinWaitlist(date=TODAY + timedelta(days=2), user=6)),
+        Event(author=7, time=NOW, event=LeaveWaitlist(date=TODAY + timedelta(days=2), user=6)),
+        Event(author=42, time=NOW, event=CheckIn(date=TODAY, desk_index=2, user=42)),
+    ]:
+        history.append(event)
+    return history
+
+
+def test_binary_roundtrip() -> None:
+    history = sample_history()
+    data = binary.encode(history)
+
+    assert binary.is_binary(data)
+    assert len(data) == binary.HEADER_SIZE + len(history.history) * binary.RECORD.size
+    decoded = binary.decode(data)
+    assert decoded == history
+    assert History.from_json(decoded.to_json()) == history
+    assert [event.time.utcoffset() for event in decoded.history] == [
+        event.time.utcoffset() for event in history.history
+    ]
+    assert list(binary.decode_events(data, 1, 3)) == history.history[1:3]
+
+
+def test_decoded_events_match_model_construct() -> None:
+    # The decoder sets pydantic's internal attributes directly, so this fails if an event model gains private
+    # attributes, extra fields or anything else that `model_construct` would set up.
+    history = sample_history()
+    history.append(
+        Event(author=1, time=NOW, event=SetDeskAttributes(start_date=TODAY, desk_index=1, name="A", zone=None, tags=[]))
+    )
+    decoded = binary.decode(binary.encode(history)).history
+    assert {type(event.event) for event in decoded} == set(get_args(Event.model_fields["event"].annotation))
+
+    internals = ["__dict__", "__pydantic_fields_set__", "__pydantic_extra__", "__pydantic_private__"]
+    for event in decoded:
+        for model in (event, event.event):
+            expected = type(model).model_construct(**dict(model))
+            assert [getattr(model, name) for name in internals] == [getattr(expected, name) for name in internals]
+
+
+def test_binary_invalid() -> None:
+    data = binary.encode(sample_history())
+
+    with pytest.raises(binary.BinaryFormatError):
+        binary.decode(data[:-1])
+    with pytest.raises(binary.BinaryFormatError):
+        binary.decode(b"{}")
+    with pytest.raises(binary.BinaryFormatError):
+        binary.encode_event(
+            Event(
+                author=None,
+                time=datetime(2024, 1, 1, tzinfo=timezone(timedelta(seconds=30))),
+                event=MakeFlex(start_date=TODAY, desk_index=0),
+            )
+        )
+
+
+def test_binary_database(tmp_path: Path) -> None:
+    database = Database.initialize(TODAY)
+    for event in sample_history().history:
+        database.handle_event(event)
+
+    binary_path = tmp_path / f"db{binary.BINARY_SUFFIX}"
+    json_path = tmp_path / "db.json"
+    database.save(binary_path)
+    database.save(json_path)
+
+    assert binary_path.stat().st_size < json_path.stat().st_size
+    assert Database.load(binary_path).state == database.state
+    assert Database.load(binary_path).history == Database.load(json_path).history
+
+
+def test_binary_desk_attributes(tmp_path: Path) -> None:
+    history = sample_history()
+    history.append(
+        Event(
+            author=5,
+            time=NOW,
+            event=SetDeskAttributes(start_date=TODAY, desk_index=1, name="Window", zone="north", tags=["monitor"]),
+        )
+    )
+    history.append(
+        Event(
+            author=5, time=NOW, event=SetDeskAttributes(start_date=TODAY, desk_index=3, name=None, zone=None, tags=[])
+        )
+    )
+    data = binary.encode(history)
+
+    assert binary.decode(data) == history
+    assert list(binary.decode_events(data, 8, 10)) == history.history[8:10]
+    with pytest.raises(binary.BinaryFormatError):
+        binary.encode_event(history.history[8])
+
+    path = tmp_path / f"db{binary.BINARY_SUFFIX}"
+    path.write_bytes(data)
+    with MappedHistory.open(path) as mapped:
+        assert list(mapped[8:]) == history.history[8:]
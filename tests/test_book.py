@@ -78,6 +78,23 @@ def test_book_with_user(bot: EADKBot) -> None:
         assert database.state.day(TODAY)[0].desk(i).booker is None
 
 
+def test_book_with_user_guild_permissions(bot: EADKBot) -> None:
+    database = bot.database
+    bot = EADKBot(database, set(), set(), guild_permissions=True)
+
+    response = bot.book(
+        command_info(author_role_ids=[REGULAR_ROLE_ID]), date_str=None, user_id=7, desk_num=None, end_date_str=None
+    )
+    assert response.ephemeral is True
+    assert database.state.day(TODAY)[0].desk(0).booker is None
+
+    response = bot.book(
+        command_info(author_manages_guild=True), date_str=None, user_id=7, desk_num=None, end_date_str=None
+    )
+    assert response.ephemeral is False
+    assert database.state.day(TODAY)[0].desk(0).booker == 7
+
+
 def test_book_with_user_desk(bot: EADKBot) -> None:
     database = bot.database
 
@@ -330,8 +347,9 @@ def test_book_fully_booked(bot: EADKBot) -> None:
         desk_num=None,
         end_date_str=None,
     )
-    assert response.ephemeral is True
     assert response.message != INTERNAL_ERROR_MESSAGE
+    # The user is put on the waitlist instead.
+    assert database.state.waitlist(TODAY) == [7]
 
 
 def test_book_too_early(bot: EADKBot) -> None:
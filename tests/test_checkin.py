@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import pytest
+from conftest import ADMIN_ROLE_ID, NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database.event import CheckIn, Event
+from eadk_discord.database.event_errors import DeskNotBookedByError
+from eadk_discord.database.state import State
+
+
+def test_checkin_and_release(bot: EADKBot) -> None:
+    database = bot.database
+    admin = command_info(author_id=9, author_role_ids=[ADMIN_ROLE_ID])
+    bot.makeowned(admin, start_date_str="today", user_id=1, desk_num=1)
+    for user in [2, 3, 4]:
+        bot.book(command_info(author_id=user), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    bot.book(command_info(author_id=4), date_str="tomorrow", user_id=None, desk_num=None, end_date_str=None)
+
+    assert bot.digest(TODAY) == "Good morning! 2 of 6 desks are free on Friday 2024-09-13: desk 5, 6."
+    # Owners do not need to check in.
+    assert bot.unconfirmed_bookers(TODAY) == [2, 3, 4]
+
+    response = bot.checkin(command_info(author_id=3))
+    assert response.message == "3 has checked in at desk 3."
+    assert bot.checkin(command_info(author_id=3)).ephemeral
+    assert bot.checkin(command_info(author_id=5)).message == "You have no desk booked on 2024-09-13."
+    assert bot.unconfirmed_bookers(TODAY) == [2, 4]
+
+    bot.book(command_info(author_id=5), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    bot.book(command_info(author_id=6), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    bot.book(command_info(author_id=7), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    assert database.state.waitlist(TODAY) == [7]
+    assert bot.digest(TODAY) == "Good morning! 0 of 6 desks are free on Friday 2024-09-13. Waitlist: 1."
+
+    message = bot.release_unconfirmed(TODAY, str)
+    assert message == (
+        "Released bookings that were not checked in on 2024-09-13: desk 2 (2), desk 4 (4), desk 5 (5), desk 6 (6)."
+    )
+    # The first released desk went to the waitlist, and needs to be checked in as well.
+    assert [desk.booker for desk in database.day(TODAY).desks] == [1, 7, 3, None, None, None]
+    assert bot.unconfirmed_bookers(TODAY) == [7]
+    # Bookings on other days are not affected.
+    assert database.day(TODAY + timedelta(days=1)).desk(1).booker == 4
+
+    assert State.initialize(database.history) == database.state
+    assert bot.release_unconfirmed(TODAY + timedelta(days=2), str) is None
+
+
+def test_checkin_reset_by_rebooking(bot: EADKBot) -> None:
+    database = bot.database
+    with pytest.raises(DeskNotBookedByError):
+        database.handle_event(Event(author=1, time=NOW, event=CheckIn(date=TODAY, desk_index=0, user=1)))
+    bot.book(command_info(author_id=1), date_str="today", user_id=None, desk_num=1, end_date_str=None)
+    bot.checkin(command_info(author_id=1))
+    assert database.day(TODAY).desk(0).checked_in
+    bot.unbook(command_info(author_id=1), date_str="today", user_id=None, desk_num=1, end_date_str=None)
+    bot.book(command_info(author_id=2), date_str="today", user_id=None, desk_num=1, end_date_str=None)
+    assert not database.day(TODAY).desk(0).checked_in
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+import pytest
+
+from eadk_discord.deadline import InteractionDeadline
+from eadk_discord.watchdog import INTERACTION_DEADLINE
+
+
+def test_defer_when_late() -> None:
+    deadline = InteractionDeadline(margin=1.0)
+    assert not deadline.should_defer("book", 0.1)
+    assert deadline.should_defer("book", 2.0)
+
+    # Commands that have been slow are deferred earlier.
+    deadline.record("book", run_time=1.5, elapsed=1.6, deferred=False)
+    assert deadline.expected_run_time("book") == 1.5
+    assert deadline.should_defer("book", 0.6)
+    assert not deadline.should_defer("info", 0.6)
+    deadline.record("book", run_time=0.5, elapsed=0.6, deferred=False)
+    assert deadline.expected_run_time("book") == pytest.approx(1.3)
+
+
+def test_metrics(caplog: pytest.LogCaptureFixture) -> None:
+    deadline = InteractionDeadline(near_miss=2.0)
+    with caplog.at_level(logging.WARNING):
+        deadline.record("book", run_time=0.01, elapsed=0.1, deferred=False)
+        deadline.record("book", run_time=0.01, elapsed=2.5, deferred=False)
+        deadline.record("book", run_time=0.01, elapsed=3.5, deferred=False)
+        deadline.record("info", run_time=0.01, elapsed=5.0, deferred=True)
+    assert (deadline.responses, deadline.deferrals, deadline.near_misses, deadline.misses) == (4, 1, 1, 1)
+    assert [record.getMessage() for record in caplog.records] == [
+        "Responded to /book 2.50 seconds after the interaction",
+        "Responded to /book 3.50 seconds after the interaction, past the deadline",
+    ]
+    metrics = deadline.metrics()
+    assert "eadk_interaction_deferrals_total 1\n" in metrics
+    assert "eadk_interaction_near_misses_total 1\n" in metrics
+    assert "eadk_interaction_misses_total 1\n" in metrics
+
+
+def test_defer_when_work_runs_long() -> None:
+    deadline = InteractionDeadline(margin=1.0)
+    deferrals: list[float] = []
+
+    async def defer() -> None:
+        deferrals.append(time.monotonic())
+
+    async def save_after(work: Callable[[], str]) -> str:
+        result = await asyncio.to_thread(work)
+        # Saving the changes counts towards the run time.
+        await asyncio.sleep(0.1)
+        return result
+
+    def slow() -> str:
+        time.sleep(0.3)
+        return "booked"
+
+    async def run() -> None:
+        # The deadline minus the margin is 0.1 seconds away, and nothing is known about how long /book takes.
+        waited = INTERACTION_DEADLINE - 1.1
+        start = time.monotonic()
+        result, run_time, deferred = await deadline.run("book", slow, save_after, waited, defer)
+        assert (result, deferred) == ("booked", True)
+        assert run_time >= 0.4
+        [deferred_at] = deferrals
+        assert 0.05 < deferred_at - start < 0.3
+
+        deferrals.clear()
+        result, _, deferred = await deadline.run("info", lambda: "free", asyncio.to_thread, waited, defer)
+        assert (result, deferred) == ("free", False)
+        assert deferrals == []
+
+    asyncio.run(run())
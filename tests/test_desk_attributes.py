@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from conftest import ADMIN_ROLE_ID, TODAY, command_info
+
+from eadk_discord.bot import EADKBot, parse_desk_filter
+from eadk_discord.database.state import DeskAttributes, DeskFilter, State
+
+
+def set_desks(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    bot.setdesk(admin, "today", 2, "Window", "north", "monitor, standing")
+    bot.setdesk(admin, "today", 4, None, "north", "Monitor")
+    bot.setdesk(admin, "today", 5, None, "south", "monitor")
+
+
+def test_setdesk(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    response = bot.setdesk(admin, "today", 2, "Window", "north", "standing, monitor,")
+    assert response.message == "Gave desk 2 name Window; zone north; tags monitor, standing from 2024-09-13 onwards."
+    state = bot.database.state
+    assert state.attributes(1, TODAY + timedelta(days=10)) == DeskAttributes(
+        name="Window", zone="north", tags=frozenset({"monitor", "standing"})
+    )
+    assert state.attributes(1, TODAY - timedelta(days=1)) == DeskAttributes()
+    assert state.attributes(0, TODAY) == DeskAttributes()
+
+    # Later attributes apply from their start date onwards.
+    bot.setdesk(admin, "2024-09-20", 2, "Window", "south", None)
+    assert state.attributes(1, TODAY + timedelta(days=6)).zone == "north"
+    assert state.attributes(1, TODAY + timedelta(days=7)) == DeskAttributes(name="Window", zone="south")
+    # Attributes starting earlier replace any later ones.
+    bot.setdesk(admin, "today", 2, None, None, "quiet")
+    assert state.attributes(1, TODAY + timedelta(days=7)) == DeskAttributes(tags=frozenset({"quiet"}))
+    assert state.matching_desks(TODAY, DeskFilter(zone="north")) == []
+    assert state.matching_desks(TODAY, DeskFilter(tags=frozenset({"quiet"}))) == [1]
+
+
+def test_matching_desks(bot: EADKBot) -> None:
+    set_desks(bot)
+    state = bot.database.state
+    assert state.matching_desks(TODAY, DeskFilter()) == [0, 1, 2, 3, 4, 5]
+    assert state.matching_desks(TODAY, DeskFilter(zone="north")) == [1, 3]
+    assert state.matching_desks(TODAY, parse_desk_filter(None, "monitor")) == [1, 3, 4]
+    assert state.matching_desks(TODAY, parse_desk_filter("north", "monitor,standing")) == [1]
+    assert state.matching_desks(TODAY, parse_desk_filter("east", None)) == []
+
+    # The indexes are rebuilt when the state is rebuilt or loaded from a checkpoint.
+    rebuilt = State.initialize(bot.database.history)
+    assert rebuilt == state
+    loaded = State.model_validate_json(state.model_dump_json())
+    assert loaded.matching_desks(TODAY, DeskFilter(zone="north")) == [1, 3]
+
+
+def test_book_filtered(bot: EADKBot) -> None:
+    set_desks(bot)
+    response = bot.book(
+        command_info(author_id=1), "today", user_id=None, desk_num=None, end_date_str=None, zone="north", tags="monitor"
+    )
+    assert response.message == "Desk 2 has been booked for 1 on 2024-09-13."
+    bot.book(command_info(author_id=2), "today", user_id=None, desk_num=None, end_date_str=None, tags="monitor")
+    assert bot.database.day(TODAY).desk(3).booker == 2
+    response = bot.book(
+        command_info(author_id=3), "today", user_id=None, desk_num=None, end_date_str=None, zone="north"
+    )
+    assert response.ephemeral
+    assert response.message == "No desks matching zone north are available for booking on 2024-09-13."
+    assert bot.database.state.waitlist(TODAY) == []
+
+    response = bot.book(
+        command_info(author_id=4, author_role_ids=[ADMIN_ROLE_ID]),
+        "today",
+        user_id=None,
+        desk_num=None,
+        end_date_str="2024-09-16",
+        zone="south",
+    )
+    assert response.message == "Desk 5 has been booked for 4 from 2024-09-13 to 2024-09-16."
+
+
+def test_info_filtered(bot: EADKBot) -> None:
+    set_desks(bot)
+    response = bot.info(command_info(), "today", zone="north")
+    assert response.embed is not None
+    assert response.embed.description == "Friday 2024-09-13, zone north"
+    assert response.embed.fields[0].value == "2 Window (north)\n4 (north)"
+    assert response.embed.fields[1].value == "**Free**\n**Free**"
+
+    response = bot.info(command_info(), "today", tags="quiet")
+    assert response.ephemeral
+    assert response.message == "No desks match tags quiet."
+
+    response = bot.info(command_info(), "today")
+    assert response.embed is not None
+    assert response.embed.fields[0].value == "1\n2 Window (north)\n3\n4 (north)\n5 (south)\n6"
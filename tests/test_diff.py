@@ -0,0 +1,83 @@
+import asyncio
+from datetime import timedelta
+
+from conftest import ADMIN_ROLE_ID, NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database.bus import ChangeBus
+from eadk_discord.database.diff import DeskChange, Diff, NumDesksChange
+from eadk_discord.database.event import Event, SetNumDesks
+
+
+def test_diffs(bot: EADKBot) -> None:
+    database = bot.database
+    diffs: list[Diff] = []
+    database.subscribe(diffs.append)
+    tomorrow = TODAY + timedelta(days=1)
+
+    admin = command_info(author_id=5, author_role_ids=[ADMIN_ROLE_ID])
+    bot.book(admin, date_str="today", user_id=None, desk_num=2, end_date_str="tomorrow")
+    assert diffs[-1].index == 1
+    assert diffs[-1].num_desks == []
+    assert diffs[-1].desks == [
+        DeskChange(date=day, desk_index=1, booker_before=None, booker_after=5, owner_before=None, owner_after=None)
+        for day in [TODAY, tomorrow]
+    ]
+
+    bot.makeowned(admin, start_date_str="tomorrow", user_id=7, desk_num=3)
+    assert diffs[-1].desks == [
+        DeskChange(date=tomorrow, desk_index=2, booker_before=None, booker_after=7, owner_before=None, owner_after=7)
+    ]
+
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=tomorrow, num_desks=4)))
+    assert diffs[-1].num_desks == [NumDesksChange(date=tomorrow, before=6, after=4)]
+    assert diffs[-1].desks == []
+
+    database.unsubscribe(diffs.append)
+    bot.book(command_info(author_id=5), date_str="today", user_id=None, desk_num=1, end_date_str=None)
+    assert len(diffs) == 3
+
+
+def test_change_bus_backpressure(bot: EADKBot) -> None:
+    async def run() -> None:
+        admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+        bus = ChangeBus(max_queue_size=2)
+        subscription = bus.subscribe()
+        bot.database.subscribe(bus.publish)
+
+        for desk_num in range(1, 6):
+            bot.book(admin, date_str="today", user_id=desk_num, desk_num=desk_num, end_date_str=None)
+        assert subscription.backlog == 5
+
+        drained = asyncio.create_task(bus.drain())
+        await asyncio.sleep(0)
+        assert not drained.done()
+        received = [(await subscription.get()).index for _ in range(4)]
+        await drained
+        received.append((await subscription.get()).index)
+        assert received == [1, 2, 3, 4, 5]
+        assert subscription.backlog == 0
+
+        bus.unsubscribe(subscription)
+        bot.book(admin, date_str="tomorrow", user_id=1, desk_num=1, end_date_str=None)
+        await bus.drain()
+        assert subscription.backlog == 0
+
+    asyncio.run(run())
+
+
+def test_change_bus_publish_from_thread(bot: EADKBot) -> None:
+    async def run() -> None:
+        bus = ChangeBus()
+        subscription = bus.subscribe()
+        bot.database.subscribe(bus.publish)
+        admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+
+        await asyncio.to_thread(
+            bot.book, admin, date_str="today", user_id=1, desk_num=1, end_date_str=None, zone=None, tags=None
+        )
+        # The diff reaches the consumer on its event loop before the worker thread's result does.
+        assert subscription.backlog == 1
+        assert (await subscription.get()).desks[0].booker_after == 1
+
+    asyncio.run(run())
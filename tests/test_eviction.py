@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from conftest import NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database.event import Event, MakeOwned
+from eadk_discord.database.event_errors import DateTooEarlyError
+from eadk_discord.database.state import DayEvictedError
+
+
+def test_evict(bot: EADKBot) -> None:
+    database = bot.database
+    state = database.state
+
+    bot.book(command_info(), date_str="tomorrow", user_id=None, desk_num=2, end_date_str=None)
+    state.day(TODAY + timedelta(days=20))
+
+    assert database.evict_before(TODAY + timedelta(days=10)) == 10
+    assert state.day_offset == 10
+    assert len(state.days) == 11
+    assert state.day(TODAY + timedelta(days=10))[0].date == TODAY + timedelta(days=10)
+    with pytest.raises(DayEvictedError):
+        state.day(TODAY + timedelta(days=1))
+    with pytest.raises(DateTooEarlyError):
+        state.day(TODAY - timedelta(days=1))
+
+    assert database.day(TODAY + timedelta(days=1)).desk(1).booker == 1
+    assert state.day_offset == 0
+    assert len(state.days) == 21
+
+
+def test_evict_keeps_last_day(bot: EADKBot) -> None:
+    database = bot.database
+
+    assert database.evict_before(TODAY + timedelta(days=100)) == 0
+    database.state.day(TODAY + timedelta(days=2))
+    assert database.evict_before(TODAY + timedelta(days=100)) == 2
+    assert database.day(TODAY + timedelta(days=50)).date == TODAY + timedelta(days=50)
+
+
+def test_event_on_evicted_day(bot: EADKBot) -> None:
+    database = bot.database
+
+    bot.book(command_info(), date_str="tomorrow", user_id=None, desk_num=2, end_date_str=None)
+    reference = database.state.model_copy(deep=True)
+    database.state.day(TODAY + timedelta(days=5))
+    database.evict_before(TODAY + timedelta(days=5))
+
+    event = Event(author=None, time=NOW, event=MakeOwned(start_date=TODAY, desk_index=2, user=3))
+    database.handle_event(event)
+    reference.handle_event(event)
+
+    assert database.state.day_offset == 0
+    for i in range(10):
+        date = TODAY + timedelta(days=i)
+        assert database.day(date) == reference.day(date)[0]
+
+
+def test_evict_after_archive(bot: EADKBot, tmp_path: Path) -> None:
+    database = bot.database
+    path = tmp_path / "db.json"
+
+    for i in range(4):
+        bot.book(
+            command_info(),
+            date_str=(TODAY + timedelta(days=i)).isoformat(),
+            user_id=None,
+            desk_num=None,
+            end_date_str=None,
+        )
+    assert database.archive_before(path, datetime.max) == 5
+    database.evict_before(TODAY + timedelta(days=3))
+
+    for i in range(4):
+        assert database.day(TODAY + timedelta(days=i)).desk(0).booker == 1
@@ -0,0 +1,71 @@
+import csv
+from collections.abc import Sequence
+from datetime import date, timedelta
+from pathlib import Path
+
+from conftest import ADMIN_ROLE_ID, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.export import CsvSink, Exporter, ExportProgress, Row, Sink
+
+
+class MemorySink(Sink):
+    def __init__(self) -> None:
+        self.progress: ExportProgress | None = None
+        self.rows: dict[date, list[str]] = {}
+        self.written: list[Sequence[Row]] = []
+
+    def load_progress(self) -> ExportProgress | None:
+        return self.progress
+
+    def write_rows(self, rows: Sequence[Row]) -> None:
+        self.written.append(rows)
+        self.rows.update(rows)
+
+    def save_progress(self, progress: ExportProgress) -> None:
+        self.progress = progress
+
+
+def test_export_only_touched_rows(bot: EADKBot) -> None:
+    sink = MemorySink()
+    exporter = Exporter(bot.database, sink)
+    until = TODAY + timedelta(days=9)
+
+    assert exporter.export(until) == 10
+    assert sink.rows[TODAY] == [""] * 6
+    assert exporter.export(until) == 0
+
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    bot.book(admin, date_str="tomorrow", user_id=4, desk_num=2, end_date_str=None)
+    bot.book(admin, date_str="tomorrow", user_id=5, desk_num=3, end_date_str=None)
+    assert exporter.export(until) == 1
+    assert sink.written[-1] == [(TODAY + timedelta(days=1), ["", "4", "5", "", "", ""])]
+
+    bot.makeowned(admin, start_date_str=(TODAY + timedelta(days=7)).isoformat(), user_id=6, desk_num=1)
+    bot.unbook(admin, date_str=(TODAY + timedelta(days=8)).isoformat(), user_id=6, desk_num=1, end_date_str=None)
+    assert exporter.export(until + timedelta(days=2)) == 5
+    assert sink.rows[TODAY + timedelta(days=7)][0] == "6"
+    assert sink.rows[TODAY + timedelta(days=8)][0] == "free (owned by 6)"
+    assert sink.rows[until + timedelta(days=2)][0] == "6"
+
+
+def test_csv_sink(bot: EADKBot, tmp_path: Path) -> None:
+    sink = CsvSink(tmp_path / "export")
+    exporter = Exporter(bot.database, sink, lambda user: f"user {user}")
+    until = TODAY + timedelta(days=20)
+    exporter.export(until)
+    september = sink.month_path(2024, 9)
+    october = sink.month_path(2024, 10)
+    assert september.exists() and october.exists()
+
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    bot.book(admin, date_str="2024-10-01", user_id=4, desk_num=6, end_date_str=None)
+    september_mtime = september.stat().st_mtime_ns
+    assert Exporter(bot.database, sink, lambda user: f"user {user}").export(until) == 1
+    assert september.stat().st_mtime_ns == september_mtime
+
+    with october.open(newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["date"] + [f"desk {desk_num}" for desk_num in range(1, 7)]
+    assert len(rows) == 4
+    assert rows[1] == ["2024-10-01", "", "", "", "", "", "user 4"]
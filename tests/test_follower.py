@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from conftest import TODAY, book_event, save_database
+
+from eadk_discord.database import Database
+from eadk_discord.database.follower import Follower, LeaderLock
+
+
+def test_follower_promotion(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    leader_lock = LeaderLock(path)
+    assert leader_lock.try_acquire()
+    leader = Database.open(path)
+    follower = Follower(path)
+
+    leader.handle_event(book_event(0))
+    leader.handle_event(book_event(1))
+    assert follower.poll() == 2
+    assert follower.poll() == 0
+    assert not follower.try_promote()
+
+    leader.handle_event(book_event(2))
+    leader_lock.release()
+    assert follower.try_promote()
+    assert follower.database.state == leader.state
+    assert not LeaderLock(path).try_acquire()
+
+
+def test_follower_of_another_process(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    script = textwrap.dedent(
+        f"""
+        import sys
+        from pathlib import Path
+        from datetime import datetime, date
+        from eadk_discord.database import Database
+        from eadk_discord.database.event import BookDesk, Event
+        from eadk_discord.database.follower import LeaderLock
+
+        path = Path({str(path)!r})
+        lock = LeaderLock(path)
+        assert lock.try_acquire()
+        database = Database.open(path)
+        day = date.fromisoformat({TODAY.isoformat()!r})
+        for desk_index in range(3):
+            event = BookDesk(start_date=day, end_date=day, desk_index=desk_index, user=1)
+            database.handle_event(Event(author=1, time=datetime.now(), event=event))
+        print("ready", flush=True)
+        sys.stdin.readline()
+        """
+    )
+    leader = subprocess.Popen([sys.executable, "-c", script], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert leader.stdout is not None
+        assert leader.stdout.readline() == "ready\n"
+        follower = Follower(path)
+        assert not follower.try_promote()
+        assert follower.database.num_events == 4
+        leader.kill()
+        leader.wait()
+        database = follower.follow()
+        assert follower.leader_lock.held
+        assert database.num_events == 4
+        assert database.state.day(TODAY)[0].desk(2).booker == 1
+    finally:
+        leader.kill()
+        leader.wait()
@@ -0,0 +1,143 @@
+import random
+from collections.abc import Sequence
+from datetime import date, timedelta
+
+from eadk_discord.database.event import BookDesk, Event, SetNumDesks, UnbookDesk
+from eadk_discord.database.event_errors import DateTooEarlyError
+from eadk_discord.database.state import Day, State
+from eadk_discord.fuzz_state import (
+    REFERENCE,
+    START_DATE,
+    START_TIME,
+    DatabaseEngine,
+    SnapshottingEngine,
+    fuzz,
+    random_events,
+    reference_engine,
+    run_case,
+)
+
+
+class UnbooksFirstDay:
+    """
+    An engine with a bug: unbooking a range of days only unbooks the first day.
+    """
+
+    state: State
+
+    def __init__(self, start_date: date) -> None:
+        self.state = reference_engine(start_date)
+
+    def handle_event(self, event: Event) -> None:
+        payload = event.event
+        if isinstance(payload, UnbookDesk) and payload.end_date > payload.start_date:
+            event = event.model_copy(update={"event": payload.model_copy(update={"end_date": payload.start_date})})
+        self.state.handle_event(event)
+
+    def days_between(self, start_date: date, end_date: date) -> Sequence[Day]:
+        return self.state.days_between(start_date, end_date)
+
+
+class WrongError:
+    """
+    An engine with a bug: dates before the start date are reported with the wrong error.
+    """
+
+    state: State
+
+    def __init__(self, start_date: date) -> None:
+        self.state = reference_engine(start_date)
+
+    def handle_event(self, event: Event) -> None:
+        try:
+            self.state.handle_event(event)
+        except DateTooEarlyError as error:
+            raise ValueError(error.date) from error
+
+    def days_between(self, start_date: date, end_date: date) -> Sequence[Day]:
+        return self.state.days_between(start_date, end_date)
+
+
+class DropsLastChange(DatabaseEngine):
+    """
+    An engine with a bug: the diff of an event that changes several desks leaves out the last change.
+    """
+
+    def handle_event(self, event: Event) -> None:
+        num_diffs = len(self.diffs)
+        super().handle_event(event)
+        if len(self.diffs) > num_diffs and len(self.diffs[-1].desks) > 1:
+            self.diffs[-1] = self.diffs[-1].model_copy(update={"desks": self.diffs[-1].desks[:-1]})
+
+
+def test_engines_agree() -> None:
+    report = fuzz({"snapshots": SnapshottingEngine, "database": DatabaseEngine}, runs=20, length=30)
+    assert report.mismatches == []
+    assert report.runs == 20
+    assert report.events == 600
+    assert set(report.times) == {REFERENCE, "snapshots", "database"}
+    assert set(report.ratios()) == {"snapshots", "database"}
+    assert all(ratio > 0 for ratio in report.ratios().values())
+
+
+def test_random_events_are_deterministic() -> None:
+    assert random_events(random.Random(3), 20) == random_events(random.Random(3), 20)
+    assert random_events(random.Random(3), 20) != random_events(random.Random(4), 20)
+
+
+def test_grid_mismatch_is_shrunk() -> None:
+    report = fuzz({"broken": UnbooksFirstDay}, runs=50, length=30)
+    [mismatch] = report.mismatches
+    assert mismatch.engine == "broken"
+    # Adding a desk, booking or owning it and unbooking it for two days is the smallest failing case.
+    assert len(mismatch.events) == 3
+    assert isinstance(mismatch.events[0].event, SetNumDesks)
+    unbook = mismatch.events[2].event
+    assert isinstance(unbook, UnbookDesk)
+    assert unbook.end_date == unbook.start_date + timedelta(1)
+    assert mismatch.expected != mismatch.actual
+    assert "desks on" in mismatch.expected
+    assert "UnbookDesk" in mismatch.describe()
+
+
+def test_diff_mismatch_is_shrunk() -> None:
+    report = fuzz({"broken": DropsLastChange}, runs=50, length=30)
+    [mismatch] = report.mismatches
+    # Adding a desk and booking it for two days is the smallest failing case.
+    assert len(mismatch.events) == 2
+    assert isinstance(mismatch.events[1].event, BookDesk)
+    assert mismatch.expected.startswith("diff ")
+    assert mismatch.actual.startswith("diff ")
+    assert mismatch.expected != mismatch.actual
+
+
+def test_error_mismatch_is_shrunk() -> None:
+    report = fuzz({"broken": WrongError}, runs=50, length=30)
+    [mismatch] = report.mismatches
+    assert len(mismatch.events) == 1
+    assert mismatch.expected.startswith("DateTooEarlyError")
+    assert mismatch.actual.startswith("ValueError")
+
+
+def test_run_case_reports_first_mismatch() -> None:
+    start = START_DATE
+    events = [
+        Event(author=None, time=START_TIME, event=SetNumDesks(date=start, num_desks=2)),
+        Event(
+            author=None,
+            time=START_TIME,
+            event=BookDesk(start_date=start, end_date=start + timedelta(2), desk_index=1, user=1),
+        ),
+        Event(
+            author=None,
+            time=START_TIME,
+            event=UnbookDesk(start_date=start, end_date=start + timedelta(2), desk_index=1),
+        ),
+        Event(author=None, time=START_TIME, event=BookDesk(start_date=start, end_date=start, desk_index=0, user=2)),
+    ]
+    mismatches = run_case(events, {"broken": UnbooksFirstDay, "snapshots": SnapshottingEngine})
+    [mismatch] = mismatches
+    assert mismatch.engine == "broken"
+    assert mismatch.events == events[:3]
+    assert mismatch.expected == f"desks on {start + timedelta(1)}: ((None, None), (None, None))"
+    assert mismatch.actual == f"desks on {start + timedelta(1)}: ((None, None), (1, None))"
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from conftest import ADMIN_ROLE_ID, NOW, TODAY, command_info
+
+from eadk_discord.bot import HISTORY_PAGE_SIZE, EADKBot
+from eadk_discord.database.event import Event, SetNumDesks
+from eadk_discord.database.index import EventIndex
+
+
+def test_query_events(bot: EADKBot) -> None:
+    database = bot.database
+
+    bot.book(command_info(author_id=5), date_str="today", user_id=None, desk_num=3, end_date_str=None)
+    assert database.query_events(desk=2) == [0, 1]
+
+    bot.book(command_info(author_id=6), date_str="tomorrow", user_id=None, desk_num=3, end_date_str=None)
+    bot.makeowned(command_info(author_id=7), start_date_str="monday", user_id=8, desk_num=4)
+    bot.unbook(command_info(author_id=5), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+
+    assert database.query_events(desk=2) == [0, 1, 2, 4]
+    assert database.query_events(date=TODAY, desk=2) == [0, 1, 4]
+    assert database.query_events(date=TODAY + timedelta(days=10)) == [0, 3]
+    assert database.query_events(date=TODAY + timedelta(days=10), desk=3) == [0, 3]
+    assert database.query_events(user=8) == [3]
+    assert database.query_events(user=5) == [1, 4]
+    assert database.query_events(user=5, date=TODAY + timedelta(days=1)) == []
+    assert database.query_events() == [0, 1, 2, 3, 4]
+    assert EventIndex.build(database.events()).query(desk=2) == database.query_events(desk=2)
+
+
+def test_history_command(bot: EADKBot) -> None:
+    for i in range(2 * HISTORY_PAGE_SIZE):
+        bot.database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=6 + i)))
+
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    response = bot.history(admin, date_str=None, user_id=None, desk_num=None, page=1)
+    assert response.ephemeral
+    assert response.embed is not None
+    assert response.embed.description is not None
+    assert response.embed.description.startswith(f"`#{2 * HISTORY_PAGE_SIZE}`")
+    assert response.embed.description.count("\n") == HISTORY_PAGE_SIZE - 1
+
+    response = bot.history(admin, date_str=None, user_id=None, desk_num=None, page=3)
+    assert response.embed is not None
+    assert (
+        response.embed.description
+        == "`#0` 2024-09-13 00:00 System: Set the number of desks to 6 from 2024-09-13 onwards"
+    )
+
+    response = bot.history(admin, date_str=None, user_id=None, desk_num=None, page=4)
+    assert response.embed is None
+
+    response = bot.history(admin, date_str="today", user_id=3, desk_num=None, page=1)
+    assert response.embed is not None
+    assert response.embed.description == "No events found."
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from pathlib import Path
+
+from conftest import NOW, TODAY, book_event, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database import Database, binary
+from eadk_discord.database.dedupe import Deduplicator
+from eadk_discord.database.event import Event, SetNumDesks
+
+
+def test_duplicate_event(bot: EADKBot) -> None:
+    database = bot.database
+
+    original = book_event(key=123)
+    assert database.handle_event(original) is original
+    assert database.handle_event(book_event(1, key=123)) is original
+    assert database.num_events == 2
+    assert database.state.day(TODAY)[0].desk(1).booker is None
+    assert database.recorded_event(123) is original
+    assert database.recorded_event(None) is None
+
+
+def test_retried_command(bot: EADKBot) -> None:
+    database = bot.database
+
+    first = bot.book(command_info(interaction_id=77), date_str=None, user_id=None, desk_num=None, end_date_str=None)
+    retried = bot.book(command_info(interaction_id=77), date_str=None, user_id=None, desk_num=None, end_date_str=None)
+    assert not retried.ephemeral
+    assert "desk 1" in retried.message
+    assert "Desk 1" in first.message
+    assert database.num_events == 2
+    assert database.state.day(TODAY)[0].desk(1).booker is None
+
+    bot.unbook(command_info(interaction_id=78), date_str=None, user_id=None, desk_num=None, end_date_str=None)
+    retried = bot.unbook(command_info(interaction_id=78), date_str=None, user_id=None, desk_num=None, end_date_str=None)
+    assert not retried.ephemeral
+    assert database.num_events == 3
+
+
+def test_replay_skips_duplicates(tmp_path: Path) -> None:
+    database = Database.initialize(TODAY)
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=6)))
+    database.handle_event(book_event(key=5))
+    # A duplicate that made it into the ledger, e.g. written by another process.
+    database.history.append(book_event(key=5, time=NOW + timedelta(minutes=1)))
+
+    for path in [tmp_path / "db.json", tmp_path / f"db{binary.BINARY_SUFFIX}"]:
+        database.save(path)
+        loaded = Database.load(path)
+        assert loaded.num_events == 3
+        assert loaded.state == database.state
+        original = loaded.recorded_event(5)
+        assert original is not None
+        assert original.time == NOW
+        assert loaded.handle_event(book_event(3, key=5)) == original
+
+
+def test_deduplicator_bounds() -> None:
+    deduplicator = Deduplicator(window=timedelta(minutes=10), max_entries=3)
+
+    deduplicator.add(book_event())
+    assert len(deduplicator) == 0
+    for key in range(3):
+        deduplicator.add(book_event(key=key, time=NOW + timedelta(minutes=key)))
+    assert len(deduplicator) == 3
+    deduplicator.add(book_event(key=3, time=NOW + timedelta(minutes=3)))
+    assert deduplicator.get(0) is None
+    assert deduplicator.get(1) is not None
+    deduplicator.add(book_event(key=4, time=NOW + timedelta(minutes=12)))
+    assert deduplicator.get(1) is None
+    assert deduplicator.get(2) is not None
+    assert len(deduplicator) == 3
@@ -0,0 +1,138 @@
+import os
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from conftest import NOW, book_event, save_database
+
+from eadk_discord.database import Database, binary
+from eadk_discord.database.event_errors import EventError
+from eadk_discord.database.journal import Journal, VersionConflictError
+
+
+@pytest.mark.parametrize("file_name", ["db.json", f"db{binary.BINARY_SUFFIX}"])
+def test_processes_see_each_others_events(tmp_path: Path, file_name: str) -> None:
+    path = tmp_path / file_name
+    save_database(path)
+    first = Database.open(path)
+    second = Database.open(path)
+
+    first.handle_event(book_event(0, user=1))
+    assert second.sync() == 1
+    assert second.state == first.state
+
+    # The second process validates against the latest ledger, so it cannot book the same desk.
+    first.handle_event(book_event(1, user=1))
+    with pytest.raises(EventError):
+        second.handle_event(book_event(1, user=2))
+    assert second.num_events == 3
+    second.handle_event(book_event(2, user=2))
+    assert first.sync() == 1
+    assert first.state == second.state
+
+    # Nothing is lost if a process writes the database file while another has unsynced events.
+    first.handle_event(book_event(3, user=1))
+    second.save(path)
+    assert Journal(path).read_new() == (False, [])
+    second.handle_event(book_event(4, user=2))
+    assert first.sync() == 1
+    assert first.num_events == second.num_events == 6
+    assert first.state == second.state
+
+    # Saving in one process makes the other catch up from the database file.
+    third = Database.open(path)
+    third.handle_event(book_event(5, user=3))
+    third.save(path)
+    assert first.sync() == 1
+    assert first.state == third.state
+    assert Database.open(path).state == third.state
+
+
+def test_sync_after_archival(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    first = Database.open(path)
+    second = Database.open(path)
+
+    first.handle_event(book_event(0))
+    first.archive_before(path, NOW + timedelta(seconds=1))
+    first.handle_event(book_event(1, user=2))
+    assert second.sync() == 2
+    assert second.history.offset == 2
+    assert second.state == first.state
+    assert list(second.events()) == list(first.events())
+
+
+def test_replaced_journal_with_reused_inode(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    reader = Database.open(path)
+    writer = Database.open(path)
+    writer.handle_event(book_event(0))
+    assert reader.sync() == 1
+
+    journal_path = path.with_name("db.json.journal")
+    first_inode = tmp_path / "first-inode"
+    os.link(journal_path, first_inode)
+    for desk_index in (1, 2):
+        writer.save(path)
+        writer.handle_event(book_event(desk_index))
+    # The file system reuses the inode of the first journal for the last one, which has the same size.
+    first_inode.write_bytes(journal_path.read_bytes())
+    os.replace(first_inode, journal_path)
+
+    assert reader.sync() == 2
+    assert reader.state == writer.state
+    reader.handle_event(book_event(3, user=2))
+    assert writer.sync() == 1
+    assert writer.state == reader.state
+
+
+def test_duplicates_across_processes(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    first = Database.open(path)
+    second = Database.open(path)
+
+    original = first.handle_event(book_event(0, key=9))
+    assert second.handle_event(book_event(1, key=9)) == original
+    assert second.num_events == first.num_events == 2
+
+
+def test_version_conflict(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    first = Journal(path)
+    second = Journal(path)
+
+    with first.lock():
+        first.append(1, book_event(0))
+    with second.lock():
+        with pytest.raises(VersionConflictError):
+            second.append(1, book_event(1))
+        replaced, entries = second.read_new()
+        assert not replaced
+        assert [entry.version for entry in entries] == [1]
+        second.append(2, book_event(1))
+    with pytest.raises(RuntimeError):
+        first.append(2, book_event(2))
+    assert [entry.version for entry in first.read_new()[1]] == [2]
+    assert first.num_entries == 2
+
+
+def test_detach_journal_closes_lock_file(tmp_path: Path) -> None:
+    path = tmp_path / "db.json"
+    save_database(path)
+    database = Database.open(path)
+    database.handle_event(book_event(0))
+    journal = database.journal
+    assert journal is not None
+    lock_file = journal._lock_file
+    assert lock_file is not None
+
+    database.detach_journal()
+
+    assert database.journal is None
+    assert lock_file.closed
+    # The events are kept, and the database can be opened again.
+    assert Database.open(path).state == database.state
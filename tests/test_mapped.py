@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from conftest import NOW, TODAY
+
+from eadk_discord.database import Database, binary
+from eadk_discord.database.event import BookDesk, Event, SetNumDesks
+from eadk_discord.database.history import History
+from eadk_discord.database.mapped import MappedHistory
+
+
+def write_history(path: Path, num_events: int) -> History:
+    history = History(start_date=TODAY, history=[], offset=3)
+    history.append(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=num_events)))
+    for i in range(1, num_events):
+        history.append(
+            Event(
+                author=i,
+                time=NOW + timedelta(minutes=i),
+                event=BookDesk(start_date=TODAY, end_date=TODAY, desk_index=i, user=i),
+            )
+        )
+    path.write_bytes(binary.encode(history))
+    return history
+
+
+def test_mapped_access(tmp_path: Path) -> None:
+    history = write_history(tmp_path / "ledger.bin", 50)
+
+    with MappedHistory.open(tmp_path / "ledger.bin") as mapped:
+        assert len(mapped) == 50
+        assert mapped.start_date == TODAY
+        assert mapped.offset == 3
+        assert mapped[7] == history.history[7]
+        assert mapped[-1] == history.history[-1]
+        with pytest.raises(IndexError):
+            mapped[50]
+        assert list(mapped) == history.history
+        assert mapped.time(10) == history.history[10].time
+        assert mapped.to_history() == history
+
+        view = mapped[10:20]
+        assert len(view) == 10
+        assert view.offset == 13
+        assert list(view) == history.history[10:20]
+        assert view[2:5][0] == history.history[12]
+        assert len(mapped[30:10]) == 0
+        del view
+
+
+def test_mapped_close_with_views(tmp_path: Path) -> None:
+    history = write_history(tmp_path / "ledger.bin", 10)
+
+    mapped = MappedHistory.open(tmp_path / "ledger.bin")
+    view = mapped[2:5]
+    nested = view[1:]
+    events = iter(mapped)
+    assert next(events) == history.history[0]
+    mapped.close()
+
+    for closed in (mapped, view, nested):
+        with pytest.raises(ValueError):
+            len(closed)
+    with pytest.raises(ValueError):
+        next(events)
+    mapped.close()
+
+
+def test_mapped_bisect_time(tmp_path: Path) -> None:
+    history = write_history(tmp_path / "ledger.bin", 50)
+
+    with MappedHistory.open(tmp_path / "ledger.bin") as mapped:
+        assert mapped.bisect_time(NOW - timedelta(days=1)) == 0
+        assert mapped.bisect_time(NOW) == 0
+        assert mapped.bisect_time(NOW + timedelta(minutes=20)) == 20
+        assert mapped.bisect_time(NOW + timedelta(minutes=20, seconds=1)) == 21
+        assert mapped.bisect_time(NOW + timedelta(days=1)) == 50
+        assert mapped[mapped.bisect_time(history.history[33].time) :][0] == history.history[33]
+
+    aware = History(start_date=TODAY, history=[])
+    for hour in range(5):
+        aware.append(
+            Event(
+                author=None,
+                time=datetime(2024, 9, 13, 10 + hour, tzinfo=timezone(timedelta(hours=hour % 2))),
+                event=SetNumDesks(date=TODAY, num_desks=1),
+            )
+        )
+    (tmp_path / "aware.bin").write_bytes(binary.encode(aware))
+    with MappedHistory.open(tmp_path / "aware.bin") as mapped:
+        assert mapped.bisect_time(datetime(2024, 9, 13, 11, 30, tzinfo=timezone.utc)) == 2
+
+
+def test_binary_archive_is_mapped(tmp_path: Path) -> None:
+    path = tmp_path / f"db{binary.BINARY_SUFFIX}"
+    database = Database.initialize(TODAY)
+    for event in write_history(tmp_path / "ledger.bin", 20).history:
+        database.handle_event(event)
+
+    assert database.archive_before(path, NOW + timedelta(minutes=15)) == 15
+    loaded = Database.load(path)
+    assert loaded.archive is not None
+    [segment] = loaded.archive.segments
+    assert segment.file_name.endswith(binary.BINARY_SUFFIX)
+    assert isinstance(loaded.archive.segment_events(segment), MappedHistory)
+    assert loaded.event(4) == database.event(4)
+    assert list(loaded.events()) == list(database.events())
+    assert loaded.state == database.state
+
+
+def test_archive_closes_replaced_segment(tmp_path: Path) -> None:
+    path = tmp_path / f"db{binary.BINARY_SUFFIX}"
+    database = Database.initialize(TODAY)
+    for event in write_history(tmp_path / "ledger.bin", 20).history:
+        database.handle_event(event)
+    assert database.archive_before(path, NOW + timedelta(minutes=5)) == 5
+    assert database.archive_before(path, NOW + timedelta(minutes=15)) == 10
+
+    archive = Database.load(path).archive
+    assert archive is not None
+    first, second = archive.segments
+    first_events = archive.segment_events(first)
+    assert isinstance(first_events, MappedHistory)
+    assert archive.event(7) == database.event(7)
+    with pytest.raises(ValueError):
+        len(first_events)
+
+    second_events = archive.segment_events(second)
+    archive.close()
+    with pytest.raises(ValueError):
+        len(second_events)
+    assert archive.event(3) == database.event(3)
+    archive.close()
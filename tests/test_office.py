@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from conftest import NOW, TODAY
+
+from eadk_discord.database import Database
+from eadk_discord.database.event import BookDesk, Event, SetNumDesks
+from eadk_discord.office import DEFAULT_NUM_DESKS, create_database, open_databases
+
+
+def test_open_databases(tmp_path: Path) -> None:
+    paths = [tmp_path / "main.json", tmp_path / "second.bin", tmp_path / "third.json"]
+    for path in paths:
+        create_database(path, TODAY)
+    second = Database.open(paths[1])
+    second.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=3)))
+    second.handle_event(
+        Event(author=1, time=NOW, event=BookDesk(start_date=TODAY, end_date=TODAY, desk_index=2, user=1))
+    )
+
+    databases = open_databases(paths, max_workers=2)
+    assert [len(database.day(TODAY).desks) for database in databases] == [DEFAULT_NUM_DESKS, 3, DEFAULT_NUM_DESKS]
+    # The events in the journal are picked up after loading in a worker process.
+    assert databases[1].state == second.state
+    assert all(database.journal is not None for database in databases)
+
+    # Each office writes to its own ledger only.
+    main_bytes = paths[0].read_bytes()
+    databases[1].handle_event(
+        Event(author=1, time=NOW, event=BookDesk(start_date=TODAY, end_date=TODAY, desk_index=0, user=1))
+    )
+    databases[1].save(paths[1])
+    assert paths[0].read_bytes() == main_bytes
+    second.sync()
+    assert second.state == databases[1].state
+
+    # Existing databases are left alone.
+    create_database(paths[1], TODAY)
+    assert Database.load(paths[1]).num_events == 4
@@ -0,0 +1,154 @@
+import time
+from datetime import timedelta
+
+from conftest import NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database.diff import Diff
+from eadk_discord.database.event import BookDesk, Event, MakeOwned, SetNumDesks
+from eadk_discord.database.event_errors import (
+    DeskAlreadyBookedError,
+    DeskAlreadyOwnedError,
+    NonExistentDeskError,
+    RemoveDeskError,
+)
+
+
+def event(payload: SetNumDesks | BookDesk | MakeOwned) -> Event:
+    return Event(author=None, time=NOW, event=payload)
+
+
+def test_preview_lists_every_owner_conflict(bot: EADKBot) -> None:
+    database = bot.database
+    database.handle_event(event(MakeOwned(start_date=TODAY + timedelta(2), desk_index=0, user=1)))
+    database.day(TODAY + timedelta(30))
+    before = database.snapshot()
+    num_events = database.num_events
+
+    preview = database.preview(event(MakeOwned(start_date=TODAY, desk_index=0, user=2)))
+
+    assert not preview.succeeds
+    assert preview.diff is None
+    assert preview.conflicts == [
+        DeskAlreadyOwnedError(owner=1, desk=0, day=TODAY + timedelta(days)) for days in range(2, 31)
+    ]
+    assert database.state == before
+    assert database.num_events == num_events
+
+
+def test_preview_lists_every_removed_desk(bot: EADKBot) -> None:
+    database = bot.database
+    database.handle_event(event(BookDesk(start_date=TODAY, end_date=TODAY + timedelta(1), desk_index=5, user=3)))
+    database.handle_event(event(MakeOwned(start_date=TODAY + timedelta(3), desk_index=4, user=4)))
+    database.day(TODAY + timedelta(4))
+    before = database.snapshot()
+
+    preview = database.preview(event(SetNumDesks(date=TODAY, num_desks=4)))
+
+    assert preview.conflicts == [
+        RemoveDeskError(booker=3, owner=None, desk_index=5, day=TODAY),
+        RemoveDeskError(booker=3, owner=None, desk_index=5, day=TODAY + timedelta(1)),
+        RemoveDeskError(booker=4, owner=4, desk_index=4, day=TODAY + timedelta(3)),
+        RemoveDeskError(booker=4, owner=4, desk_index=4, day=TODAY + timedelta(4)),
+    ]
+    assert database.state == before
+
+
+def test_preview_other_errors(bot: EADKBot) -> None:
+    preview = bot.database.preview(event(MakeOwned(start_date=TODAY, desk_index=6, user=1)))
+    assert preview.conflicts == [NonExistentDeskError(desk=6, num_desks=6, day=TODAY)]
+
+
+def test_preview_stops_at_nonexistent_desk(bot: EADKBot) -> None:
+    database = bot.database
+    database.handle_event(event(BookDesk(start_date=TODAY, end_date=TODAY, desk_index=5, user=3)))
+    database.handle_event(event(SetNumDesks(date=TODAY + timedelta(2), num_desks=5)))
+
+    preview = database.preview(event(BookDesk(start_date=TODAY, end_date=TODAY + timedelta(3), desk_index=5, user=2)))
+
+    assert preview.conflicts == [
+        DeskAlreadyBookedError(booker=3, desk=5, day=TODAY),
+        NonExistentDeskError(desk=5, num_desks=5, day=TODAY + timedelta(2)),
+    ]
+
+
+def test_preview_matches_applying(bot: EADKBot) -> None:
+    database = bot.database
+    database.handle_event(event(BookDesk(start_date=TODAY, end_date=TODAY + timedelta(2), desk_index=1, user=3)))
+    database.day(TODAY + timedelta(5))
+    days = list(database.state.days)
+    owned = event(MakeOwned(start_date=TODAY + timedelta(1), desk_index=2, user=2))
+
+    preview = database.preview(owned)
+
+    assert preview.succeeds
+    assert preview.diff is not None
+    assert [change.date for change in preview.diff.desks] == [TODAY + timedelta(days) for days in range(1, 6)]
+    # The state's days were neither changed nor replaced.
+    assert all(day is original for day, original in zip(database.state.days, days, strict=True))
+    diffs: list[Diff] = []
+    database.subscribe(diffs.append)
+    database.handle_event(owned)
+    assert [preview.diff] == diffs
+
+
+def test_preview_year(bot: EADKBot) -> None:
+    database = bot.database
+    database.day(TODAY + timedelta(365))
+    for days in range(0, 365, 7):
+        date = TODAY + timedelta(days)
+        database.handle_event(event(BookDesk(start_date=date, end_date=date, desk_index=0, user=3)))
+    before = database.snapshot()
+
+    start = time.perf_counter()
+    owned = database.preview(event(MakeOwned(start_date=TODAY, desk_index=0, user=2)))
+    changing = database.preview(event(SetNumDesks(date=TODAY, num_desks=5)))
+    elapsed = time.perf_counter() - start
+
+    assert owned.succeeds
+    assert owned.diff is not None
+    assert len(owned.diff.desks) == 366
+    assert changing.succeeds
+    assert changing.diff is not None
+    assert len(changing.diff.num_desks) == 366
+    assert database.state == before
+    assert elapsed < 1.0
+
+
+def test_makeowned_preview(bot: EADKBot) -> None:
+    database = bot.database
+    bot.makeowned(command_info(), start_date_str=(TODAY + timedelta(1)).isoformat(), user_id=1, desk_num=3)
+    num_events = database.num_events
+
+    response = bot.makeowned(
+        command_info(author_id=2), start_date_str=TODAY.isoformat(), user_id=None, desk_num=3, preview=True
+    )
+
+    assert response.ephemeral
+    lines = response.message.splitlines()
+    assert lines[0] == f"Making desk 3 owned by 2 from {TODAY} onwards would fail because of 1 conflict:"
+    assert lines[1] == f"Desk 3 on {TODAY + timedelta(1)} is already owned by 1."
+    assert database.num_events == num_events
+
+    response = bot.makeowned(command_info(), start_date_str=TODAY.isoformat(), user_id=1, desk_num=3, preview=True)
+    assert response.message.splitlines() == [
+        f"Making desk 3 owned by 1 from {TODAY} onwards would make 1 change:",
+        f"Desk 3 on {TODAY}: owner flex → 1, booker free → 1",
+    ]
+    assert database.num_events == num_events
+
+
+def test_makeflex_preview(bot: EADKBot) -> None:
+    database = bot.database
+    bot.makeowned(command_info(), start_date_str=TODAY.isoformat(), user_id=1, desk_num=2)
+    database.day(TODAY + timedelta(20))
+    num_events = database.num_events
+
+    response = bot.makeflex(command_info(), start_date_str=TODAY.isoformat(), desk_num=2, preview=True)
+
+    lines = response.message.splitlines()
+    assert lines[0] == f"Making desk 2 a flex desk from {TODAY} onwards would make 21 changes:"
+    assert lines[1] == f"Desk 2 on {TODAY}: owner 1 → flex, booker 1 → free"
+    assert lines[-1] == "and 6 more."
+    assert database.num_events == num_events
+    assert database.day(TODAY).desk(1).owner == 1
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from pathlib import Path
+
+from conftest import NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database import Database
+from eadk_discord.profile_replay import Ledger, peak_memory, profile_replay, replay_by_event_type
+
+
+def test_replay_archived_database(bot: EADKBot, tmp_path: Path) -> None:
+    database = bot.database
+    path = tmp_path / "db.json"
+    for i in range(5):
+        bot.book(
+            command_info(now=NOW + timedelta(days=i)), date_str=None, user_id=None, desk_num=None, end_date_str=None
+        )
+    for i, event in enumerate(database.history.history):
+        event.time = NOW + timedelta(days=i)
+    # Archives the events that add the desks, so replaying the active ledger alone fails.
+    assert database.archive_before(path, NOW + timedelta(days=3)) == 3
+
+    ledger = Ledger.read(path)
+
+    assert ledger.archive is not None
+    assert len(ledger.history.history) == 3
+    state = ledger.replay()
+    assert state == Database.load(path).state
+    assert state.day(TODAY + timedelta(days=4))[0].desk(0).booker == 1
+    assert {event_type: len(times) for event_type, times in replay_by_event_type(ledger).items()} == {"BookDesk": 3}
+    assert any(key[2] == "_book_desk" for key in profile_replay(ledger))
+    assert peak_memory(ledger)[1] > 0
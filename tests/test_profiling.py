@@ -0,0 +1,90 @@
+import pstats
+import time
+from pathlib import Path
+
+import pytest
+
+from eadk_discord.profiling import CommandProfiler, parse_profile_spec
+
+
+def busy_work() -> int:
+    end = time.perf_counter() + 0.05
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def test_not_armed(tmp_path: Path) -> None:
+    profiler = CommandProfiler(tmp_path)
+    assert profiler.run("book", lambda: 1) == 1
+    assert profiler.armed() == {}
+    assert profiler.reports == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cprofile(tmp_path: Path) -> None:
+    profiler = CommandProfiler(tmp_path / "profiles")
+    profiler.arm("book", 2, "cprofile")
+    profiler.run("book", busy_work)
+    assert profiler.armed() == {"book": 1}
+    assert profiler.reports == []
+    profiler.run("info", busy_work)
+    assert profiler.armed() == {"book": 1}
+    profiler.run("book", busy_work)
+    assert profiler.armed() == {}
+    [report] = profiler.reports
+    assert report.parent == tmp_path / "profiles"
+    assert report.name.startswith("book-")
+    assert report.suffix == ".prof"
+    stats = pstats.Stats(str(report))
+    [(calls, *_)] = [value for key, value in stats.stats.items() if key[2] == "busy_work"]  # type: ignore[attr-defined]
+    assert calls == 2
+
+
+def test_sampling(tmp_path: Path) -> None:
+    profiler = CommandProfiler(tmp_path)
+    profiler.arm("book", 1)
+    profiler.run("book", busy_work)
+    [report] = profiler.reports
+    assert report.suffix == ".collapsed"
+    lines = report.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        # Stacks start at the profiled work rather than at the caller of the profiler.
+        assert stack.startswith("busy_work (test_profiling.py:")
+        assert "test_sampling" not in stack
+
+
+def test_failing_invocation_counts(tmp_path: Path) -> None:
+    profiler = CommandProfiler(tmp_path)
+    profiler.arm("book", 1, "cprofile")
+
+    def fail() -> None:
+        raise RuntimeError("Booking failed")
+
+    with pytest.raises(RuntimeError):
+        profiler.run("book", fail)
+    assert profiler.armed() == {}
+    assert len(profiler.reports) == 1
+
+
+def test_arm_and_disarm(tmp_path: Path) -> None:
+    profiler = CommandProfiler(tmp_path)
+    with pytest.raises(ValueError):
+        profiler.arm("book", 0)
+    profiler.arm("book", 3)
+    profiler.arm("info", 1)
+    profiler.disarm("book")
+    assert profiler.armed() == {"info": 1}
+
+
+def test_parse_profile_spec() -> None:
+    assert parse_profile_spec("book=10, info=5") == {"book": 10, "info": 5}
+    assert parse_profile_spec("week") == {"week": 1}
+    assert parse_profile_spec("") == {}
+    for spec, entry in [("book=ten", "book=ten"), ("info, =5", "=5"), ("book=0", "book=0"), ("week=", "week=")]:
+        with pytest.raises(ValueError, match=f"'{entry}'"):
+            parse_profile_spec(spec)
@@ -0,0 +1,114 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from conftest import TODAY
+
+from eadk_discord.scheduler import Job, Scheduler, next_daily
+
+TIME_ZONE = ZoneInfo("Europe/Berlin")
+
+
+def at(day: date, hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(day, time(hour, minute), tzinfo=TIME_ZONE)
+
+
+def test_next_daily() -> None:
+    assert next_daily(at(TODAY, 7), time(8)) == at(TODAY, 8)
+    assert next_daily(at(TODAY, 8), time(8)) == at(TODAY + timedelta(days=1), 8)
+    # Daylight saving time ends on 2024-10-27, but jobs keep running at the same local time.
+    assert next_daily(at(date(2024, 10, 26), 9), time(8)) == at(date(2024, 10, 27), 8)
+
+
+def test_scheduler(tmp_path: Path) -> None:
+    path = tmp_path / "db.jobs"
+    runs: list[tuple[str, date]] = []
+
+    def handler(kind: str) -> Callable[[date], Awaitable[None]]:
+        async def run(day: date) -> None:
+            if kind == "broken":
+                raise RuntimeError("broken")
+            runs.append((kind, day))
+
+        return run
+
+    async def scenario() -> None:
+        tomorrow = TODAY + timedelta(days=1)
+        scheduler = Scheduler(path, TIME_ZONE)
+        scheduler.schedule(Job(time=at(TODAY, 10, 30), kind="cutoff", date=TODAY))
+        scheduler.schedule(Job(time=at(TODAY, 9), kind="broken", date=TODAY))
+        scheduler.schedule(Job(time=at(TODAY, 8), kind="digest", date=TODAY))
+        # Daily jobs that are already pending are not scheduled again.
+        scheduler.daily("digest", time(8), handler("digest"))
+        scheduler.daily("cutoff", time(10, 30), handler("cutoff"))
+        scheduler.daily("broken", time(9), handler("broken"))
+        assert [job.kind for job in scheduler.pending] == ["digest", "broken", "cutoff"]
+
+        assert await scheduler.run_due(at(TODAY, 7)) == 0
+        # A failing job does not stop the jobs after it.
+        assert await scheduler.run_due(at(TODAY, 9, 15)) == 2
+        assert runs == [("digest", TODAY)]
+        assert [job.time for job in scheduler.pending] == [at(TODAY, 10, 30), at(tomorrow, 8), at(tomorrow, 9)]
+
+        # The pending jobs are rebuilt from the file, and a missed job for a day that has passed is skipped.
+        restarted = Scheduler(path, TIME_ZONE)
+        assert restarted.pending == scheduler.pending
+        restarted.daily("cutoff", time(10, 30), handler("cutoff"))
+        assert await restarted.run_due(at(tomorrow, 7)) == 1
+        assert runs == [("digest", TODAY)]
+        assert restarted.pending[-1] == Job(time=at(tomorrow, 10, 30), kind="cutoff", date=tomorrow)
+        # Jobs without a handler are dropped.
+        assert await restarted.run_due(at(tomorrow, 9)) == 2
+        assert [job.kind for job in restarted.pending] == ["cutoff"]
+
+    asyncio.run(scenario())
+
+
+def test_daily_time_changed(tmp_path: Path) -> None:
+    path = tmp_path / "db.jobs"
+    runs: list[date] = []
+
+    async def record(day: date) -> None:
+        runs.append(day)
+
+    async def scenario() -> None:
+        scheduler = Scheduler(path, TIME_ZONE)
+        scheduler.schedule(Job(time=at(TODAY, 8), kind="digest", date=TODAY))
+        scheduler.schedule(Job(time=at(TODAY, 10, 30), kind="cutoff", date=TODAY))
+
+        # The configured time has changed since the job was scheduled, so it moves to the new time.
+        restarted = Scheduler(path, TIME_ZONE)
+        restarted.daily("digest", time(9), record)
+        assert restarted.pending == [
+            Job(time=at(TODAY, 9), kind="digest", date=TODAY),
+            Job(time=at(TODAY, 10, 30), kind="cutoff", date=TODAY),
+        ]
+        assert Scheduler(path, TIME_ZONE).pending == restarted.pending
+        assert await restarted.run_due(at(TODAY, 8, 30)) == 0
+        assert await restarted.run_due(at(TODAY, 9)) == 1
+        assert runs == [TODAY]
+
+    asyncio.run(scenario())
+
+
+def test_run_wakes_up_for_new_jobs() -> None:
+    runs: list[date] = []
+
+    async def record(day: date) -> None:
+        runs.append(day)
+
+    async def scenario() -> None:
+        scheduler = Scheduler(None, TIME_ZONE)
+        scheduler.daily("digest", time(8), record)
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.01)
+        assert runs == []
+        now = scheduler.now()
+        scheduler.schedule(Job(time=now, kind="digest", date=now.date()))
+        await asyncio.sleep(0.01)
+        assert runs == [now.date()]
+        task.cancel()
+
+    asyncio.run(scenario())
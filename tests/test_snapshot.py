@@ -0,0 +1,168 @@
+import random
+from datetime import timedelta
+
+import pytest
+from conftest import NOW, TODAY
+
+from eadk_discord.database import Database
+from eadk_discord.database.diff import Diff
+from eadk_discord.database.event import (
+    BookDesk,
+    Event,
+    JoinWaitlist,
+    LeaveWaitlist,
+    MakeOwned,
+    SetDeskAttributes,
+    SetNumDesks,
+    UnbookDesk,
+)
+from eadk_discord.database.history import History
+from eadk_discord.database.pvector import PVector
+from eadk_discord.database.state import DeskFilter, State
+
+
+def book(database: Database, date_offset: int, desk_index: int, user: int) -> None:
+    date = TODAY + timedelta(days=date_offset)
+    database.handle_event(
+        Event(author=user, time=NOW, event=BookDesk(start_date=date, end_date=date, desk_index=desk_index, user=user))
+    )
+
+
+@pytest.mark.parametrize("size", [0, 1, 32, 33, 1056, 1057, 40000])
+def test_pvector(size: int) -> None:
+    rng = random.Random(size)
+    items = list(range(size))
+    vector = PVector(items)
+    appended: PVector[int] = PVector()
+    for item in items:
+        appended = appended.append(item)
+    assert list(vector) == list(appended) == items
+    assert vector == appended
+    assert len(vector) == size
+
+    versions = [(vector, list(items))]
+    for _ in range(50 if size else 0):
+        index = rng.randrange(size)
+        items[index] = -index
+        vector = vector.set(index, -index)
+        versions.append((vector, list(items)))
+    for version, expected in versions:
+        assert list(version) == expected
+    assert vector[3:40] == items[3:40]
+    assert list(vector.iter_from(size // 2)) == items[size // 2 :]
+    if size:
+        assert vector[-1] == items[-1]
+    with pytest.raises(IndexError):
+        vector[size]
+
+
+def test_snapshot(bot_database: Database) -> None:
+    database = bot_database
+    book(database, 3, 0, 1)
+    snapshot = database.snapshot()
+
+    book(database, 0, 1, 2)
+    book(database, 5, 1, 3)
+    database.handle_event(Event(author=4, time=NOW, event=JoinWaitlist(date=TODAY + timedelta(days=1), user=4)))
+    database.handle_event(
+        Event(author=None, time=NOW, event=MakeOwned(start_date=TODAY + timedelta(days=2), desk_index=5, user=5))
+    )
+    database.handle_event(
+        Event(
+            author=None,
+            time=NOW,
+            event=SetDeskAttributes(start_date=TODAY, desk_index=2, name=None, zone="north", tags=[]),
+        )
+    )
+
+    # The snapshot keeps the state from when it was taken.
+    assert snapshot == State.initialize(History(start_date=TODAY, history=database.history.history[:2]))
+    assert snapshot.day(TODAY)[0].desk(1).booker is None
+    assert snapshot.waitlist(TODAY + timedelta(days=1)) == []
+    assert snapshot.matching_desks(TODAY, DeskFilter(zone="north")) == []
+    assert database.state == State.initialize(database.history)
+
+    # Days that no event changed are shared, and the snapshot can be changed without affecting the state.
+    assert snapshot.days[1] is database.state.days[1]
+    date = TODAY + timedelta(days=3)
+    snapshot.handle_event(Event(author=1, time=NOW, event=UnbookDesk(start_date=date, end_date=date, desk_index=0)))
+    assert snapshot.days[1] is database.state.days[1]
+    assert snapshot.day(date)[0].desk(0).booker is None
+    assert database.day(date).desk(0).booker == 1
+
+
+def test_snapshot_shares_waitlists_and_attributes(bot_database: Database) -> None:
+    database = bot_database
+    tomorrow, later = TODAY + timedelta(days=1), TODAY + timedelta(days=2)
+    for date, user in [(tomorrow, 4), (tomorrow, 5), (later, 6)]:
+        database.handle_event(Event(author=user, time=NOW, event=JoinWaitlist(date=date, user=user)))
+    for desk_index in (1, 2):
+        database.handle_event(
+            Event(
+                author=None,
+                time=NOW,
+                event=SetDeskAttributes(start_date=TODAY, desk_index=desk_index, name=None, zone="north", tags=[]),
+            )
+        )
+    snapshot = database.snapshot()
+
+    database.handle_event(Event(author=4, time=NOW, event=LeaveWaitlist(date=tomorrow, user=4)))
+    database.handle_event(
+        Event(
+            author=None,
+            time=NOW,
+            event=SetDeskAttributes(start_date=TODAY, desk_index=2, name=None, zone="south", tags=[]),
+        )
+    )
+
+    # Only the entries that changed are replaced, and the snapshot keeps the old ones.
+    assert snapshot.waitlist(tomorrow) == [4, 5]
+    assert database.state.waitlist(tomorrow) == [5]
+    assert snapshot.waitlists[later] is database.state.waitlists[later]
+    assert snapshot.matching_desks(TODAY, DeskFilter(zone="north")) == [1, 2]
+    assert database.state.matching_desks(TODAY, DeskFilter(zone="north")) == [1]
+    assert snapshot.desk_attributes[1] is database.state.desk_attributes[1]
+
+    assert database.prune_waitlists(later) == 1
+    assert database.state.waitlists == {later: [6]}
+    assert snapshot.waitlist(tomorrow) == [4, 5]
+
+
+def test_days_stay_current(bot_database: Database) -> None:
+    database = bot_database
+    diffs: list[Diff] = []
+    database.subscribe(diffs.append)
+    day = database.state.day(TODAY)[0]
+    snapshot = database.snapshot()
+    nested = snapshot.snapshot()
+    days = list(database.state.days)
+
+    # Reading does not copy the days.
+    assert database.day(TODAY) is day
+    assert all(a is b for a, b in zip(database.state.days, days, strict=True))
+
+    book(database, 0, 1, 2)
+
+    # The state changes its own days, while the snapshots are given copies.
+    assert database.state.day(TODAY)[0] is day
+    assert day.desk(1).booker == 2
+    assert snapshot.day(TODAY)[0].desk(1).booker is None
+    assert nested.day(TODAY)[0].desk(1).booker is None
+    assert len(diffs) == 1
+
+
+def test_snapshot_json(bot_database: Database) -> None:
+    database = bot_database
+    book(database, 3, 2, 1)
+    snapshot = database.snapshot()
+    book(database, 3, 3, 2)
+    loaded = State.model_validate_json(snapshot.model_dump_json())
+    assert loaded == snapshot
+    assert isinstance(loaded.days, PVector)
+
+
+@pytest.fixture
+def bot_database() -> Database:
+    database = Database.initialize(TODAY)
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=6)))
+    return database
@@ -0,0 +1,78 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from conftest import TODAY, book_event
+
+from eadk_discord.database import Database
+from eadk_discord.office import TenantPool, create_database, tenant_database_path
+
+
+def tenant_pool(tmp_path: Path, opened: list[int], closed: list[Path], max_open: int) -> TenantPool[Database]:
+    def open_tenant(guild_id: int) -> Database:
+        path = tenant_database_path(tmp_path, guild_id)
+        create_database(path, TODAY)
+        opened.append(guild_id)
+        return Database.open(path)
+
+    def close_tenant(database: Database) -> None:
+        assert database.journal is not None
+        database.save(database.journal.database_path)
+        closed.append(database.journal.database_path)
+        database.detach_journal()
+
+    return TenantPool(open_tenant, close_tenant, max_open)
+
+
+def test_tenant_pool(tmp_path: Path) -> None:
+    opened: list[int] = []
+    closed: list[Path] = []
+    tenants = tenant_pool(tmp_path, opened, closed, max_open=2)
+    # Nothing is opened up front.
+    assert len(tenants) == 0
+
+    first = tenants.get(1)
+    first.handle_event(book_event())
+    tenants.get(2)
+    assert tenants.get(1) is first
+    # Guild 2 is the least recently used, so it is closed to make room for guild 3.
+    tenants.get(3)
+    assert opened == [1, 2, 3]
+    assert closed == [tenant_database_path(tmp_path, 2)]
+    assert 2 not in tenants and 1 in tenants
+
+    tenants.get(2)
+    assert closed[-1] == tenant_database_path(tmp_path, 1)
+    # The closed database was flushed, so its journal is empty.
+    assert Database.load(tenant_database_path(tmp_path, 1)).day(TODAY).desk(0).booker == 1
+    assert tenants.get(1).day(TODAY).desk(0).booker == 1
+
+    with pytest.raises(ValueError):
+        tenant_pool(tmp_path, opened, closed, max_open=0)
+
+
+def test_tenant_in_use_is_not_closed(tmp_path: Path) -> None:
+    closed: list[Path] = []
+    tenants = tenant_pool(tmp_path, [], closed, max_open=1)
+    deferred = asyncio.Event()
+
+    async def book() -> None:
+        with tenants.use(1) as database:
+            # Another guild's command runs while the interaction is deferred.
+            await deferred.wait()
+            database.handle_event(book_event())
+
+    async def other_guild() -> None:
+        with tenants.use(2):
+            assert 1 in tenants
+        deferred.set()
+
+    async def run() -> None:
+        await asyncio.gather(book(), other_guild())
+
+    asyncio.run(run())
+
+    # Guild 1 stayed open while it was in use, so guild 2 was closed instead once it was done.
+    assert closed == [tenant_database_path(tmp_path, 2)]
+    assert len(tenants) == 1 and 1 in tenants
+    assert Database.open(tenant_database_path(tmp_path, 1)).day(TODAY).desk(0).booker == 1
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+
+from conftest import ADMIN_ROLE_ID, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database.event import Event, SetNumDesks
+from eadk_discord.views import GRID_MAX_LENGTH, month_window, week_window
+
+
+def test_windows() -> None:
+    assert week_window(TODAY) == (date(2024, 9, 9), date(2024, 9, 15))
+    assert week_window(date(2024, 9, 16)) == (date(2024, 9, 16), date(2024, 9, 22))
+    assert month_window(TODAY) == (date(2024, 9, 1), date(2024, 9, 30))
+    assert month_window(date(2024, 2, 29)) == (date(2024, 2, 1), date(2024, 2, 29))
+    assert month_window(date(2024, 12, 31)) == (date(2024, 12, 1), date(2024, 12, 31))
+
+
+def test_week(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    bot.book(admin, date_str="today", user_id=4, desk_num=2, end_date_str=None)
+    bot.makeowned(admin, start_date_str="saturday", user_id=5, desk_num=1)
+    bot.unbook(admin, date_str="sunday", user_id=5, desk_num=1, end_date_str=None)
+
+    response = bot.week(command_info(), "today")
+    assert response.embed is not None
+    assert response.embed.title == "Week of 2024-09-09"
+    assert response.embed.description == "\n".join(
+        [
+            "```",
+            "Day   Fr Sa Su",
+            "      13 14 15",
+            "1      .  x  o",
+            "2      x  .  .",
+            "3      .  .  .",
+            "4      .  .  .",
+            "5      .  .  .",
+            "6      .  .  .",
+            "Free   5  5  6",
+            "```",
+        ]
+    )
+
+
+def test_view_cache(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    next_week = TODAY + timedelta(days=7)
+    bot.week(command_info(), "today")
+    bot.week(command_info(), next_week.isoformat())
+    september = bot.month(command_info(), "today")
+    assert september.embed is not None and september.embed.title == "September 2024"
+    assert len(bot._views) == 3
+
+    bot.book(admin, date_str=next_week.isoformat(), user_id=4, desk_num=2, end_date_str=None)
+    assert len(bot._views) == 1
+    response = bot.week(command_info(), next_week.isoformat())
+    assert response.embed is not None and response.embed.description is not None
+    assert "\n2      .  .  .  .  x  .  .\n" in response.embed.description
+
+    bot.database.handle_event(
+        Event(author=None, time=admin.now, event=SetNumDesks(date=TODAY + timedelta(days=60), num_desks=7))
+    )
+    assert len(bot._views) == 2
+    november = bot.month(command_info(), "2024-11-20")
+    assert november.embed is not None and november.embed.description is not None
+    assert november.embed.description.splitlines()[-3] == "7    " + "   " * 11 + "  ." * 19
+
+
+def test_month_with_many_desks(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    bot.database.handle_event(Event(author=None, time=admin.now, event=SetNumDesks(date=TODAY, num_desks=40)))
+    bot.book(admin, date_str="2024-10-02", user_id=4, desk_num=40, end_date_str=None)
+
+    october = bot.month(command_info(), "2024-10-01")
+    assert october.embed is not None and october.embed.description is not None
+    assert len(october.embed.description) <= GRID_MAX_LENGTH + len("```\n\n```")
+    lines = october.embed.description.splitlines()
+    assert lines[3] == "Free  40 39" + " 40" * 29
+    assert "40 desks" in lines[5]
+
+    week = bot.week(command_info(), "2024-10-02")
+    assert week.embed is not None and week.embed.description is not None
+    assert week.embed.description.splitlines()[-3] == "40     .  .  x  .  .  .  ."
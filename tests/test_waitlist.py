@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+import pytest
+from conftest import ADMIN_ROLE_ID, NOW, TODAY, command_info
+
+from eadk_discord.bot import EADKBot
+from eadk_discord.database import Database
+from eadk_discord.database.diff import Diff
+from eadk_discord.database.event import Event, JoinWaitlist, LeaveWaitlist, SetNumDesks
+from eadk_discord.database.event_errors import AlreadyWaitlistedError, NotWaitlistedError
+from eadk_discord.database.state import State
+
+
+def fill(bot: EADKBot) -> None:
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+    for desk_num in range(1, 7):
+        bot.book(admin, date_str="today", user_id=10 + desk_num, desk_num=desk_num, end_date_str=None)
+
+
+def test_waitlist(bot: EADKBot) -> None:
+    database = bot.database
+    diffs: list[Diff] = []
+    database.subscribe(diffs.append)
+    fill(bot)
+
+    response = bot.book(command_info(author_id=1), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    assert response.message == (
+        "No more desks are available for booking on 2024-09-13, so 1 has been added to the waitlist as number 1. "
+        "A desk will be booked for them as soon as one becomes free."
+    )
+    bot.book(command_info(author_id=2), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    bot.book(command_info(author_id=3), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    response = bot.book(command_info(author_id=2), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    assert response.ephemeral
+    assert response.message == "No more desks are available for booking on 2024-09-13. 2 is number 2 on the waitlist."
+    assert database.state.waitlist(TODAY) == [1, 2, 3]
+    info = bot.info(command_info(), date_str="today")
+    assert info.embed is not None
+    assert info.embed.fields[-1].value == "1. 1\n2. 2\n3. 3"
+
+    bot.leave_waitlist(command_info(author_id=2), date_str="today", user_id=None)
+    assert database.state.waitlist(TODAY) == [1, 3]
+
+    # The first user on the waitlist gets the desk as soon as it is unbooked.
+    bot.unbook(command_info(author_id=14), date_str="today", user_id=None, desk_num=4, end_date_str=None)
+    assert database.day(TODAY).desk(3).booker == 1
+    assert database.state.waitlist(TODAY) == [3]
+    assert EADKBot.waitlist_notifications(diffs[-1], lambda user: f"<@{user}>") == [
+        "<@1>, desk 4 has become free and has been booked for you on 2024-09-13."
+    ]
+
+    bot.unbook(command_info(author_id=15), date_str="today", user_id=None, desk_num=5, end_date_str=None)
+    assert database.day(TODAY).desk(4).booker == 3
+    assert database.state.waitlist(TODAY) == []
+    bot.unbook(command_info(author_id=16), date_str="today", user_id=None, desk_num=6, end_date_str=None)
+    assert database.day(TODAY).desk(5).booker is None
+    assert EADKBot.waitlist_notifications(diffs[-1], str) == []
+
+    # The auto-assigned bookings are reproduced when the state is rebuilt from the ledger.
+    assert State.initialize(database.history) == database.state
+
+
+def test_waitlist_served_by_added_desks(bot: EADKBot) -> None:
+    database = bot.database
+    diffs: list[Diff] = []
+    database.subscribe(diffs.append)
+    fill(bot)
+    bot.book(command_info(author_id=1), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    bot.book(command_info(author_id=2), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=8)))
+
+    assert [desk.booker for desk in database.day(TODAY).desks[6:]] == [1, 2]
+    assert database.state.waitlist(TODAY) == []
+    assert EADKBot.waitlist_notifications(diffs[-1], lambda user: f"<@{user}>") == [
+        "<@1>, desk 7 has become free and has been booked for you on 2024-09-13.",
+        "<@2>, desk 8 has become free and has been booked for you on 2024-09-13.",
+    ]
+
+
+def test_waitlist_skips_booked_users() -> None:
+    database = Database.initialize(TODAY)
+    bot = EADKBot(database, set(), {ADMIN_ROLE_ID})
+    bot.database.handle_event(Event(author=None, time=NOW, event=JoinWaitlist(date=TODAY, user=1)))
+    bot.database.handle_event(Event(author=None, time=NOW, event=JoinWaitlist(date=TODAY, user=2)))
+    admin = command_info(author_role_ids=[ADMIN_ROLE_ID])
+
+    # New desks are handed out to the waitlist as well.
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=TODAY, num_desks=1)))
+    assert database.day(TODAY).desk(0).booker == 1
+    assert database.state.waitlist(TODAY) == [2]
+
+    bot.makeowned(admin, start_date_str="tomorrow", user_id=3, desk_num=1)
+    tomorrow = TODAY + timedelta(days=1)
+    database.handle_event(Event(author=None, time=NOW, event=JoinWaitlist(date=tomorrow, user=2)))
+    database.handle_event(Event(author=None, time=NOW, event=JoinWaitlist(date=tomorrow, user=4)))
+    database.handle_event(Event(author=None, time=NOW, event=SetNumDesks(date=tomorrow, num_desks=2)))
+    # User 2 got the new desk tomorrow, so it is skipped when the owned desk becomes free.
+    assert database.day(tomorrow).desk(1).booker == 2
+    bot.makeflex(admin, start_date_str="tomorrow", desk_num=1)
+    assert database.day(tomorrow).desk(0).booker == 4
+    assert database.state.waitlist(tomorrow) == []
+
+
+def test_waitlist_errors(bot: EADKBot) -> None:
+    database = bot.database
+    database.handle_event(Event(author=None, time=NOW, event=JoinWaitlist(date=TODAY, user=1)))
+    with pytest.raises(AlreadyWaitlistedError):
+        database.handle_event(Event(author=None, time=NOW, event=JoinWaitlist(date=TODAY, user=1)))
+    with pytest.raises(NotWaitlistedError):
+        database.handle_event(Event(author=None, time=NOW, event=LeaveWaitlist(date=TODAY, user=2)))
+    # Booking a desk takes the user off the waitlist.
+    bot.book(command_info(author_id=1), date_str="today", user_id=None, desk_num=None, end_date_str=None)
+    assert database.state.waitlist(TODAY) == []
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from eadk_discord.api import metrics_route
+from eadk_discord.watchdog import LoopWatchdog
+
+
+def test_lag_metrics() -> None:
+    watchdog = LoopWatchdog(threshold=1.0)
+    for lag in [0.001, 0.02, 0.02, 3.0, 10.0]:
+        watchdog.record_lag(lag)
+    metrics = watchdog.metrics()
+    assert 'eadk_loop_lag_seconds_bucket{le="0.005"} 1\n' in metrics
+    assert 'eadk_loop_lag_seconds_bucket{le="0.05"} 3\n' in metrics
+    assert 'eadk_loop_lag_seconds_bucket{le="5.0"} 4\n' in metrics
+    assert 'eadk_loop_lag_seconds_bucket{le="+Inf"} 5\n' in metrics
+    assert "eadk_loop_lag_seconds_count 5\n" in metrics
+    assert "eadk_loop_lag_max_seconds 10.0\n" in metrics
+    assert "eadk_loop_stalls_total 0\n" in metrics
+
+
+def test_stall(caplog: pytest.LogCaptureFixture) -> None:
+    watchdog = LoopWatchdog(threshold=0.2, interval=0.02)
+
+    async def book() -> None:
+        # Blocks the loop like synchronous file I/O in a command would.
+        time.sleep(0.6)
+
+    watchdog.register_command("book", book)
+
+    async def run() -> None:
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        await book()
+        await asyncio.sleep(0.1)
+        watchdog.stop()
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(run())
+    assert watchdog.stalls == 1
+    assert watchdog.max_lag >= 0.5
+    stall_logs = [record.getMessage() for record in caplog.records if "has been blocked" in record.getMessage()]
+    assert len(stall_logs) == 1
+    assert "while handling /book" in stall_logs[0]
+    assert "time.sleep(0.6)" in stall_logs[0]
+
+
+def test_metrics_route() -> None:
+    watchdog = LoopWatchdog()
+    watchdog.record_lag(0.01)
+
+    async def run() -> None:
+        app = web.Application()
+        app.add_routes([metrics_route(watchdog.metrics)])
+        async with TestClient(TestServer(app)) as client:
+            response = await client.get("/metrics")
+            assert response.status == 200
+            assert response.content_type == "text/plain"
+            assert "eadk_loop_lag_seconds_count 1" in await response.text()
+
+    asyncio.run(run())